@@ -0,0 +1,51 @@
+"""Shared helpers for the Spylt benchmarks"""
+from __future__ import annotations
+
+from typing import Any
+
+import os
+import runpy
+import tempfile
+import time
+from pathlib import Path
+from statistics import median
+
+from spylt.module import Module
+
+
+def build_app(source: str, html: str = "<!DOCTYPE html>") -> Any:
+    """Compile a backend module (the contents of an App.py) and import the Quart app"""
+    workdir = Path(tempfile.mkdtemp(prefix="spylt-bench-"))
+    (workdir / "src").mkdir()
+    (workdir / "src" / "App.svelte").write_text("<!-- point ./src/App.py:app -->\n")
+    (workdir / "src" / "App.py").write_text(source)
+    (workdir / "index.html").write_text(html)
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        context = runpy.run_path("src/App.py")
+        module = [v for v in context.values() if isinstance(v, Module)][0]
+        (workdir / "main.py").write_text(module.create_api())
+        compiled = runpy.run_path("main.py")
+        # What before_serving does, while the project is the working directory
+        compiled["_spylt_page"].load()
+        return compiled["app"]
+    finally:
+        os.chdir(cwd)
+
+
+def report(name: str, timings: list[float]) -> None:
+    """Print the median and spread of a list of timings in milliseconds"""
+    timings = sorted(timings)
+    print(
+        f"{name:<28} median {median(timings) * 1000:8.2f} ms   "
+        f"min {timings[0] * 1000:8.2f} ms   max {timings[-1] * 1000:8.2f} ms"
+    )
+
+
+async def timed(coro: Any) -> float:
+    """Await a coroutine and return how long it took in seconds"""
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
@@ -0,0 +1,69 @@
+"""
+Compare the latency of N wrapper calls sent one request at a time
+against the same calls coalesced into one /api/_batch request
+
+    python benchmarks/bench_batch.py --calls 10 --rtt 20
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+
+import asyncio
+
+from _common import build_app, report, timed
+
+SOURCE = '''from spylt import require_svelte
+
+app = require_svelte("./src/App.svelte")
+
+@app
+def lookup(key: int) -> int:
+    """Pretend to look something up"""
+    return key * 2
+'''
+
+
+async def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=10, help="Calls per page load")
+    parser.add_argument("--rounds", type=int, default=50, help="Page loads to time")
+    parser.add_argument(
+        "--rtt", type=float, default=20, help="Simulated network round-trip in ms"
+    )
+    args = parser.parse_args()
+
+    client = build_app(SOURCE).test_client()
+    rtt = args.rtt / 1000
+
+    async def get(key: int) -> None:
+        await asyncio.sleep(rtt)
+        res = await client.get(f"/api/lookup?key={key}")
+        await res.get_json()
+
+    async def sequential() -> None:
+        for key in range(args.calls):
+            await get(key)
+
+    async def concurrent() -> None:
+        await asyncio.gather(*(get(key) for key in range(args.calls)))
+
+    async def batched() -> None:
+        await asyncio.sleep(rtt)
+        calls = [
+            {"id": key, "name": "lookup", "args": {"key": key}}
+            for key in range(args.calls)
+        ]
+        res = await client.post("/api/_batch", json={"calls": calls})
+        await res.get_json()
+
+    print(f"{args.calls} calls per round, {args.rounds} rounds, {args.rtt} ms RTT")
+    for name, scenario in [
+        ("unbatched (fetchSync)", sequential),
+        ("unbatched (fetchAsync)", concurrent),
+        ("batched (/api/_batch)", batched),
+    ]:
+        report(name, [await timed(scenario()) for _ in range(args.rounds)])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""
+Time how long `spylt` commands take to start, and check that quick commands
+don't import the build toolchain or the server runtime. Exits with an error
+when a command imports a forbidden module or is slower than --max-ms
+
+    python benchmarks/bench_cli.py --rounds 10 --max-ms 150
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+
+import sys
+from statistics import median
+
+from spylt.importtime import measure_imports
+
+# Commands which only parse arguments, and modules they have no use for
+COMMANDS = [["--help"], ["new", "--help"], ["build", "--help"], ["serve", "--help"]]
+FORBIDDEN = ("spylt.runtime", "spylt.builder", "spylt.pages", "rich.markdown", "quart", "pandas")
+
+CODE = """import sys
+sys.argv = {argv!r}
+try:
+    import runpy
+    runpy.run_module("spylt", run_name="__main__")
+except SystemExit:
+    pass
+"""
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5, help="Times to start each command")
+    parser.add_argument(
+        "--max-ms", type=float, help="Fail if a command's median start is slower than this"
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for command in COMMANDS:
+        reports = [
+            measure_imports(CODE.format(argv=["spylt", *command]))
+            for _ in range(args.rounds)
+        ]
+        seconds = median(report.seconds for report in reports)
+        imports = median(report.import_seconds for report in reports)
+        name = "spylt " + " ".join(command)
+        print(f"{name:<24} median {seconds * 1000:8.1f} ms   importing {imports * 1000:8.1f} ms")
+
+        modules = {entry.module for entry in reports[0].imports}
+        forbidden = sorted(module for module in FORBIDDEN if module in modules)
+        if forbidden:
+            print(f"  imports {', '.join(forbidden)}")
+            failed = True
+        if args.max_ms is not None and seconds * 1000 > args.max_ms:
+            print(f"  slower than {args.max_ms} ms")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
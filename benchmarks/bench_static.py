@@ -0,0 +1,109 @@
+"""
+Load test the page route: reading index.html from disk on every request
+against serving it from memory, uncompressed and precompressed
+
+    python benchmarks/bench_static.py --kb 600 --concurrency 32 --mbps 50
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+
+import asyncio
+import random
+import string
+import time
+
+from _common import build_app, report
+
+from spylt.builder import assemble_html
+from spylt.static import has_brotli
+
+SOURCE = '''from spylt import require_svelte
+
+app = require_svelte("./src/App.svelte")
+
+@app
+def ping() -> str:
+    """Keeps the compiler happy"""
+    return "pong"
+'''
+
+
+def fake_bundle(kb: int) -> str:
+    """Minified-looking JavaScript, repetitive enough to compress like a real bundle"""
+    rng = random.Random(0)
+    names = ["".join(rng.choices(string.ascii_letters, k=rng.randint(1, 8))) for _ in range(400)]
+    parts = []
+    size = 0
+    while size < kb * 1024:
+        a, b, c = rng.sample(names, 3)
+        part = f"function {a}({b},{c}){{return {b}.{c}?{a}({c},{b}-1):[{b},{c}]}}"
+        parts.append(part)
+        size += len(part)
+    return ";".join(parts)
+
+
+async def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--kb", type=int, default=600, help="Size of the inlined bundle")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight")
+    parser.add_argument(
+        "--mbps", type=float, default=50, help="Simulated link speed, 0 to leave it out"
+    )
+    args = parser.parse_args()
+
+    html = assemble_html(fake_bundle(args.kb), "body{margin:0}")
+    app = build_app(SOURCE, html)
+    disk_path = f"{app.root_path}/index.html"
+
+    # The handler compiled apps used before pages were held in memory
+    @app.route("/_disk")
+    async def disk_():
+        with open(disk_path, encoding="utf-8") as fh:
+            return fh.read()
+
+    client = app.test_client()
+    scenarios = [
+        ("disk, uncompressed", "/_disk", {}),
+        ("memory, uncompressed", "/", {}),
+        ("memory, gzip", "/", {"Accept-Encoding": "gzip"}),
+    ]
+    if has_brotli():
+        scenarios.append(("memory, brotli", "/", {"Accept-Encoding": "br, gzip"}))
+    else:
+        print("brotli is not installed, skipping the brotli variant")
+    scenarios.append(("memory, 304", "/", {"If-None-Match": None}))
+
+    etag = (await client.get("/")).headers["ETag"]
+    print(
+        f"{len(html) / 1024:.0f} kB page, {args.requests} requests, "
+        f"{args.concurrency} in flight, {args.mbps or 'unlimited'} Mbit/s"
+    )
+    for name, url, headers in scenarios:
+        headers = {k: v or etag for k, v in headers.items()}
+        queue = list(range(args.requests))
+        timings: list[float] = []
+        size = 0
+
+        async def worker() -> None:
+            nonlocal size
+            while queue:
+                queue.pop()
+                start = time.perf_counter()
+                res = await client.get(url, headers=headers)
+                body = await res.get_data()
+                if args.mbps:
+                    await asyncio.sleep(len(body) * 8 / (args.mbps * 1e6))
+                timings.append(time.perf_counter() - start)
+                size = len(body)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        took = time.perf_counter() - start
+        report(f"{name} ({size / 1024:.0f} kB)", timings)
+        print(f"{'':<28} {args.requests / took:8.0f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+Compare payload size and latency of the DataFrame transports:
+row-oriented records (with and without the json2html table), columnar JSON and Arrow IPC
+
+    python benchmarks/bench_transport.py --rows 200000
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+
+import asyncio
+import json
+import time
+
+from _common import build_app, report
+
+from spylt.runtime import ARROW_MIME, has_arrow
+
+FRAME = (
+    'pd.DataFrame({{"id": np.arange({rows}), "price": np.linspace(0, 100, {rows}), '
+    '"quantity": np.arange({rows}) % 1000, "in_stock": np.arange({rows}) % 2 == 0, '
+    '"name": [f"item-{{i}}" for i in range({rows})]}})'
+)
+
+# Compiled apps only keep the imports of App.py, so each function builds the frame
+SOURCE = '''from spylt import require_svelte
+import numpy as np
+import pandas as pd
+
+app = require_svelte("./src/App.svelte")
+
+@app
+def records() -> pd.DataFrame:
+    """Rows as JSON records"""
+    return {frame}
+
+@app(transport="columnar")
+def columnar() -> pd.DataFrame:
+    """Columns as typed arrays"""
+    return {frame}
+
+@app(transport="arrow")
+def arrow() -> pd.DataFrame:
+    """Columns as an Arrow IPC stream"""
+    return {frame}
+'''
+
+
+async def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows in the frame")
+    parser.add_argument("--rounds", type=int, default=5, help="Requests to time per transport")
+    args = parser.parse_args()
+
+    client = build_app(SOURCE.format(frame=FRAME.format(rows=args.rows))).test_client()
+    scenarios = [("records", "", {}), ("records", "?_table=1", {}), ("columnar", "", {})]
+    if has_arrow():
+        scenarios.append(("arrow", "", {"Accept": ARROW_MIME}))
+    else:
+        print("pyarrow is not installed, skipping the Arrow transport")
+
+    print(f"{args.rows} rows, {args.rounds} rounds")
+    for name, query, headers in scenarios:
+        timings = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            res = await client.get(f"/api/{name}{query}", headers=headers)
+            body = await res.get_data()
+            if res.content_type == "application/json":
+                # Parsing stands in for the work the browser does with the payload
+                json.loads(body)
+            timings.append(time.perf_counter() - start)
+        report(f"{name}{' + table' if query else ''} ({len(body) / 1e6:.1f} MB)", timings)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
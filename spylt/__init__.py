@@ -1 +1,24 @@
-from .module import require_svelte
+"""
+Spylt connects Python backend functions to Svelte frontends. Names are imported
+when first used, so tools like the CLI don't load the runtime unless they need it
+"""
+from __future__ import annotations
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .module import require_svelte
+    from .runtime import CachePolicy
+
+__all__ = ["require_svelte", "CachePolicy"]
+
+_EXPORTS = {"require_svelte": ".module", "CachePolicy": ".runtime"}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
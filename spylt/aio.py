@@ -0,0 +1,48 @@
+"""
+Helpers for async backend functions. Unlike other Spylt imports, imports of this
+module are kept in compiled apps, so functions can use it after `spylt build`
+
+    from spylt.aio import gather, run_sync
+
+    @app
+    async def prices(items: str) -> list:
+        return await gather(*(fetch_price(item) for item in items.split(",")), limit=8)
+"""
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable
+
+import asyncio
+from functools import partial
+
+from .runtime import get_pool
+
+
+async def gather(
+    *awaitables: Awaitable[Any], limit: int | None = None, return_exceptions: bool = False
+) -> list[Any]:
+    """
+    Await several awaitables concurrently, like :func:`asyncio.gather`, with
+    at most ``limit`` of them running at once so upstream services aren't flooded
+    """
+    if limit is None:
+        return await asyncio.gather(*awaitables, return_exceptions=return_exceptions)
+    semaphore = asyncio.Semaphore(limit)
+
+    async def limited(awaitable: Awaitable[Any]) -> Any:
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(
+        *(limited(awaitable) for awaitable in awaitables), return_exceptions=return_exceptions
+    )
+
+
+async def run_sync(func: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking function on the app's thread pool, sized with
+    ``app.configure(threads=...)``, without stalling the event loop
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        get_pool("thread"), partial(func, *args, **kwargs)
+    )
@@ -0,0 +1,287 @@
+"""
+Load and latency benchmarks of a compiled app, behind `spylt bench`. Routes are
+called in-process through Quart's test client, or over HTTP against a running server
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import asyncio
+import inspect
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from statistics import median
+from urllib.parse import urlencode, urlsplit
+
+from .runtime import cast_args
+from .serve import load_module
+
+# Arguments synthesized for annotated parameters which have no fixture
+SAMPLES: dict[type, Any] = {int: 1, float: 1.5, str: "spylt", bool: True}
+
+# Metrics compared against a baseline, and whether larger values are better
+COMPARED = {"throughput": True, "p50": False, "p95": False, "p99": False}
+
+
+@dataclass
+class RouteResult:
+    """Measurements of one route. Latencies are in milliseconds"""
+
+    name: str
+    requests: int
+    errors: int
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    size: float
+    serialize: float | None = None
+
+
+@dataclass
+class Regression:
+    """A metric of a route which is worse than in the baseline by more than the threshold"""
+
+    route: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        return self.current / self.baseline - 1 if self.baseline else math.inf
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))]
+
+
+def load_fixtures(path: str) -> dict[str, list[dict[str, Any]]]:
+    """
+    Read route arguments from a JSON file mapping route names to an object of
+    arguments, or to a list of them which requests cycle through
+    """
+    with open(path, encoding="utf-8") as fh:
+        fixtures = json.load(fh)
+    return {
+        name: args if isinstance(args, list) else [args] for name, args in fixtures.items()
+    }
+
+
+def sample_args(types: dict[str, type]) -> dict[str, Any]:
+    """Arguments for a route synthesized from its annotations"""
+    missing = [name for name, typ in types.items() if typ not in SAMPLES]
+    if missing:
+        raise TypeError(f"Can't synthesize {', '.join(missing)}, add them to the fixtures")
+    return {name: SAMPLES[typ] for name, typ in types.items()}
+
+
+def _query(args: dict[str, Any]) -> str:
+    # Booleans are cast with bool(), so any non-empty value is true
+    return urlencode(
+        {
+            name: ("true" if value else "") if isinstance(value, bool) else value
+            for name, value in args.items()
+        }
+    )
+
+
+class _TestClient:
+    """Requests through Quart's test client, without a network in between"""
+
+    def __init__(self, client: Any) -> None:
+        self.client = client
+
+    async def get(self, path: str) -> tuple[int, bytes]:
+        response = await self.client.get(path)
+        return response.status_code, await response.get_data()
+
+
+class _HttpClient:
+    """Requests to a server, on one keep-alive connection per concurrent caller"""
+
+    def __init__(self, url: str, concurrency: int) -> None:
+        parts = urlsplit(url)
+        self._connection = HTTPSConnection if parts.scheme == "https" else HTTPConnection
+        self._netloc = parts.netloc
+        self._pool = ThreadPoolExecutor(concurrency, thread_name_prefix="spylt-bench")
+        self._local = threading.local()
+
+    def _get(self, path: str) -> tuple[int, bytes]:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connection(self._netloc, timeout=60)
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (OSError, HTTPException):
+            connection.close()
+            self._local.connection = None
+            raise
+
+    async def get(self, path: str) -> tuple[int, bytes]:
+        return await asyncio.get_running_loop().run_in_executor(self._pool, self._get, path)
+
+    def close(self) -> None:
+        self._pool.shutdown()
+
+
+@dataclass
+class Benchmark:
+    """
+    Drives every route of a compiled app with ``concurrency`` callers until
+    ``requests`` calls are made, after ``warmup`` calls which aren't measured
+    """
+
+    path: str = "main.py"
+    url: str | None = None
+    routes: list[str] | None = None
+    fixtures: dict[str, list[dict[str, Any]]] = field(default_factory=dict)
+    requests: int = 200
+    concurrency: int = 10
+    warmup: int = 10
+
+    def run(self) -> tuple[list[RouteResult], dict[str, str]]:
+        """Benchmark the routes. Returns their results, and why any were skipped"""
+        # Imported like `spylt serve` does, so process-executor routes can be pickled
+        compiled = load_module(self.path)
+        return asyncio.run(self._run(compiled))
+
+    async def _run(self, compiled: Any) -> tuple[list[RouteResult], dict[str, str]]:
+        calls: dict[str, list[dict[str, Any]]] = {}
+        skipped: dict[str, str] = {}
+        for name, (_, types, _) in compiled.ROUTES.items():
+            if self.routes and name not in self.routes:
+                continue
+            try:
+                calls[name] = self.fixtures.get(name) or [sample_args(types)]
+            except TypeError as exc:
+                skipped[name] = str(exc)
+
+        if self.url is not None:
+            client = _HttpClient(self.url, self.concurrency)
+            try:
+                results = [await self._route(client, name, args) for name, args in calls.items()]
+            finally:
+                client.close()
+            # Serialization calls the functions here, which may need resources or preloads
+            async with compiled.app.test_app():
+                await self._serialize_results(compiled.ROUTES, results, calls)
+        else:
+            # Runs before_serving, so pages and preloads are loaded like in a server
+            async with compiled.app.test_app() as app:
+                test_client = _TestClient(app.test_client())
+                results = [
+                    await self._route(test_client, name, args) for name, args in calls.items()
+                ]
+                await self._serialize_results(compiled.ROUTES, results, calls)
+        return results, skipped
+
+    async def _serialize_results(
+        self,
+        routes: dict[str, Any],
+        results: list[RouteResult],
+        calls: dict[str, list[dict[str, Any]]],
+    ) -> None:
+        for result in results:
+            func, types, policy = routes[result.name]
+            if policy.stream is None:
+                result.serialize = await self._serialize(
+                    func, types, policy, calls[result.name][0]
+                )
+
+    async def _route(self, client: Any, name: str, calls: list[dict[str, Any]]) -> RouteResult:
+        paths = [f"/api/{name}?{_query(args)}" for args in calls]
+        latencies: list[float] = []
+        sizes: list[int] = []
+        errors = 0
+        issued = 0
+
+        async def caller(count: int, measure: bool) -> None:
+            nonlocal errors, issued
+            while issued < count:
+                path = paths[issued % len(paths)]
+                issued += 1
+                start = time.perf_counter()
+                try:
+                    status, body = await client.get(path)
+                except (OSError, HTTPException):
+                    status, body = 599, b""
+                elapsed = time.perf_counter() - start
+                if not measure:
+                    continue
+                latencies.append(elapsed)
+                sizes.append(len(body))
+                if status >= 400:
+                    errors += 1
+
+        await asyncio.gather(*(caller(self.warmup, False) for _ in range(self.concurrency)))
+        issued = 0
+        start = time.perf_counter()
+        await asyncio.gather(*(caller(self.requests, True) for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        return RouteResult(
+            name=name,
+            requests=len(latencies),
+            errors=errors,
+            throughput=len(latencies) / elapsed if elapsed else 0.0,
+            p50=percentile(latencies, 50) * 1000,
+            p95=percentile(latencies, 95) * 1000,
+            p99=percentile(latencies, 99) * 1000,
+            size=sum(sizes) / len(sizes) if sizes else 0.0,
+        )
+
+    @staticmethod
+    async def _serialize(
+        func: Any, types: dict[str, type], policy: Any, args: dict[str, Any]
+    ) -> float | None:
+        """Median milliseconds to turn a route's result into the JSON it sends"""
+        # Arguments starting with _ are frame queries, not function arguments
+        args = {name: value for name, value in args.items() if not name.startswith("_")}
+        try:
+            payload = func(**cast_args(types, args))
+            if inspect.isawaitable(payload):
+                payload = await payload
+        except Exception:  # pylint: disable=broad-except
+            return None
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            json.dumps(policy._encode(payload, {}), default=str)  # pylint: disable=protected-access
+            timings.append(time.perf_counter() - start)
+        return median(timings) * 1000
+
+
+def save_results(path: str, results: list[RouteResult]) -> None:
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump({"routes": {result.name: asdict(result) for result in results}}, fh, indent=2)
+
+
+def compare(
+    results: list[RouteResult], baseline_path: str, threshold: float = 0.1
+) -> list[Regression]:
+    """Metrics which got worse than in a saved baseline by more than ``threshold``"""
+    with open(baseline_path, encoding="utf-8") as fh:
+        baseline = json.load(fh)["routes"]
+    regressions = []
+    for result in results:
+        before = baseline.get(result.name)
+        if before is None:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            old, new = before[metric], getattr(result, metric)
+            worse = new < old * (1 - threshold) if higher_is_better else new > old * (1 + threshold)
+            if worse:
+                regressions.append(Regression(result.name, metric, old, new))
+    return regressions
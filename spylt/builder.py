@@ -6,32 +6,21 @@ Prefer to use Module instances or :func:`require_svelte <spylt.module.require_sv
 """
 from __future__ import annotations
 
-# This is to inspect for types in _create_api()
-import builtins
-import typing
-
-from typing import Callable, Any
+from typing import TYPE_CHECKING, Any, get_args
 
 import os
 import re
 import runpy
-from itertools import chain
+from hashlib import sha256
 from shutil import rmtree
+from tempfile import mkdtemp
 from shlex import quote
 
-from inspect import getsourcelines
-
-try:
-    from inspect import get_annotations  # type: ignore
-except ImportError:  # 3.8 compatibility
-    from get_annotations import get_annotations
+from .helpers import INTERFACE_MODES, page_identifier
+from .manifest import HOOKS, Manifest, import_bindings, used_names
 
-import black
-import isort
-
-from .exceptions import NoRoutesDefinedError, TypesNotDefinedError
-from .helpers import flatten_dict
-from .module import Module
+if TYPE_CHECKING:
+    from .module import Module
 
 _N, _Q = "\n", '"'
 _F, _B = (
@@ -39,6 +28,18 @@ _F, _B = (
     "}",
 )
 
+_FETCH_SYNC_JS = """function fetchSync(url) {
+    const xhr = new XMLHttpRequest();
+    xhr.open('GET', url, false);
+    xhr.send();
+
+    if (xhr.status === 200) {
+        return JSON.parse(xhr.responseText);
+    } else {
+        throw new Error('Failed to fetch data');
+    }
+}"""
+
 _HTML_F = """<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -47,26 +48,304 @@ _HTML_F = """<!DOCTYPE html>
     <style>{}</style>
 </head>
 <body>
-    <script>
-        function fetchSync(url) {{
-            const xhr = new XMLHttpRequest();
-            xhr.open('GET', url, false);
-            xhr.send();
-
-            if (xhr.status === 200) {{
-                return JSON.parse(xhr.responseText);
-            }} else {{
-                throw new Error('Failed to fetch data');
-            }}
-        }}
-    </script>
+    <script>{}</script>
     <script>{}</script>
 </body>
 </html>"""
 
+# Page which links the content-hashed bundle files written by create_assets
+_SHELL_F = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Document</title>
+{}
+</head>
+<body></body>
+</html>
+"""
+
+# Prepended to async interfaces so wrappers can share one fetch helper
+_ASYNC_JS = """async function fetchAsync(route, params, options = {}) {
+    const query = new URLSearchParams(params).toString();
+    const res = await fetch(`/api/${route}?${query}`, { signal: options.signal });
+
+    if (!res.ok) {
+        throw new Error(`Failed to fetch data from /api/${route} (${res.status})`);
+    }
+    return res.json();
+}"""
+
+# Prepended to batch interfaces. Calls made in the same tick are queued and
+# sent to /api/_batch together once the current task finishes
+_BATCH_JS = """let pendingCalls = [];
+let nextCallId = 0;
+
+function abortError() {
+    return new DOMException("The call was aborted", "AbortError");
+}
+
+async function flushBatch() {
+    const calls = pendingCalls.filter((call) => !(call.signal && call.signal.aborted));
+    pendingCalls = [];
+    if (calls.length === 0) return;
+
+    try {
+        const res = await fetch("/api/_batch", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({
+                calls: calls.map(({ id, route, params }) => ({ id, name: route, args: params })),
+            }),
+        });
+        if (!res.ok) {
+            throw new Error(`Failed to fetch data from /api/_batch (${res.status})`);
+        }
+        const { results } = await res.json();
+        const byId = new Map(results.map((result) => [result.id, result]));
+
+        for (const call of calls) {
+            const result = byId.get(call.id);
+            if (result && result.ok) call.resolve(result);
+            else call.reject(new Error(result ? result.error : `No result for ${call.route}`));
+        }
+    } catch (err) {
+        calls.forEach((call) => call.reject(err));
+    }
+}
+
+function fetchBatched(route, params, options = {}) {
+    return new Promise((resolve, reject) => {
+        const { signal } = options;
+        if (signal && signal.aborted) return reject(abortError());
+        if (signal) signal.addEventListener("abort", () => reject(abortError()), { once: true });
+
+        if (pendingCalls.length === 0) queueMicrotask(flushBatch);
+        pendingCalls.push({ id: nextCallId++, route, params, signal, resolve, reject });
+    });
+}"""
+
+# Prepended to interfaces with streaming routes. Messages are NDJSON lines
+# or server-sent events, read from the fetch body as they arrive
+_STREAM_JS = """async function* fetchStream(route, params, options = {}) {
+    const query = new URLSearchParams(params).toString();
+    const res = await fetch(`/api/${route}?${query}`, { signal: options.signal });
+
+    if (!res.ok) {
+        throw new Error(`Failed to fetch data from /api/${route} (${res.status})`);
+    }
+    const sse = (res.headers.get("Content-Type") || "").startsWith("text/event-stream");
+    const separator = sse ? "\\n\\n" : "\\n";
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = "";
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+
+        let index;
+        while ((index = buffer.indexOf(separator)) !== -1) {
+            const chunk = buffer.slice(0, index);
+            buffer = buffer.slice(index + separator.length);
+            const data = sse
+                ? chunk.split("\\n").filter((line) => line.startsWith("data:")).map((line) => line.slice(5).trim()).join("\\n")
+                : chunk;
+            if (!data) continue;
+
+            const message = JSON.parse(data);
+            if (message.error) throw new Error(message.error);
+            yield message;
+        }
+    }
+}"""
+
+# Prepended to interfaces with routes cached by the client. Each route keeps a
+# map of argument keys to results, in least recently used order, so concurrent
+# calls with the same arguments share a pending request
+_MEMO_JS = """const memoCaches = new Map();
+
+function memoKey(params) {
+    return JSON.stringify(Object.keys(params).sort().map((name) => [name, params[name]]));
+}
+
+function withSignal(promise, signal) {
+    if (!signal) return promise;
+    const aborted = () => new DOMException("The call was aborted", "AbortError");
+    if (signal.aborted) return Promise.reject(aborted());
+    return new Promise((resolve, reject) => {
+        signal.addEventListener("abort", () => reject(aborted()), { once: true });
+        promise.then(resolve, reject);
+    });
+}
+
+function memoized(route, params, ttl, maxEntries, call, signal) {
+    if (!memoCaches.has(route)) memoCaches.set(route, new Map());
+    const cache = memoCaches.get(route);
+    const key = memoKey(params);
+
+    let entry = cache.get(key);
+    if (entry && entry.expires <= Date.now()) entry = undefined;
+    if (!entry) {
+        // Pending entries don't expire, so calls made meanwhile share the request
+        entry = { params, value: call(), expires: Infinity };
+        const stored = entry;
+        const expire = () => {
+            stored.expires = ttl === null ? Infinity : Date.now() + ttl * 1000;
+        };
+        if (stored.value instanceof Promise) {
+            stored.value.then(expire, () => {
+                if (cache.get(key) === stored) cache.delete(key);
+            });
+        } else {
+            expire();
+        }
+    }
+    cache.delete(key);
+    cache.set(key, entry);
+    while (cache.size > maxEntries) cache.delete(cache.keys().next().value);
+    return entry.value instanceof Promise ? withSignal(entry.value, signal) : entry.value;
+}
+
+/**
+ * Forget results cached by the client, so the next calls fetch them again.
+ * Without a route every cached result is forgotten, and with args only those
+ * of calls made with these arguments are
+ * @param {string} [route]
+ * @param {Object} [args]
+ */
+export function invalidateCache(route, args) {
+    const caches = route === undefined ? [...memoCaches.values()] : [memoCaches.get(route)];
+    for (const cache of caches) {
+        if (!cache) continue;
+        for (const [key, entry] of cache) {
+            const matches = !args || Object.entries(args).every(
+                ([name, value]) => JSON.stringify(entry.params[name]) === JSON.stringify(value)
+            );
+            if (matches) cache.delete(key);
+        }
+    }
+}"""
+
+# Names the compiled app imports from spylt.runtime
+_RUNTIME_IMPORTS = (
+    "CachePolicy", "RoutePolicy", "cache_stats", "coalesce_stats", "configure_pools", "preloaded",
+    "resource", "run_batch", "run_hooks", "shutdown_pools", "start_resources", "stop_resources",
+    "warm_imports", "warm_preloads",
+)
+# Every other name the compiled app defines starts with this, so backend functions can't clash
+_RESERVED = "_spylt_"
+_RESERVED_NAMES = frozenset(
+    {
+        "app", "request", "Quart", "cors", "ROUTES", "install_profiler", "StaticAssets",
+        "StaticPage", "Metrics", *_RUNTIME_IMPORTS,
+    }
+)
+# Endpoints of the compiled app under /api/
+_RESERVED_ROUTES = ("_batch", "_cache", "_coalesce")
+
+# Route options which are passed through to spylt.runtime.RoutePolicy
+POLICY_OPTIONS = (
+    "executor", "max_concurrency", "cache", "transport", "stream", "chunk_rows", "coalesce"
+)
+
+# Prepended to interfaces with DataFrame routes. Queries are applied by the
+# server before the frame is sent, see spylt.frames.parse_frame_query
+_FRAME_JS = """function frameParams(options) {
+    const params = {};
+    if (options.columns) params._columns = options.columns.join(",");
+    if (options.sort) params._sort = [].concat(options.sort).join(",");
+    if (options.filters) params._filters = JSON.stringify(options.filters);
+    if (options.offset !== undefined) params._offset = options.offset;
+    if (options.limit !== undefined) params._limit = options.limit;
+    if (options.table) params._table = 1;
+    return params;
+}"""
+
+# Prepended to interfaces with DataFrame routes sent as records. Unless a call
+# sets options.table, the HTML table is rendered from the records once it's read
+_TABLE_JS = """function escapeHtml(value) {
+    const entities = { "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;" };
+    return String(value ?? "").replace(/[&<>"']/g, (char) => entities[char]);
+}
+
+function renderTable(records) {
+    if (records.length === 0) return "";
+    const columns = Object.keys(records[0]);
+    const head = columns.map((column) => `<th>${escapeHtml(column)}</th>`).join("");
+    const rows = records.map(
+        (record) => `<tr>${columns.map((column) => `<td>${escapeHtml(record[column])}</td>`).join("")}</tr>`
+    );
+    return `<table border="1"><thead><tr>${head}</tr></thead><tbody>${rows.join("")}</tbody></table>`;
+}
+
+function recordsFrame(res) {
+    let table = res.table;
+    return Object.defineProperty(Object.assign(new DataFrame(res.response), { total: res.total }), "table", {
+        get: () => (table === undefined ? (table = renderTable(res.response)) : table),
+        configurable: true,
+    });
+}"""
+
+_FRAME_OPTIONS = (
+    "columns?: string[], sort?: string | string[], "
+    "filters?: Array<[string, string, any]>, offset?: number, limit?: number, table?: boolean"
+)
+
+# Prepended to interfaces with columnar or Arrow DataFrame routes
+_COLUMNS_JS = """const typedArrays = { float64: Float64Array, int32: Int32Array, uint8: Uint8Array };
+
+function decodeColumns(payload) {
+    const data = {};
+    for (const [name, column] of Object.entries(payload.data)) {
+        if (column.base64 === undefined) {
+            data[name] = column.values;
+            continue;
+        }
+        const bytes = Uint8Array.from(atob(column.base64), (c) => c.charCodeAt(0));
+        const values = Array.from(new typedArrays[column.dtype](bytes.buffer));
+        data[name] = column.dtype === "uint8" ? values.map(Boolean) : values;
+    }
+    return new DataFrame(data, payload.columns);
+}"""
+
+_ARROW_JS = """function decodeArrow(buffer) {
+    const table = tableFromIPC(new Uint8Array(buffer));
+    const names = table.schema.fields.map((field) => field.name);
+    const data = {};
+    for (const name of names) {
+        data[name] = Array.from(table.getChild(name).toArray(), (value) =>
+            typeof value === "bigint" ? Number(value) : value
+        );
+    }
+    return new DataFrame(data, names);
+}
+
+async function fetchFrame(route, params, options = {}) {
+    const query = new URLSearchParams(params).toString();
+    const res = await fetch(`/api/${route}?${query}`, {
+        signal: options.signal,
+        headers: { Accept: "application/vnd.apache.arrow.stream, application/json" },
+    });
+
+    if (!res.ok) {
+        throw new Error(`Failed to fetch data from /api/${route} (${res.status})`);
+    }
+    if (res.headers.get("Content-Type") === "application/vnd.apache.arrow.stream") {
+        const total = Number(res.headers.get("X-Total-Count"));
+        return Object.assign(decodeArrow(await res.arrayBuffer()), { total });
+    }
+    const body = await res.json();
+    return Object.assign(decodeColumns(body.response), { total: body.total });
+}"""
+
 
 def create_link(inp: str) -> str:
     """Creates an app initializer (JavaScript) using a reference to a Python namespace"""
+    # The CLI imports this module, and modules pull in the runtime
+    from .module import Module  # pylint: disable=import-outside-toplevel
+
     path, instance = inp.split(":")
 
     lib = runpy.run_path(path)
@@ -79,30 +358,91 @@ def create_link(inp: str) -> str:
     return module.create_linker()
 
 
+def _run_rollup(linker: str) -> dict[str, str]:
+    """Bundle a linker with rollup and read the files it wrote"""
+    # Each call gets its own output directory so pages can be bundled in parallel
+    directory = mkdtemp(prefix="__buildcache__", dir=".")
+    try:
+        os.system(
+            " ".join(
+                [
+                    "echo",
+                    quote(linker),
+                    "|",
+                    f"npx rollup --silent --config --file {directory}/bundle.js",
+                    ">/dev/null 2>/dev/null",
+                ]
+            ),
+        )
+        outputs = {}
+        for name in ("bundle.js", "bundle.js.map", "bundle.css"):
+            if os.path.exists(f"{directory}/{name}"):
+                with open(f"{directory}/{name}", encoding="utf-8") as fh:
+                    outputs[name] = fh.read()
+    finally:
+        rmtree(directory, ignore_errors=True)
+    if "bundle.js" not in outputs:
+        raise RuntimeError(
+            "Rollup didn't produce a bundle. Run `npx rollup --config` to see why"
+        )
+    return outputs
+
+
 def create_html(linker: str) -> str:
     """Create HTML from Svelte"""
-    os.system(
-        " ".join(
-            [
-                "echo",
-                quote(linker),
-                "|",
-                "npx rollup --silent --config --file ./__buildcache__/bundle.js",
-                ">/dev/null 2>/dev/null",
-            ]
-        ),
+    outputs = _run_rollup(linker)
+    return assemble_html(
+        outputs["bundle.js"].replace('"use strict";', ""), outputs.get("bundle.css")
     )
+
+
+def create_assets(
+    linker: str, prefix: str = "/assets/", name: str = "bundle"
+) -> tuple[str, dict[str, str]]:
+    """
+    Create a small HTML page which links content-hashed bundle files instead of
+    inlining them. Returns the page and the files to write to the assets directory
+    """
+    outputs = _run_rollup(linker)
+    files = {}
+    tags = []
+    if "bundle.css" in outputs:
+        css_name = f"{name}.{_digest(outputs['bundle.css'])}.css"
+        files[css_name] = outputs["bundle.css"]
+        tags.append(f'    <link rel="stylesheet" href="{prefix}{css_name}">')
+
+    js = f"{_FETCH_SYNC_JS}\n{outputs['bundle.js']}"
+    js_name = f"{name}.{_digest(js)}.js"
+    if "bundle.js.map" in outputs:
+        files[f"{js_name}.map"] = outputs["bundle.js.map"]
+        js = js.replace("//# sourceMappingURL=bundle.js.map", f"//# sourceMappingURL={js_name}.map")
+    files[js_name] = js
+    tags.append(f'    <script defer src="{prefix}{js_name}"></script>')
+
+    return _SHELL_F.format("\n".join(tags)), files
+
+
+def _digest(text: str) -> str:
+    return sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def read_bundle(directory: str) -> tuple[str | None, str | None]:
+    """Read the bundle.js and bundle.css written by rollup, if they exist"""
     js = None
     css = None
-    if os.path.exists("./__buildcache__/bundle.js"):
-        with open("./__buildcache__/bundle.js", "r", encoding="utf-8") as fh:
+    if os.path.exists(f"{directory}/bundle.js"):
+        with open(f"{directory}/bundle.js", "r", encoding="utf-8") as fh:
             js = fh.read().replace('"use strict";', "")
-    if os.path.exists("./__buildcache__/bundle.css"):
-        with open("./__buildcache__/bundle.css", "r", encoding="utf-8") as fh:
+    if os.path.exists(f"{directory}/bundle.css"):
+        with open(f"{directory}/bundle.css", "r", encoding="utf-8") as fh:
             css = fh.read()
-    rmtree("./__buildcache__", ignore_errors=True)
+    return js, css
+
+
+def assemble_html(js: str, css: str | None) -> str:
+    """Inline a rollup bundle into a single HTML page"""
     return (
-        re.sub(r"<!--(.*?)-->|\s\B", "", _HTML_F.format("" if not css else css, js))
+        re.sub(r"<!--(.*?)-->|\s\B", "", _HTML_F.format("" if not css else css, _FETCH_SYNC_JS, js))
         .replace("//# sourceMappingURL=bundle.js.map", "")
         .replace("const$", "$")
         .replace("function$", "function $")
@@ -113,175 +453,377 @@ def create_html(linker: str) -> str:
     )
 
 
-def _create_api(functions: list[Callable], source_file: str) -> Any:
-    # I'm not going to pay too much attention to types here since this is mostly stable code
-    source_map: Any = {"names": [], "args": [], "types": [], "docs": []}
-    sources = []
-
-    with open(source_file, encoding="utf-8") as fh:
-        data = fh.read()
-        third_party = [
-            i
-            for i in isort.code(black.format_str(data, mode=black.Mode())).splitlines()
-            if i.find("import") != -1 and i.find("spylt") == -1 and i.find("src") == -1
-        ]
-
-    for api in functions:
-        source = getsourcelines(api)
-        source_map["docs"].append(api.__doc__)
-
-        source_map["types"].append(get_annotations(api))
-
-        defined = False
-        lines = []
-        for line in source[0]:
-            if defined:
-                if "return" in line:
-                    return_obj = line.strip().split(" ", 1)[-1]
-                    pandas_json = (
-                        f'.to_dict(orient="records"), "table": json2html.convert({return_obj}.to_json(orient="records"))'
-                        if "pandas.core.frame.DataFrame"
-                        in repr(get_annotations(api)["return"])
-                        else ""
-                    )
-
-                    ret = f"{line.split('return')[0]}return {_F+_Q}response{_Q}: {return_obj}{pandas_json}{_B}"
-                    lines.append(ret)
-                else:
-                    lines.append(line)
-            if line.startswith("def"):
-                defpoint = [
-                    e.replace(",", "")
-                    for e in line.strip()
-                    .replace("(", " ")
-                    .replace(")", " ")
-                    .replace(":", "")
-                    .split(" ")[1:-1]
-                    if e not in [*dir(typing), *dir(builtins), "", "->"]
-                ]
-                source_map["names"].append(defpoint[0])
-                source_map["args"].append(defpoint[1:])
-                defined = True
-        sources.append(lines)
-
-    source_args = [
-        [k for k in e if k not in [*dir(typing), *dir(builtins), "", "->"]]
-        for e in source_map["args"]
-    ]
-    type_arg = flatten_dict(
-        dict(list(zip(list(chain.from_iterable(source_args)), source_map["types"])))
-    )
-    if source_args == []:
-        raise NoRoutesDefinedError()
-        # "No routes were defined on the Python backend.\n"
-        # "You should define backend logic with functions using @app.backend()"
-
-    if not all(x in type_arg for x in source_args[0]):
-        raise TypesNotDefinedError()
-        # f"No types are set on arguments \"{', '.join(source_args[0])}\" "
-        # "on function {source_map['names'][0]}()\n"
-        # "Please annotate the arguments so types can be casted correctly"
-
-    return (
-        source_map["args"],
-        dict(zip(source_map["names"], sources)),
-        [[e[1] for e in list(s.items())] for s in source_map["types"]],
-        third_party,
-        source_map["docs"],
-    )
-
-
-def create_interface(apis: list[Callable], source_file: str) -> tuple[list[str], bool]:
+def create_interface(manifest: Manifest, mode: str = "sync") -> tuple[list[str], list[str]]:
     """
     Create a typed JavaScript interface for a Spylt API.
-    This also suggests whether to copy dataframe-js files
+    This also suggests NPM packages to install, like dataframe-js
+
+    ``mode="async"`` creates Promise-returning wrappers on top of ``fetch``
+    which accept an ``AbortSignal`` instead of blocking on ``fetchSync``.
+    ``mode="batch"`` creates the same wrappers, but calls made in the same
+    tick share one request to ``/api/_batch``
     """
-    args, source, types, _, docs = _create_api(apis, source_file)
+    if mode not in INTERFACE_MODES:
+        raise ValueError(
+            f"Unknown interface mode '{mode}'. Expected one of {', '.join(INTERFACE_MODES)}"
+        )
+    routes = manifest.routes
 
     typemap = {
         "str": "string",
         "list": "any[]",
         "int": "number",
         "bool": "boolean",
-        "DataFrame": "DataFrame & {table: string}",
     }
 
     javascripts = []
-    suggest_dframe = False
+    suggest = []
 
-    frames = list(
-        map(lambda typ: "pandas.core.frame.DataFrame" in repr(typ[-1]), types)
+    arrow = mode == "async" and any(
+        route.frame and route.transport == "arrow" for route in routes
     )
-    if any(frames):
+    if manifest.frames:
         javascripts.append('import { DataFrame } from "dataframe-js"')
-        suggest_dframe = True
-
-    for route, args, types, doc in zip(source.keys(), args, types, docs):
-        types_ = [typemap.get(typ.__name__, "any") for typ in types[:-1]]
-        return_type = typemap.get(types[-1].__name__, "any")
-        is_pandas = "pandas.core.frame.DataFrame" in repr(types[-1])
-
+        suggest.append("dataframe-js")
+    if arrow:
+        javascripts.append('import { tableFromIPC } from "apache-arrow"')
+        suggest.append("apache-arrow")
+    if manifest.frames:
+        javascripts.append(_FRAME_JS)
+    if any(route.frame and route.transport == "records" and not route.stream for route in routes):
+        javascripts.append(_TABLE_JS)
+    if any(route.frame and route.transport != "records" for route in routes):
+        javascripts.append(_COLUMNS_JS)
+    if arrow:
+        javascripts.append(_ARROW_JS)
+    if any(route.stream for route in routes):
+        javascripts.append(_STREAM_JS)
+    if any(route.client_cache for route in routes):
+        javascripts.append(_MEMO_JS)
+    if mode == "async":
+        javascripts.append(_ASYNC_JS)
+    elif mode == "batch":
+        javascripts.append(_BATCH_JS)
+    helper = "fetchBatched" if mode == "batch" else "fetchAsync"
+
+    for api in routes:
+        route, args, doc, transport = api.name, api.args, api.doc, api.transport
+        types_ = [typemap.get(typ.__name__, "any") for _, typ in api.params]
+        return_type = typemap.get(getattr(api.returns, "__name__", ""), "any")
+        is_pandas = api.frame
+        params = ", ".join(args)
+        options_type = "signal?: AbortSignal"
+        frame = ""
+        if is_pandas:
+            params = ", ".join([*args, "...frameParams(options)"])
+            options_type = f"{_FRAME_OPTIONS}, signal?: AbortSignal"
+            if transport == "records":
+                return_type = "DataFrame & {table: string, total: number}"
+                frame = "const df = recordsFrame(res);"
+            else:
+                return_type = "DataFrame & {total: number}"
+                frame = "const df = Object.assign(decodeColumns(res.response), {total: res.total});"
+
+        if api.stream:
+            item = "res.response"
+            if is_pandas and transport == "records":
+                item = "Object.assign(new DataFrame(res.response), {offset: res.offset, total: res.total})"
+            elif is_pandas:
+                item = "Object.assign(decodeColumns(res.response), {offset: res.offset, total: res.total})"
+            elif get_args(api.returns):
+                return_type = typemap.get(getattr(get_args(api.returns)[0], "__name__", ""), "any")
+            if is_pandas:
+                return_type = "DataFrame & {offset: number, total: number}"
+            javascripts.append(
+                f"""/**
+ * {doc}
+{_N.join([f" * @param {{{typ_}}} {arg}" for typ_, arg in zip(types_, args)])}
+ * @param {{{{{options_type}}}}} [options]
+ * @returns {{AsyncGenerator<{return_type}>}}
+ */
+export async function* {route}({', '.join([*args, "options = {}"])}) {{
+    for await (const res of fetchStream("{route}", {_F}{params}{_B}, options)) {{
+        yield {item};
+    }}
+}}"""
+            )
+            continue
+
+        memo = api.client_cache
+        if mode != "sync":
+            # Cached calls are shared, so one caller aborting doesn't abort the others
+            fetch_options = "{}" if memo else "options"
+            fetch = (
+                f'return fetchFrame("{route}", {_F}{params}{_B}, {fetch_options});'
+                if is_pandas and transport == "arrow" and mode == "async"
+                else f'const res = await {helper}("{route}", {_F}{params}{_B}, {fetch_options});\n'
+                f'    {frame}\n    return {"df" if is_pandas else "res.response"}'
+            )
+            if memo:
+                fetch = _memoize(route, params, memo, fetch, asynchronous=True)
+            javascripts.append(
+                f"""/**
+ * {doc}
+{_N.join([f" * @param {{{typ_}}} {arg}" for typ_, arg in zip(types_, args)])}
+ * @param {{{{{options_type}}}}} [options]
+ * @returns {{Promise<{return_type}>}}
+ */
+export async function {route}({', '.join([*args, "options = {}"])}) {{
+    {fetch}
+}}"""
+            )
+            continue
+
+        query = "&".join(list(map(lambda x: x + "=${" + x + "}", args)))
+        if is_pandas:
+            query = "&".join([*([query] if query else []), "${new URLSearchParams(frameParams(options))}"])
+        fetch = (
+            f"const res = fetchSync(`/api/{route}?{query}`);\n"
+            f'    {frame}\n    return {"df" if is_pandas else "res.response"}'
+        )
+        if memo:
+            fetch = _memoize(route, params, memo, fetch)
         javascripts.append(
             f"""/**
  * {doc}
-{_N.join([f" * @param {{{typ_}}} {arg}" for typ_, arg in zip(types_, args)])}
+{_N.join([f" * @param {{{typ_}}} {arg}" for typ_, arg in zip(types_, args)])}{f"{_N} * @param {{{{{_FRAME_OPTIONS}}}}} [options]" if is_pandas else ""}
  * @returns {{{return_type}}}
  */
-export function {route}({', '.join(args)}) {{
-    const res = fetchSync(`/api/{route}?{"&".join(list(map(lambda x: x + "=${" + x + "}", args)))}`);
-    {"const df = Object.assign(new DataFrame(res.response), {table: res.table});" if is_pandas else ""}
-    return {"df" if is_pandas else "res.response"}
+export function {route}({', '.join([*args, *(["options = {}"] if is_pandas else [])])}) {{
+    {fetch}
 }}"""
         )
 
-    return javascripts, suggest_dframe
+    return javascripts, suggest
+
+
+def _memoize(route: str, params: str, policy: Any, fetch: str, asynchronous: bool = False) -> str:
+    """Wrap the body of a wrapper so its results are cached by the client"""
+    ttl = "null" if policy.ttl is None else repr(policy.ttl)
+    body = _N.join(f"    {line}" if line else line for line in f"    {fetch}".split(_N))
+    return (
+        f'return memoized("{route}", {_F}{params}{_B}, {ttl}, {policy.max_entries}, '
+        f'{"async " if asynchronous else ""}() => {_F}\n{body}\n    {_B}'
+        f'{", options.signal" if asynchronous else ""});'
+    )
+
+
+def _defer_imports(body: str, imports: list[str]) -> str:
+    """Put the imports a function body uses at its top"""
+    if not imports:
+        return body
+    used = used_names(body)
+    needed = [line for line in imports if used & set(import_bindings(line)[1])]
+    indent = body[: len(body) - len(body.lstrip())]
+    return "".join(f"{indent}{line}\n" for line in needed) + body
 
 
-def create_api(apis: list[Callable], source_file: str) -> str:
-    """Messy API to check imports and function name + args and convert to a Quart app"""
-    all_args, source, types, imports, _ = _create_api(apis, source_file)
+def _check_names(manifest: Manifest) -> None:
+    """Make sure the module's functions don't replace anything the compiled app defines"""
+    functions = [
+        *(route.name for route in manifest.routes),
+        *(preload.name for preload in manifest.preloads),
+        *(hook.name for hooks in manifest.hooks.values() for hook in hooks),
+    ]
+    for name in functions:
+        if name.startswith(_RESERVED) or name in _RESERVED_NAMES:
+            raise ValueError(f"{name}() can't be compiled, its name is used by the compiled app")
+    for route in manifest.routes:
+        if route.name in _RESERVED_ROUTES:
+            raise ValueError(f"{route.name}() can't be compiled, /api/{route.name} is served by Spylt")
+
+
+def create_api(
+    manifest: Manifest,
+    config: dict[str, Any] | None = None,
+    assets: str | None = None,
+    pages: dict[str, str] | None = None,
+    metrics: bool = False,
+    slow_request_ms: float | None = None,
+    lazy_imports: bool = False,
+    warm_imports: bool = False,
+) -> str:
+    """
+    Convert the routes of a manifest to a Quart app. ``assets`` is the directory
+    of the hashed files written by :func:`create_assets`, if they're used.
+    ``pages`` maps the URL of each page to its HTML file. With ``metrics``, requests
+    are timed and counted, and those slower than ``slow_request_ms`` are logged.
+    ``lazy_imports`` moves the module's imports into the functions which use them,
+    and ``warm_imports`` loads them on a background thread once the server starts
+    """
+    _check_names(manifest)
+    config = config or {}
+
+    imports, deferred = manifest.imports, []
+    if lazy_imports:
+        # Future imports have to stay at the top, and so do star imports, which functions
+        # can't contain, and imports of the types arguments are cast to by the routes
+        types = {typ.__name__ for route in manifest.routes for _, typ in route.params}
+        imports = [
+            line
+            for line in manifest.imports
+            if line.startswith("from __future__")
+            or {"*", *types} & set(import_bindings(line)[1])
+        ]
+        deferred = [line for line in manifest.imports if line not in imports]
+    warm = (
+        sorted({module for line in deferred for module in import_bindings(line)[0]})
+        if warm_imports
+        else []
+    )
 
-    argmap: Any = [
-        {k: f"request.args.get('{k}', type={w.__name__})" for k, w in zip(l, t)}
-        for l, t in zip(all_args, types)
+    functions = [
+        f"def {preload.name}():\n{_defer_imports(preload.body, deferred)}\n\n"
+        f"{preload.name} = preloaded({preload.name})\n"
+        for preload in manifest.preloads
     ]
-    argmap = {k: v for d in argmap for k, v in d.items()}
-
-    functions = []
-    for (name, lines), args in zip(source.items(), all_args):
-        spaces = " " * lines[0].split(" ").count("")
-        params = "\n".join([
-            f"{spaces}{var} = {argmap[var]}"
-            for var in args
-        ]) + "\n"
+    hooks = manifest.hooks
+    functions.extend(
+        f"{'async ' if hook.is_async else ''}def {hook.name}():\n"
+        f"{_defer_imports(hook.body, deferred)}\n"
+        + (f"\n{hook.name} = resource({hook.name})\n" if kind == "resource" else "")
+        for kind in HOOKS
+        for hook in hooks[kind]
+    )
+    startup = [hook.name for hook in hooks["startup"]]
+    shutdown = [hook.name for hook in hooks["shutdown"]]
+    routes = []
+    for route in manifest.routes:
+        name = route.name
+        params = ", ".join(
+            [
+                f"{var}=request.args.get('{var}', type={typ.__name__})"
+                for var, typ in route.params
+            ]
+        )
+        argtypes = ", ".join(
+            [f"{_Q}{var}{_Q}: {typ.__name__}" for var, typ in route.params]
+        )
+        policy = ", ".join(
+            [
+                *[
+                    f"{k}={v!r}"
+                    for k, v in route.options.items()
+                    if k in POLICY_OPTIONS and k != "stream"
+                ],
+                *(["frame=True"] if route.frame else []),
+                # Generators always stream, as NDJSON unless another format is set
+                *([f"stream={route.stream!r}"] if route.stream else []),
+            ]
+        )
         functions.append(
-                f"@app.route(\"/api/{name}\")\n\
-async def {name}():\n\
-{''.join([params, *lines])}",
+            f"{'async ' if route.is_async else ''}def {name}({', '.join(route.args)}):\n"
+            f"{_defer_imports(route.body, deferred)}\n\n"
+            f"{_RESERVED}policy_{name} = RoutePolicy({policy})\n\n"
+            f"@app.route({_Q}/api/{name}{_Q})\n"
+            f"async def {_RESERVED}route_{name}():\n"
+            f"    return await {_RESERVED}policy_{name}.respond({name}{', ' if params else ''}{params})\n"
+        )
+        routes.append(
+            f"    {_Q}{name}{_Q}: ({name}, {_F}{argtypes}{_B}, {_RESERVED}policy_{name}),"
         )
     functions = "\n".join(functions)
 
+    pages = pages or {"/": "index.html"}
+    # The page links the current assets when they're used, so it's revalidated on each visit
+    page_args = "" if assets is None else ", max_age=0"
+    suffixes = {url: f"_{page_identifier(url)}" if url != "/" else "" for url in pages}
+    page_names = {url: f"{_RESERVED}page{suffix}" for url, suffix in suffixes.items()}
+    static = [
+        *[f"{page_names[url]} = StaticPage({html!r}{page_args})" for url, html in pages.items()],
+        "",
+        "@app.before_serving",
+        "async def _spylt_startup():",
+        "    warm_preloads()",
+        # Resources and hooks run in each worker, after spylt serve forks them
+        *(["    await start_resources()"] if hooks["resource"] else []),
+        *([f"    await run_hooks([{', '.join(startup)}])"] if startup else []),
+        *([f"    warm_imports({warm!r})"] if warm else []),
+        *[f"    {page_name}.load()" for page_name in page_names.values()],
+    ]
+    for url, page_name in page_names.items():
+        static.extend(
+            [
+                "",
+                f"@app.route({url!r})",
+                f"async def {_RESERVED}serve{suffixes[url]}():",
+                f"    return {page_name}.respond()",
+            ]
+        )
+    if assets is not None:
+        static.extend(
+            [
+                "",
+                f"_spylt_assets = StaticAssets({assets!r})",
+                "",
+                '@app.route("/assets/<name>")',
+                "async def _spylt_assets_route(name):",
+                "    return _spylt_assets.respond(name)",
+            ]
+        )
+    page = _N.join(static)
+
+    teardown = [
+        *([f"    await run_hooks([{', '.join(shutdown)}])"] if shutdown else []),
+        *(["    await stop_resources()"] if hooks["resource"] else []),
+        "    shutdown_pools()",
+    ]
+
+    instrument = ""
+    if metrics:
+        instrument = _N.join(
+            [
+                "",
+                f"_spylt_metrics = Metrics(slow_request_ms={slow_request_ms!r})",
+                "_spylt_metrics.install(app)",
+                "",
+                '@app.route("/metrics")',
+                "async def _spylt_metrics_route():",
+                "    return _spylt_metrics.respond(coalesce_stats(ROUTES))",
+                "",
+            ]
+        )
+
+    # Counters are only served for routes which opt in, so other apps don't expose internals
+    stats = ""
+    if any(route.options.get("cache") for route in manifest.routes):
+        stats += '\n@app.route("/api/_cache")\nasync def _spylt_cache():\n    return cache_stats(ROUTES)\n'
+    if any(route.options.get("coalesce") for route in manifest.routes):
+        stats += '\n@app.route("/api/_coalesce")\nasync def _spylt_coalesce():\n    return coalesce_stats(ROUTES)\n'
+
     api_string = (
-        f"""{_N.join(imports)}
-from quart import Quart, request
+        f"""{"".join(line + _N for line in imports)}from quart import Quart, request
 from quart_cors import cors
-{"from json2html.jsonconv import json2html" if any(["DataFrame" in str(f) for e in types for f in e]) else ""}
+from spylt.runtime import {", ".join(_RUNTIME_IMPORTS)}
+from spylt.profiling import install_profiler
+from spylt.static import StaticAssets, StaticPage{_N + "from spylt.metrics import Metrics" if metrics else ""}
 
 app = Quart(__name__)
 app = cors(app, allow_origin="*")
+configure_pools(threads={config.get("threads")}, processes={config.get("processes")})
+# Does nothing unless SPYLT_PROFILE or SPYLT_PROFILE_KEY is set
+install_profiler(app)
+{instrument}
+@app.after_serving
+async def _spylt_shutdown():
+{_N.join(teardown)}
 
-@app.route("/")
-async def root_():
-    with open("index.html", encoding="utf-8") as fh:
-        return fh.read()
+{page}
 
 {functions}
-    """[
+ROUTES = {_F}
+{_N.join(routes)}
+{_B}
+
+@app.route("/api/_batch", methods=["POST"])
+async def _spylt_batch():
+    return await run_batch(await request.get_json(), ROUTES)
+{stats}    """[
             :-4
         ]
         .replace("from .module import Module\n", "")
         .replace("from .helpers import template\n", "")
-        + "\napp.run()\n"
+        + '\nif __name__ == "__main__":\n    app.run()\n'
     )
 
     return api_string
@@ -0,0 +1,110 @@
+"""Content-addressed cache of build outputs, so unchanged stages can be skipped"""
+from __future__ import annotations
+
+from typing import Callable, Iterable
+
+import hashlib
+import os
+import time
+from pathlib import Path
+
+CACHE_DIR = ".spylt-cache"
+# Entries kept per stage, so switching back and forth between changes still hits
+MAX_ENTRIES = 16
+
+_tool_version: str | None = None
+
+
+def tool_version() -> str:
+    """Hash of Spylt's own sources. Upgrading or editing Spylt invalidates the cache"""
+    global _tool_version  # pylint: disable=global-statement
+    if _tool_version is None:
+        digest = hashlib.sha256()
+        for path in sorted(Path(__file__).parent.iterdir()):
+            if path.suffix in (".py", ".txt"):
+                digest.update(path.name.encode())
+                digest.update(path.read_bytes())
+        _tool_version = digest.hexdigest()
+    return _tool_version
+
+
+def source_files(*roots: str) -> list[str]:
+    """Every file under the given directories (or the files themselves) which exists"""
+    files = []
+    for root in roots:
+        if os.path.isfile(root):
+            files.append(root)
+        elif os.path.isdir(root):
+            for parent, dirs, names in os.walk(root):
+                dirs[:] = sorted(d for d in dirs if d not in ("node_modules", "__pycache__"))
+                files.extend(os.path.join(parent, name) for name in sorted(names))
+    return files
+
+
+def write_if_changed(path: str, text: str) -> bool:
+    """Write a build output, leaving the file (and its mtime) alone if it's already up to date"""
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as fh:
+            if fh.read() == text:
+                return False
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(text)
+    return True
+
+
+class BuildCache:
+    """Stores stage outputs under .spylt-cache/<stage>/<key>"""
+
+    def __init__(self, root: str = CACHE_DIR, enabled: bool = True) -> None:
+        self.root = Path(root)
+        self.enabled = enabled
+
+    def key(self, stage: str, files: Iterable[str] = (), extra: Iterable[str] = ()) -> str:
+        """Hash the tool version, stage name, file paths/contents and any extra inputs"""
+        digest = hashlib.sha256()
+        digest.update(tool_version().encode())
+        digest.update(stage.encode())
+        for file in files:
+            digest.update(file.encode())
+            digest.update(Path(file).read_bytes())
+        for part in extra:
+            digest.update(b"\0" + part.encode())
+        return digest.hexdigest()
+
+    def get(self, stage: str, key: str) -> str | None:
+        if not self.enabled:
+            return None
+        path = self.root / stage / key
+        if not path.exists():
+            return None
+        os.utime(path)
+        return path.read_text(encoding="utf-8")
+
+    def put(self, stage: str, key: str, value: str) -> None:
+        if not self.enabled:
+            return
+        directory = self.root / stage
+        directory.mkdir(parents=True, exist_ok=True)
+        # Write then rename so a cancelled build can't leave a truncated entry
+        tmp = directory / f".{key}.tmp"
+        tmp.write_text(value, encoding="utf-8")
+        tmp.replace(directory / key)
+
+        entries = sorted(directory.iterdir(), key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:-MAX_ENTRIES]:
+            entry.unlink()
+
+    def stage(
+        self, stage: str, key: str, build: Callable[[], str]
+    ) -> tuple[str, bool, float]:
+        """
+        Get a stage output from the cache, or build and store it.
+        Returns the output, whether it was a cache hit and how long it took
+        """
+        start = time.time()
+        value = self.get(stage, key)
+        hit = value is not None
+        if value is None:
+            value = build()
+            self.put(stage, key, value)
+        return value, hit, time.time() - start
@@ -1,22 +1,53 @@
-"""The CLI, I guess"""
+"""
+The CLI, I guess. Every command imports what it needs when it runs,
+so `spylt --help` and quick commands don't load the build toolchain
+"""
+from __future__ import annotations
+
 from argparse import ArgumentParser, Namespace
+from typing import TYPE_CHECKING, Any
+import json
 import shutil
 import os
 import time
 import sys
 
 from pathlib import Path
-from runpy import run_path
 
-from rich.console import Console
-from rich.markdown import Markdown
+from .helpers import INTERFACE_MODES
+
+if TYPE_CHECKING:
+    from .pages import Project
+
+
+class _Console:
+    """A rich console which is only created once something is printed"""
+
+    def __init__(self) -> None:
+        self._console: Any = None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._console is None:
+            from rich.console import Console  # pylint: disable=import-outside-toplevel
 
-from . import builder
-from .helpers import find_pointer
-from .module import Module
+            self._console = Console(log_path=False, log_time=False)
+        return getattr(self._console, name)
 
 
-console = Console(log_path=False, log_time=False)
+def _markdown(text: str) -> Any:
+    from rich.markdown import Markdown  # pylint: disable=import-outside-toplevel
+
+    return Markdown(text)
+
+
+def _require_built(py: str) -> None:
+    """Exit unless the compiled app exists"""
+    if not os.path.exists(py):
+        console.log(_markdown(f"𐄂 `{py}` does not exist. Run `spylt build` first"))
+        sys.exit(1)
+
+
+console = _Console()
 REQUIREMENTS = [
     "@rollup/plugin-commonjs",
     "@rollup/plugin-node-resolve",
@@ -28,6 +59,45 @@ REQUIREMENTS = [
     "svelte",
 ]
 
+SVELTE_SYNC = """<!-- point ./src/App.py:app -->
+<script>
+    let text
+    import { say_hello } from "./api"
+</script>
+<main>
+    <p>Welcome to Spylt</p><br>
+    <input type="text" name="Name" bind:value={text}>
+    <button type="submit" on:click={() => alert(say_hello(text))}>Greet</button>
+</main>
+        """
+SVELTE_ASYNC = """<!-- point ./src/App.py:app -->
+<script>
+    let text
+    let greeting
+    let controller
+    import { say_hello } from "./api"
+
+    function greet() {
+        // Cancel the previous greeting if it is still in flight
+        if (controller) controller.abort()
+        controller = new AbortController()
+        greeting = say_hello(text, { signal: controller.signal })
+    }
+</script>
+<main>
+    <p>Welcome to Spylt</p><br>
+    <input type="text" name="Name" bind:value={text}>
+    <button type="submit" on:click={greet}>Greet</button>
+    {#await greeting}
+        <p>Greeting...</p>
+    {:then message}
+        {#if message}<p>{message}</p>{/if}
+    {:catch error}
+        <p>{error.message}</p>
+    {/await}
+</main>
+        """
+
 
 def new(namespace: Namespace) -> None:
     """Scaffold a new Spylt project"""
@@ -62,19 +132,8 @@ def new(namespace: Namespace) -> None:
     )
 
     with open("src/App.svelte", "w", encoding="utf-8") as fh:
-        fh.write(
-            """<!-- point ./src/App.py:app -->
-<script>
-    let text
-    import { say_hello } from "./api"
-</script>
-<main>
-    <p>Welcome to Spylt</p><br>
-    <input type="text" name="Name" bind:value={text}>
-    <button type="submit" on:click={() => alert(say_hello(text))}>Greet</button>
-</main>
-        """
-        )
+        # Batch wrappers return Promises too
+        fh.write(SVELTE_ASYNC if namespace.mode in ("async", "batch") else SVELTE_SYNC)
     with open("src/App.py", "w", encoding="utf-8") as fh:
         fh.write(
             '''from spylt import require_svelte
@@ -102,97 +161,238 @@ def some_data() -> pd.DataFrame:
     interpreter = os.path.basename(sys.executable)
 
     console.log(
-        Markdown(
+        _markdown(
             f"""✓ Project {namespace.directory} scaffolded in {end - start:.2f}s.
 You can now run the following to get started:
 
 cd {namespace.directory}
-{interpreter} -m spylt interface
+{interpreter} -m spylt interface{f" --mode {namespace.mode}" if namespace.mode != "sync" else ""}
 {interpreter} -m spylt build
 {interpreter} main.py"""
         )
     )
 
 
-def build(namespace: Namespace) -> None:
-    """Compile Spylt backend module and Svelte code"""
-    if not Path("src/App.py").exists():
+def _find_project(html: str = "index.html") -> Project:
+    """Find the pages of the project in the working directory, or exit"""
+    from .pages import Project, discover_pages  # pylint: disable=import-outside-toplevel
+
+    pages = discover_pages("src")
+    if not pages:
         console.log(
-            Markdown("𐄂 Could not find `src/App.py`. Are you in a Spylt project?")
+            _markdown(
+                "𐄂 Could not find a Svelte page with a `<!-- point -->` header in `src/`. "
+                "Are you in a Spylt project?"
+            )
         )
         sys.exit(1)
+    return Project(pages, html)
 
-    start = time.time()
-    with console.status("Transpiling backend code..."):
-        app_context = run_path("src/App.py")
-        app = [v for v in app_context.values() if isinstance(v, Module)][0]
-        api_string = app.create_api()
-
-        # There's some strange lines coming from module so trim it
-        with open(namespace.py, "w", encoding="utf-8") as fh:
-            fh.write("\n".join(api_string.split("\n")))
-    end = time.time()
 
-    console.log(f"✓ Backend code compiled in {end - start:.2f}s")
-
-    start = time.time()
-    with console.status("Compiling frontend code..."):
-        pointer = find_pointer("src/App.svelte")
-        linker_code = builder.create_link(pointer)
-        html_output = builder.create_html(linker_code)
-        app.create_interface()
-
-        with open(namespace.html, "w", encoding="utf-8") as fh:
-            fh.write(html_output)
-    end = time.time()
-
-    console.log(
-        Markdown(
-            f"""✓ Frontend code compiled in {end - start:.2f}s.
+def build(namespace: Namespace) -> None:
+    """Compile Spylt backend module and Svelte code"""
+    # pylint: disable=import-outside-toplevel
+    from .cache import BuildCache
+    from .pipeline import BuildPipeline
+
+    project = _find_project(namespace.html)
+    pipeline = BuildPipeline(
+        project,
+        BuildCache(enabled=not namespace.no_cache),
+        namespace.output,
+        namespace.assets,
+        namespace.jobs,
+        {
+            "metrics": namespace.metrics,
+            "slow_request_ms": namespace.slow_request_ms if namespace.metrics else None,
+            "lazy_imports": namespace.lazy_imports or namespace.warm_imports,
+            "warm_imports": namespace.warm_imports,
+        },
+    )
+    with console.status(f"Compiling backend code and {len(project.pages)} page(s)..."):
+        stages = pipeline.run(namespace.py)
 
-You can now run the app with `python3 {namespace.py}`"""
+    *steps, total = stages
+    console.log(f"✓ Built in {total.seconds:.2f}s")
+    for stage in steps:
+        console.log(
+            f"  {stage.name:<24} {stage.seconds:6.2f}s"
+            f"{'  (restored from cache)' if stage.cached else ''}"
         )
-    )
+    console.log(_markdown(f"You can now run the app with `python3 {namespace.py}`"))
 
 
 def interface(namespace: Namespace) -> None:
     """Create a JavaScript interface from a Spylt API"""
+    from .cache import BuildCache, write_if_changed  # pylint: disable=import-outside-toplevel
+
     start = time.time()
 
     with console.status("Creating interface from backend..."):
-        if not Path("src/App.py").exists():
-            console.log(
-                Markdown("𐄂 Could not find `src/App.py`. Are you in a Spylt project?")
-            )
-            sys.exit(1)
-
-        app_context = run_path("src/App.py")
-        app = [v for v in app_context.values() if isinstance(v, Module)][0]
-        interface_, suggest = app.create_interface()
+        project = _find_project()
+        cache = BuildCache(enabled=not namespace.no_cache)
+        cached, hit, _ = cache.stage(
+            "interface",
+            cache.key("interface", project.source_files, [namespace.mode]),
+            lambda: json.dumps(project.create_interface(namespace.mode)),
+        )
+        interface_, suggest = json.loads(cached)
 
-    if suggest and not os.path.exists("node_modules/dataframe-js"):
+    to_dev_null = " > /dev/null 2>/dev/null" if sys.platform != "win32" else ""
+    if "dataframe-js" in suggest and not os.path.exists("node_modules/dataframe-js"):
         with console.status(
             "ⓘ This project uses Pandas dataframes in some places. Installing dataframe-js..."
         ):
-            to_dev_null = " > /dev/null 2>/dev/null" if sys.platform != "win32" else ""
             os.system(f"npm install dataframe-js{to_dev_null}")
             os.system(
                 f"npm install --save-dev @types/dataframe-js{to_dev_null}"
             )
+    if "apache-arrow" in suggest and not os.path.exists("node_modules/apache-arrow"):
+        with console.status(
+            "ⓘ This project sends dataframes over Arrow IPC. Installing apache-arrow..."
+        ):
+            os.system(f"npm install apache-arrow{to_dev_null}")
 
-    with open(namespace.out, "w", encoding="utf-8") as fh:
-        fh.write(interface_)
+    write_if_changed(namespace.out, interface_)
     end = time.time()
 
     console.log(
-        Markdown(
-            f"""Done in {end - start:.2f} s
+        _markdown(
+            f"""Done in {end - start:.2f} s{" (restored from cache)" if hit else ""}
 
 `{namespace.out}` should now be available in your project"""
         )
     )
 
 
+def dev(namespace: Namespace) -> None:
+    """Watch the project and rebuild whatever a change affects"""
+    _find_project()
+
+    from .dev import DevServer  # pylint: disable=import-outside-toplevel
+
+    server = DevServer(
+        namespace.py, namespace.html, namespace.out, namespace.mode, console.log
+    )
+    console.log("Watching src/ for changes. Press Ctrl+C to stop")
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        console.log("✓ Stopped watching")
+
+
+def serve(namespace: Namespace) -> None:
+    """Serve a compiled app with several worker processes"""
+    _require_built(namespace.py)
+
+    from .serve import serve as serve_  # pylint: disable=import-outside-toplevel
+
+    sys.exit(
+        serve_(
+            namespace.py,
+            workers=namespace.workers,
+            bind=namespace.bind,
+            keep_alive=namespace.keep_alive,
+            backlog=namespace.backlog,
+            graceful_timeout=namespace.graceful_timeout,
+            preload=not namespace.no_preload,
+            log=console.log,
+        )
+    )
+
+
+def bench(namespace: Namespace) -> None:
+    """Load test the routes of a compiled app"""
+    _require_built(namespace.py)
+
+    from .bench import (  # pylint: disable=import-outside-toplevel
+        Benchmark,
+        compare,
+        load_fixtures,
+        save_results,
+    )
+
+    benchmark = Benchmark(
+        namespace.py,
+        url=namespace.url,
+        routes=namespace.route,
+        fixtures=load_fixtures(namespace.fixtures) if namespace.fixtures else {},
+        requests=namespace.requests,
+        concurrency=namespace.concurrency,
+        warmup=namespace.warmup,
+    )
+    target = namespace.url or "the test client"
+    with console.status(f"Benchmarking {namespace.py} through {target}..."):
+        results, skipped = benchmark.run()
+
+    console.log(
+        f"✓ {namespace.requests} requests per route, {namespace.concurrency} at a time, "
+        f"through {target}"
+    )
+    console.log(
+        f"  {'route':<14} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'size B':>8} {'json ms':>8} {'errors':>6}"
+    )
+    for result in results:
+        serialize = "-" if result.serialize is None else f"{result.serialize:.3f}"
+        console.log(
+            f"  {result.name:<14} {result.throughput:8.1f} {result.p50:8.2f} {result.p95:8.2f} "
+            f"{result.p99:8.2f} {result.size:8.0f} {serialize:>8} {result.errors:6}"
+        )
+    for name, reason in skipped.items():
+        console.log(f"ⓘ Skipped {name}: {reason}")
+
+    if namespace.save:
+        save_results(namespace.save, results)
+        console.log(f"✓ Saved results to {namespace.save}")
+    if namespace.baseline:
+        regressions = compare(results, namespace.baseline, namespace.threshold)
+        for regression in regressions:
+            console.log(
+                f"𐄂 {regression.route} {regression.metric} regressed by {regression.change:+.0%} "
+                f"({regression.baseline:.2f} → {regression.current:.2f})"
+            )
+        if regressions:
+            sys.exit(1)
+        console.log(f"✓ No regressions beyond {namespace.threshold:.0%} of {namespace.baseline}")
+
+
+def startup(namespace: Namespace) -> None:
+    """Report what a compiled app spends its cold start importing"""
+    _require_built(namespace.py)
+
+    from .importtime import measure_imports  # pylint: disable=import-outside-toplevel
+
+    with console.status(f"Starting {namespace.py} with -X importtime..."):
+        report = measure_imports(
+            f"import runpy; runpy.run_path({namespace.py!r}, run_name='__spylt_startup__')"
+        )
+
+    console.log(
+        f"✓ Loaded {namespace.py} in {report.seconds:.2f}s, "
+        f"{report.import_seconds:.2f}s of it importing"
+    )
+    console.log(f"  {'imported by the app':<32} {'total ms':>9} {'self ms':>9}")
+    for entry in report.top_level(namespace.top):
+        console.log(
+            f"  {entry.module:<32} {entry.cumulative_us / 1000:9.1f} {entry.self_us / 1000:9.1f}"
+        )
+    console.log(f"  {'by package':<32} {'self ms':>9}")
+    for package, self_us in report.packages(namespace.top):
+        console.log(f"  {package:<32} {self_us / 1000:9.1f}")
+
+
+def profile_token(namespace: Namespace) -> None:
+    """Print a header value which profiles requests to a running app"""
+    from .profiling import HEADER, create_token  # pylint: disable=import-outside-toplevel
+
+    key = namespace.key or os.environ.get("SPYLT_PROFILE_KEY")
+    if not key:
+        console.log(_markdown("𐄂 Pass `--key` or set `SPYLT_PROFILE_KEY` to the server's key"))
+        sys.exit(1)
+    print(f"{HEADER}: {create_token(key, namespace.ttl)}")
+
+
 def create_cli() -> ArgumentParser:
     """Create an argparse CLI"""
     parser = ArgumentParser(
@@ -207,6 +407,12 @@ def create_cli() -> ArgumentParser:
 
     parser_new = subparsers.add_parser("new", help="Initialize a new Spylt project")
     parser_new.add_argument("directory", help="Directory to clone the project to")
+    parser_new.add_argument(
+        "--mode",
+        help="Interface mode the scaffolded Svelte code is written for",
+        choices=INTERFACE_MODES,
+        default="sync",
+    )
     parser_new.set_defaults(func=new)
 
     parser_build = subparsers.add_parser(
@@ -218,6 +424,48 @@ def create_cli() -> ArgumentParser:
     parser_build.add_argument(
         "--py", help="Path to output compiled Python API", default="main.py"
     )
+    parser_build.add_argument(
+        "--output",
+        help=(
+            "Inline the bundle into the HTML page, or write content-hashed "
+            "bundle files which browsers can cache for good"
+        ),
+        choices=("inline", "hashed"),
+        default="inline",
+    )
+    parser_build.add_argument(
+        "--assets", help="Directory to write hashed bundle files to", default="assets"
+    )
+    parser_build.add_argument(
+        "--jobs",
+        "-j",
+        help="Pages to bundle at once (defaults to the number of CPUs)",
+        type=int,
+    )
+    parser_build.add_argument(
+        "--metrics",
+        help="Time every request, with a /metrics endpoint and Server-Timing headers",
+        action="store_true",
+    )
+    parser_build.add_argument(
+        "--slow-request-ms",
+        help="With --metrics, log requests which take longer than this",
+        type=float,
+        default=1000,
+    )
+    parser_build.add_argument(
+        "--lazy-imports",
+        help="Import the modules used by backend functions when they're first called",
+        action="store_true",
+    )
+    parser_build.add_argument(
+        "--warm-imports",
+        help="With --lazy-imports, import them in the background once the server starts",
+        action="store_true",
+    )
+    parser_build.add_argument(
+        "--no-cache", help="Rebuild every stage, ignoring .spylt-cache", action="store_true"
+    )
     parser_build.set_defaults(func=build)
 
     parser_interface = subparsers.add_parser(
@@ -226,6 +474,138 @@ def create_cli() -> ArgumentParser:
     parser_interface.add_argument(
         "--out", "-o", help="Path to output JavaScript interface", default="src/api.js"
     )
+    parser_interface.add_argument(
+        "--mode",
+        help=(
+            "Create blocking (sync) wrappers, Promise-returning (async) wrappers, or "
+            "Promise-returning wrappers whose calls share /api/_batch requests (batch)"
+        ),
+        choices=INTERFACE_MODES,
+        default="sync",
+    )
+    parser_interface.add_argument(
+        "--no-cache", help="Recreate the interface, ignoring .spylt-cache", action="store_true"
+    )
     parser_interface.set_defaults(func=interface)
 
+    parser_dev = subparsers.add_parser(
+        "dev", help="Serve the app and rebuild it whenever the source changes"
+    )
+    parser_dev.add_argument(
+        "--html", help="Path to output compiled HTML", default="index.html"
+    )
+    parser_dev.add_argument(
+        "--py", help="Path to output compiled Python API", default="main.py"
+    )
+    parser_dev.add_argument(
+        "--out", "-o", help="Path to output JavaScript interface", default="src/api.js"
+    )
+    parser_dev.add_argument(
+        "--mode",
+        help="Interface mode to generate src/api.js with",
+        choices=INTERFACE_MODES,
+        default="sync",
+    )
+    parser_dev.set_defaults(func=dev)
+
+    parser_serve = subparsers.add_parser(
+        "serve", help="Serve a compiled app in production with several worker processes"
+    )
+    parser_serve.add_argument(
+        "--py", help="Path to the compiled Python API", default="main.py"
+    )
+    parser_serve.add_argument(
+        "--workers",
+        "-w",
+        help="Worker processes to serve with (defaults to the number of CPUs)",
+        type=int,
+        default=os.cpu_count() or 1,
+    )
+    parser_serve.add_argument(
+        "--bind",
+        "-b",
+        help="Address to listen on, as host:port or unix:path. Can be given several times",
+        action="append",
+    )
+    parser_serve.add_argument(
+        "--keep-alive",
+        help="Seconds to keep idle connections open",
+        type=float,
+        default=5,
+    )
+    parser_serve.add_argument(
+        "--backlog", help="Connections to queue before refusing more", type=int, default=2048
+    )
+    parser_serve.add_argument(
+        "--graceful-timeout",
+        help="Seconds to let in-flight requests finish when workers stop",
+        type=float,
+        default=30,
+    )
+    parser_serve.add_argument(
+        "--no-preload",
+        help="Load the app in every worker instead of once before forking them",
+        action="store_true",
+    )
+    parser_serve.set_defaults(func=serve)
+
+    parser_bench = subparsers.add_parser(
+        "bench", help="Measure the throughput and latency of a compiled app's routes"
+    )
+    parser_bench.add_argument(
+        "--py", help="Path to the compiled Python API", default="main.py"
+    )
+    parser_bench.add_argument(
+        "--url",
+        help="Benchmark a running server, such as http://127.0.0.1:8000, instead of the test client",
+    )
+    parser_bench.add_argument(
+        "--route", help="Route to benchmark. Can be given several times", action="append"
+    )
+    parser_bench.add_argument(
+        "--fixtures", help="JSON file of arguments to call routes with, by route name"
+    )
+    parser_bench.add_argument(
+        "--requests", "-n", help="Requests to measure per route", type=int, default=200
+    )
+    parser_bench.add_argument(
+        "--concurrency", "-c", help="Requests in flight at once", type=int, default=10
+    )
+    parser_bench.add_argument(
+        "--warmup", help="Requests per route sent before measuring", type=int, default=10
+    )
+    parser_bench.add_argument("--save", help="Write the results to a JSON file")
+    parser_bench.add_argument(
+        "--baseline", help="Results saved with --save to compare against"
+    )
+    parser_bench.add_argument(
+        "--threshold",
+        help="Change from the baseline which counts as a regression",
+        type=float,
+        default=0.1,
+    )
+    parser_bench.set_defaults(func=bench)
+
+    parser_startup = subparsers.add_parser(
+        "startup", help="Report which imports slow down a compiled app's cold start"
+    )
+    parser_startup.add_argument(
+        "--py", help="Path to the compiled Python API", default="main.py"
+    )
+    parser_startup.add_argument(
+        "--top", help="Number of imports and packages to list", type=int, default=10
+    )
+    parser_startup.set_defaults(func=startup)
+
+    parser_token = subparsers.add_parser(
+        "profile-token", help="Create a signed header which profiles requests to a compiled app"
+    )
+    parser_token.add_argument(
+        "--key", help="Secret the server was started with (defaults to $SPYLT_PROFILE_KEY)"
+    )
+    parser_token.add_argument(
+        "--ttl", help="Seconds the header is valid for", type=float, default=600
+    )
+    parser_token.set_defaults(func=profile_token)
+
     return parser
@@ -0,0 +1,52 @@
+"""
+DataFrames which workers of a compiled app can share. Arrow IPC files are
+memory-mapped, so the numeric columns of every worker read the same pages of
+the operating system's file cache instead of each holding a copy. Needs pyarrow
+"""
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import os
+
+# Extensions of files read by memory-mapping them
+MAPPED = (".arrow", ".feather", ".ipc")
+
+
+def write_frame(frame: Any, path: str) -> None:
+    """
+    Write a DataFrame as an uncompressed Arrow IPC file, which :func:`read_frame`
+    can memory-map. Compressed files would have to be decompressed into memory
+    """
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_frame(path: str, columns: Optional[list[str]] = None) -> Any:
+    """
+    Read a DataFrame from an Arrow IPC or Parquet file. Arrow files are memory-mapped,
+    and only numeric columns without nulls point into the mapping. pandas copies
+    string, object and nullable columns, and any column stored in several chunks,
+    into the process's memory. Parquet files are decoded into it entirely
+    """
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    elif extension in MAPPED:
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        if columns is not None:
+            table = table.select(columns)
+    else:
+        raise ValueError(
+            f"Can't read '{path}'. Expected a .parquet file or one of {', '.join(MAPPED)}"
+        )
+    # One block per column, so pandas doesn't copy columns to consolidate them
+    return table.to_pandas(split_blocks=True)
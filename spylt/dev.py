@@ -0,0 +1,164 @@
+"""
+Watch mode behind `spylt dev`. Rollup runs once in watch mode and keeps
+its module cache warm, while Python changes only rebuild the API and interface
+"""
+from __future__ import annotations
+
+from typing import Callable
+
+import os
+import subprocess
+import sys
+import time
+
+from . import builder
+from .cache import CACHE_DIR, source_files, write_if_changed
+from .pages import Page, Project, discover_pages
+
+DEV_DIR = os.path.join(CACHE_DIR, "dev")
+
+
+def snapshot(files: list[str]) -> dict[str, int]:
+    """Modification times of the files which exist"""
+    stamps = {}
+    for file in files:
+        try:
+            stamps[file] = os.stat(file).st_mtime_ns
+        except FileNotFoundError:
+            pass
+    return stamps
+
+
+def changed(before: dict[str, int], after: dict[str, int]) -> set[str]:
+    """Files which were added, removed or modified between two snapshots"""
+    return {file for file in before.keys() | after.keys() if before.get(file) != after.get(file)}
+
+
+class DevServer:
+    """Rebuilds only what a change affects and restarts the Quart server when its code changes"""
+
+    def __init__(
+        self,
+        py: str,
+        html: str,
+        interface: str,
+        mode: str,
+        log: Callable[[str], None],
+        interval: float = 0.25,
+    ) -> None:
+        self.py = py
+        self.html = html
+        self.interface = interface
+        self.mode = mode
+        self.log = log
+        self.interval = interval
+        # Pages are found once. Restart `spylt dev` after adding one
+        self.pages = discover_pages("src")
+        self._rollups: list[subprocess.Popen] = []
+        self._server: subprocess.Popen | None = None
+
+    def _directory(self, page: Page) -> str:
+        return os.path.join(DEV_DIR, page.slug)
+
+    def _bundle(self, page: Page) -> list[str]:
+        return [os.path.join(self._directory(page), name) for name in ("bundle.js", "bundle.css")]
+
+    def rebuild_backend(self) -> bool:
+        """Re-run the pages' modules and regenerate the API, interface and linkers. Returns whether the API changed"""
+        start = time.time()
+        project = Project(self.pages, self.html)
+
+        api_changed = write_if_changed(self.py, project.create_api())
+        interface, _ = project.create_interface(self.mode)
+        write_if_changed(self.interface, interface)
+        for page in self.pages:
+            os.makedirs(self._directory(page), exist_ok=True)
+            # Rollup resolves imports relative to the linker, which lives in DEV_DIR
+            write_if_changed(
+                os.path.join(self._directory(page), "main.js"),
+                project.create_linker(page, os.path.abspath(page.svelte)),
+            )
+
+        self.log(f"✓ Backend and interface rebuilt in {time.time() - start:.2f}s")
+        return api_changed
+
+    def assemble(self, page: Page) -> None:
+        """Inline the latest rollup output of a page into its HTML"""
+        js, css = builder.read_bundle(self._directory(page))
+        if js is not None and write_if_changed(page.html(self.html), builder.assemble_html(js, css)):
+            self.log(f"✓ Frontend bundle of {page.url} updated")
+
+    def start_rollup(self) -> None:
+        for page in self.pages:
+            self._rollups.append(
+                subprocess.Popen(
+                    [
+                        "npx",
+                        "rollup",
+                        "--config",
+                        "--watch",
+                        "--input",
+                        os.path.join(self._directory(page), "main.js"),
+                        "--file",
+                        self._bundle(page)[0],
+                    ],
+                    env={**os.environ, "SPYLT_DEV": "1"},
+                )
+            )
+
+    def restart_server(self) -> None:
+        self._stop(self._server)
+        # The page changes while the server runs, so it shouldn't be held in memory
+        self._server = subprocess.Popen(
+            [sys.executable, self.py], env={**os.environ, "SPYLT_DEV": "1"}
+        )
+        self.log(f"✓ Serving {self.py}")
+
+    def run(self) -> None:
+        """Build everything once, then watch src/ until interrupted"""
+        self.rebuild_backend()
+        self.start_rollup()
+        self.restart_server()
+
+        sources = snapshot(self._sources())
+        # Empty, so whichever bundle rollup writes first is assembled
+        bundles: dict[str, dict[str, int]] = {page.name: {} for page in self.pages}
+        try:
+            while True:
+                time.sleep(self.interval)
+                if any(rollup.poll() is not None for rollup in self._rollups):
+                    raise RuntimeError("Rollup exited. Is it installed in this project?")
+
+                current = snapshot(self._sources())
+                edits = changed(sources, current)
+                sources = current
+                # Rollup watches Svelte and JS files itself, so only Python needs work here
+                if any(file.endswith(".py") for file in edits):
+                    try:
+                        if self.rebuild_backend():
+                            self.restart_server()
+                    except Exception as exc:  # pylint: disable=broad-except
+                        self.log(f"𐄂 Couldn't rebuild the backend: {type(exc).__name__}: {exc}")
+
+                for page in self.pages:
+                    current = snapshot(self._bundle(page))
+                    if changed(bundles[page.name], current):
+                        self.assemble(page)
+                    bundles[page.name] = current
+        finally:
+            self._stop(self._server)
+            for rollup in self._rollups:
+                self._stop(rollup)
+
+    def _sources(self) -> list[str]:
+        interface = os.path.abspath(self.interface)
+        return [file for file in source_files("src") if os.path.abspath(file) != interface]
+
+    @staticmethod
+    def _stop(process: subprocess.Popen | None) -> None:
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
@@ -8,3 +8,7 @@ class TypesNotDefinedError(Exception):
 
 class NoRoutesDefinedError(Exception):
     "Raised when routes are not defined for the backend API"
+
+
+class FrameQueryError(ValueError):
+    "Raised when a DataFrame route is queried with invalid columns, sorting or filters"
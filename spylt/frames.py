@@ -0,0 +1,228 @@
+"""Encoding and querying DataFrames returned by backend functions"""
+from __future__ import annotations
+
+from typing import Any, Callable, Mapping
+
+import base64
+import json
+import operator
+import threading
+from collections import OrderedDict
+from hashlib import sha1
+
+from .exceptions import FrameQueryError
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+TRANSPORTS = ("records", "columnar", "arrow")
+# HTML tables kept by render_table, keyed on a hash of the frame's contents
+TABLE_CACHE_ENTRIES = 32
+
+_tables: OrderedDict[str, str] = OrderedDict()
+# Routes encode frames on executor threads, which share the cache
+_tables_lock = threading.Lock()
+
+
+def _encode_column(series: Any) -> dict[str, Any]:
+    """Encode numeric columns as base64 typed arrays and everything else as a list"""
+    kind = series.dtype.kind
+    # NaN survives a float64 array, but not an int or bool one
+    if kind == "f" or (kind in "iub" and not series.hasnans):
+        if kind == "b":
+            dtype = "uint8"
+        elif kind in "iu" and (series.empty or -(2**31) <= series.min() <= series.max() < 2**31):
+            dtype = "int32"
+        else:
+            dtype = "float64"
+        values = series.to_numpy(dtype=dtype)
+        if values.dtype.byteorder == ">":
+            values = values.byteswap()
+        return {"dtype": dtype, "base64": base64.b64encode(values.tobytes()).decode("ascii")}
+    values = series.astype(object).where(series.notna(), None).tolist()
+    return {"dtype": "object", "values": values}
+
+
+def encode_columns(frame: Any) -> dict[str, Any]:
+    """Encode a DataFrame as columnar JSON which the generated interface decodes"""
+    return {
+        "columns": [str(column) for column in frame.columns],
+        "length": len(frame),
+        "data": {str(column): _encode_column(frame[column]) for column in frame.columns},
+    }
+
+
+def has_arrow() -> bool:
+    """Whether pyarrow can be used to send Arrow IPC streams"""
+    try:
+        import pyarrow  # pylint: disable=unused-import,import-outside-toplevel
+    except ImportError:
+        return False
+    return True
+
+
+def encode_arrow(frame: Any) -> bytes:
+    """Encode a DataFrame as an Arrow IPC stream"""
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def frame_digest(frame: Any) -> str | None:
+    """Hash of a DataFrame's columns and values, or None if its values can't be hashed"""
+    from pandas.util import hash_pandas_object  # pylint: disable=import-outside-toplevel
+
+    try:
+        rows = hash_pandas_object(frame, index=False).to_numpy()
+    except TypeError:
+        # Cells holding lists or dicts
+        return None
+    digest = sha1(json.dumps([str(column) for column in frame.columns]).encode())
+    digest.update(rows.tobytes())
+    return digest.hexdigest()
+
+
+def render_table(frame: Any) -> str:
+    """
+    Render a DataFrame as an HTML table. Rendering costs more than hashing,
+    so the most recent tables are kept and reused for frames with the same contents
+    """
+    from json2html import json2html  # pylint: disable=import-outside-toplevel
+
+    key = frame_digest(frame)
+    if key is not None:
+        with _tables_lock:
+            if key in _tables:
+                _tables.move_to_end(key)
+                return _tables[key]
+    # Rendered outside the lock, so other threads aren't kept waiting
+    table = json2html.convert(frame.to_json(orient="records"))
+    if key is not None:
+        with _tables_lock:
+            _tables[key] = table
+            while len(_tables) > TABLE_CACHE_ENTRIES:
+                _tables.popitem(last=False)
+    return table
+
+
+def encode_records(frame: Any, table: bool = False) -> dict[str, Any]:
+    """
+    Encode a DataFrame as JSON records. ``table`` adds an HTML table, which
+    wrappers otherwise render in the browser when it's used
+    """
+    encoded = {"response": frame.to_dict(orient="records")}
+    if table:
+        encoded["table"] = render_table(frame)
+    return encoded
+
+
+def encode_chunk(frame: Any, transport: str) -> Any:
+    """Encode part of a streamed DataFrame as records or columns"""
+    if transport == "records":
+        # NaN isn't valid JSON, and streamed chunks skip Quart's encoder
+        return frame.astype(object).where(frame.notna(), None).to_dict(orient="records")
+    return encode_columns(frame)
+
+
+FILTERS: dict[str, Callable[[Any, Any], Any]] = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "in": lambda column, value: column.isin(value),
+    "contains": lambda column, value: column.astype(str).str.contains(
+        str(value), regex=False
+    ),
+}
+
+
+def _split(value: Any) -> list[str]:
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+    return [item for item in str(value).split(",") if item]
+
+
+def _check_filters(filters: Any) -> list[Any]:
+    if not isinstance(filters, list) or not all(
+        isinstance(spec, list) and len(spec) == 3 and spec[1] in FILTERS for spec in filters
+    ):
+        raise FrameQueryError(
+            f"Filters should look like [column, op, value] with op one of {', '.join(FILTERS)}"
+        )
+    return filters
+
+
+def parse_frame_query(args: Mapping[str, Any]) -> dict[str, Any]:
+    """
+    Read projection, sorting, filtering and pagination from request arguments:
+    ``_columns=a,b``, ``_sort=-a,b``, ``_filters=[["a", "gt", 1]]``, ``_offset`` and ``_limit``.
+    ``_table=1`` asks for an HTML table along with records
+    """
+    query: dict[str, Any] = {}
+    if str(args.get("_table", "")).lower() in ("1", "true"):
+        query["table"] = True
+    try:
+        if args.get("_columns") is not None:
+            query["columns"] = _split(args["_columns"])
+        if args.get("_sort") is not None:
+            query["sort"] = _split(args["_sort"])
+        if args.get("_filters") is not None:
+            filters = args["_filters"]
+            query["filters"] = _check_filters(
+                json.loads(filters) if isinstance(filters, str) else filters
+            )
+        if args.get("_offset") is not None:
+            query["offset"] = int(args["_offset"])
+        if args.get("_limit") is not None:
+            query["limit"] = int(args["_limit"])
+    except ValueError as exc:
+        raise FrameQueryError(f"Invalid DataFrame query: {exc}") from exc
+    if query.get("offset", 0) < 0 or query.get("limit", 0) < 0:
+        raise FrameQueryError("_offset and _limit should not be negative")
+    return query
+
+
+def apply_frame_query(frame: Any, query: Mapping[str, Any]) -> tuple[Any, dict[str, Any]]:
+    """
+    Filter, sort, paginate and project a DataFrame.
+    Returns the result with the total row count before pagination
+    """
+    columns = query.get("columns")
+    missing = [
+        name
+        for name in [
+            *(columns or []),
+            *[key.lstrip("-") for key in query.get("sort", [])],
+            *[str(spec[0]) for spec in query.get("filters", [])],
+        ]
+        if name not in frame.columns
+    ]
+    if missing:
+        raise FrameQueryError(f"Unknown columns: {', '.join(missing)}")
+
+    # parse_frame_query checked the shape of the filters
+    for column, op, value in query.get("filters", []):
+        try:
+            frame = frame[FILTERS[op](frame[column], value)]
+        except TypeError as exc:
+            raise FrameQueryError(f"Can't filter {column} by {op} {value!r}: {exc}") from exc
+    total = len(frame)
+
+    if query.get("sort"):
+        keys = query["sort"]
+        frame = frame.sort_values(
+            by=[key.lstrip("-") for key in keys],
+            ascending=[not key.startswith("-") for key in keys],
+            kind="stable",
+        )
+    offset = query.get("offset", 0)
+    limit = query.get("limit")
+    if offset or limit is not None:
+        frame = frame.iloc[offset : None if limit is None else offset + limit]
+    if columns:
+        frame = frame[columns]
+    return frame, {"total": total, "offset": offset, "limit": limit}
@@ -9,6 +9,15 @@ import re
 
 from .exceptions import PointerNotFoundError
 
+# Kinds of wrappers `spylt interface` can generate. Defined here so the CLI can offer
+# them without importing the builder
+INTERFACE_MODES = ("sync", "async", "batch")
+
+
+def page_identifier(url: str) -> str:
+    """The part of a page's URL used to name its handlers in the compiled app. Empty for /"""
+    return re.sub(r"[^0-9a-zA-Z]", "_", url.strip("/"))
+
 
 def flatten_dict(dic: dict[str, Any]) -> dict[str, Any]:
     items: list[Any] = []
@@ -0,0 +1,86 @@
+"""
+Import-time reports, from running code in a fresh interpreter with
+``python -X importtime``. Used by `spylt startup` and the CLI benchmark
+"""
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class ImportTime:
+    """Microseconds spent importing a module, by itself and with what it imports"""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+@dataclass
+class ImportReport:
+    """Every import made while running some code, and how long the run took"""
+
+    imports: list[ImportTime]
+    seconds: float
+
+    @property
+    def import_seconds(self) -> float:
+        return sum(entry.cumulative_us for entry in self.imports if entry.depth == 0) / 1e6
+
+    def top_level(self, count: int = 10) -> list[ImportTime]:
+        """The slowest imports made directly by the code, not by the modules it imported"""
+        roots = [entry for entry in self.imports if entry.depth == 0]
+        return sorted(roots, key=lambda entry: entry.cumulative_us, reverse=True)[:count]
+
+    def packages(self, count: int = 10) -> list[tuple[str, int]]:
+        """Total self time of the slowest top-level packages, in microseconds"""
+        totals: dict[str, int] = {}
+        for entry in self.imports:
+            package = entry.module.split(".")[0]
+            totals[package] = totals.get(package, 0) + entry.self_us
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def parse_importtime(output: str) -> list[ImportTime]:
+    """Parse the ``import time:`` lines which ``-X importtime`` writes to stderr"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # The header line
+            continue
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        imports.append(
+            ImportTime(
+                module=stripped,
+                self_us=int(fields[0]),
+                cumulative_us=int(fields[1]),
+                depth=(len(name) - len(stripped) - 1) // 2,
+            )
+        )
+    return imports
+
+
+def measure_imports(code: str, env: dict[str, str] | None = None) -> ImportReport:
+    """Run Python code in a new interpreter and report what it imported"""
+    start = time.time()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env={**os.environ, **(env or {})},
+        check=False,
+    )
+    seconds = time.time() - start
+    if process.returncode != 0:
+        errors = [line for line in process.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError("\n".join(errors[-20:]))
+    return ImportReport(parse_importtime(process.stderr), seconds)
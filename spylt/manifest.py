@@ -0,0 +1,319 @@
+"""
+Route analysis shared by the API and interface generators. The source file
+is parsed once with :mod:`ast` into a :class:`Manifest` which both read from
+"""
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import ast
+import textwrap
+from dataclasses import dataclass, field
+from inspect import getsource, isasyncgenfunction, isgeneratorfunction
+
+try:
+    from inspect import get_annotations  # type: ignore
+except ImportError:  # 3.8 compatibility
+    from get_annotations import get_annotations
+
+from .exceptions import NoRoutesDefinedError, TypesNotDefinedError
+
+# Imports of these packages only matter while building, so they're left out of the API
+_BUILD_PACKAGES = ("spylt", "src")
+# Except for these modules, which backend functions use at runtime
+_RUNTIME_MODULES = ("spylt.aio", "spylt.datasets")
+
+_FunctionDef = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def _is_frame(typ: Any) -> bool:
+    """Whether a type annotation is a pandas DataFrame"""
+    return getattr(typ, "__name__", None) == "DataFrame" and getattr(
+        typ, "__module__", ""
+    ).startswith("pandas")
+
+
+@dataclass
+class Route:
+    """A backend function and everything the generators need to know about it"""
+
+    name: str
+    params: list[tuple[str, Any]]
+    returns: Any
+    doc: str | None
+    body: str
+    func: Callable = field(repr=False)
+    is_async: bool = False
+    is_generator: bool = False
+    options: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def args(self) -> list[str]:
+        return [name for name, _ in self.params]
+
+    @property
+    def frame(self) -> bool:
+        """Whether the route returns (or yields chunks of) a DataFrame"""
+        return _is_frame(self.returns)
+
+    @property
+    def transport(self) -> str:
+        return self.options.get("transport", "records")
+
+    @property
+    def client_cache(self) -> Any:
+        """CachePolicy of the results the JavaScript wrapper keeps, if they're cached"""
+        return self.options.get("client_cache")
+
+    @property
+    def stream(self) -> str | None:
+        """Stream format of the route. Generators stream NDJSON unless another format is set"""
+        return self.options.get("stream") or ("ndjson" if self.is_generator else None)
+
+
+@dataclass
+class Preload:
+    """A function which loads read-only data once, before the server starts"""
+
+    name: str
+    body: str
+
+
+@dataclass
+class Hook:
+    """A function the compiled API runs in each worker as it starts or stops serving"""
+
+    name: str
+    body: str
+    is_async: bool = False
+
+
+# Kinds of hooks a module can declare, in the order they run when a worker starts
+HOOKS = ("resource", "startup", "shutdown")
+
+
+@dataclass
+class Manifest:
+    """
+    Every route of a Spylt module, plus the imports, preloads and
+    lifecycle hooks the compiled API needs
+    """
+
+    routes: list[Route]
+    imports: list[str]
+    preloads: list[Preload] = field(default_factory=list)
+    hooks: dict[str, list[Hook]] = field(default_factory=lambda: {kind: [] for kind in HOOKS})
+
+    @property
+    def frames(self) -> bool:
+        return any(route.frame for route in self.routes)
+
+
+def _imports(tree: ast.Module, source: str) -> list[str]:
+    imports = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                continue
+            modules = [node.module or ""]
+        else:
+            continue
+        if any(
+            module.split(".")[0] in _BUILD_PACKAGES and module not in _RUNTIME_MODULES
+            for module in modules
+        ):
+            continue
+        imports.append(ast.get_source_segment(source, node))
+    return imports
+
+
+def import_bindings(statement: str) -> tuple[list[str], list[str]]:
+    """The modules an import statement loads, and the names it binds"""
+    node = ast.parse(statement).body[0]
+    if isinstance(node, ast.Import):
+        modules = [alias.name for alias in node.names]
+        names = [alias.asname or alias.name.split(".")[0] for alias in node.names]
+    else:
+        assert isinstance(node, ast.ImportFrom)
+        modules = [node.module or ""]
+        names = [alias.asname or alias.name for alias in node.names]
+    return modules, names
+
+
+def used_names(body: str) -> set[str]:
+    """Every name a function body reads, including in nested functions"""
+    tree = ast.parse(f"def _():\n{body}")
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+
+
+def _returns(node: ast.AST) -> list[ast.Return]:
+    """Return statements of a function, leaving out those of nested functions and classes"""
+    found = []
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, ast.Return):
+            found.append(child)
+        if not isinstance(child, (*_FunctionDef, ast.Lambda, ast.ClassDef)):
+            found.extend(_returns(child))
+    return found
+
+
+def _body(node: ast.FunctionDef | ast.AsyncFunctionDef, source: str, wrap: bool) -> str:
+    """
+    Source of a function's body. If ``wrap`` is set,
+    returned values are wrapped as ``{"response": value}``
+    """
+    lines = source.splitlines(keepends=True)
+    starts = [0]
+    for line in lines:
+        starts.append(starts[-1] + len(line))
+
+    def offset(lineno: int, col: int) -> int:
+        # AST columns count UTF-8 bytes, not characters
+        return starts[lineno - 1] + len(lines[lineno - 1].encode()[:col].decode())
+
+    first = node.body[0]
+    start = offset(first.lineno, first.col_offset)
+    end = offset(node.end_lineno, node.end_col_offset)  # type: ignore
+    # Keep the first statement's indentation, unless it shares a line with the signature
+    prefix = lines[first.lineno - 1][: first.col_offset]
+    indent = prefix if prefix.isspace() else "    "
+
+    body = source[start:end]
+    returns = _returns(node) if wrap else []
+    for ret in sorted(returns, key=lambda ret: (ret.lineno, ret.col_offset), reverse=True):
+        value = "None"
+        if ret.value is not None:
+            value = source[
+                offset(ret.value.lineno, ret.value.col_offset) : offset(
+                    ret.value.end_lineno, ret.value.end_col_offset  # type: ignore
+                )
+            ]
+        body = (
+            body[: offset(ret.lineno, ret.col_offset) - start]
+            + f'return {{"response": {value}}}'
+            + body[offset(ret.end_lineno, ret.end_col_offset) - start :]  # type: ignore
+        )
+    return indent + body
+
+
+def _route(
+    func: Callable,
+    node: ast.FunctionDef | ast.AsyncFunctionDef,
+    source: str,
+    options: dict[str, Any],
+) -> Route:
+    annotations = get_annotations(func, eval_str=True)
+    arguments = node.args
+    names = [arg.arg for arg in (*arguments.posonlyargs, *arguments.args, *arguments.kwonlyargs)]
+    if not all(name in annotations for name in names):
+        raise TypesNotDefinedError(
+            f"Arguments of {node.name}() need type annotations so they can be cast"
+        )
+    generator = isgeneratorfunction(func) or isasyncgenfunction(func)
+    return Route(
+        name=node.name,
+        params=[(name, annotations[name]) for name in names],
+        returns=annotations.get("return"),
+        doc=ast.get_docstring(node),
+        body=_body(node, source, wrap=not generator),
+        func=func,
+        is_async=isinstance(node, ast.AsyncFunctionDef),
+        is_generator=generator,
+        options=options,
+    )
+
+
+def _node(
+    func: Callable, source: str, defined: dict[str, ast.FunctionDef | ast.AsyncFunctionDef]
+) -> tuple[ast.FunctionDef | ast.AsyncFunctionDef, str]:
+    """The AST of a function, and the source its positions refer to"""
+    node = defined.get(func.__name__)
+    if node is not None:
+        return node, source
+    # Defined somewhere other than the module's top level
+    func_source = textwrap.dedent(getsource(func))
+    return next(n for n in ast.parse(func_source).body if isinstance(n, _FunctionDef)), func_source
+
+
+def _without_arguments(
+    func: Callable, source: str, defined: dict[str, ast.FunctionDef | ast.AsyncFunctionDef], kind: str
+) -> tuple[ast.FunctionDef | ast.AsyncFunctionDef, str]:
+    node, func_source = _node(func, source, defined)
+    arguments = node.args
+    if arguments.posonlyargs or arguments.args or arguments.kwonlyargs:
+        raise TypeError(f"{kind} function {node.name}() can't take arguments")
+    return node, func_source
+
+
+def build_manifest(
+    functions: list[Callable],
+    source_file: str,
+    options: dict[str, dict[str, Any]] | None = None,
+    preloads: list[Callable] | None = None,
+    hooks: dict[str, list[Callable]] | None = None,
+) -> Manifest:
+    """Analyze the routes of a Spylt module in one pass over its source"""
+    if not functions:
+        raise NoRoutesDefinedError()
+    options = options or {}
+
+    with open(source_file, encoding="utf-8") as fh:
+        source = fh.read()
+    tree = ast.parse(source, source_file)
+    defined = {node.name: node for node in tree.body if isinstance(node, _FunctionDef)}
+
+    routes = []
+    for func in functions:
+        node, func_source = _node(func, source, defined)
+        routes.append(_route(func, node, func_source, options.get(func.__name__, {})))
+
+    loaded = []
+    for func in preloads or []:
+        node, func_source = _without_arguments(func, source, defined, "Preload")
+        loaded.append(Preload(node.name, _body(node, func_source, wrap=False)))
+
+    lifecycle: dict[str, list[Hook]] = {kind: [] for kind in HOOKS}
+    for kind, funcs in (hooks or {}).items():
+        for func in funcs:
+            node, func_source = _without_arguments(func, source, defined, kind.capitalize())
+            lifecycle[kind].append(
+                Hook(
+                    node.name,
+                    _body(node, func_source, wrap=False),
+                    isinstance(node, ast.AsyncFunctionDef),
+                )
+            )
+    return Manifest(routes, _imports(tree, source), loaded, lifecycle)
+
+
+def _unique(kind: str, found: dict[str, Any], items: list[Any]) -> None:
+    """Add named items to ``found``, allowing pages to share modules but not names"""
+    for item in items:
+        if item.name in found and found[item.name] != item:
+            raise ValueError(f"More than one page defines a {kind} named '{item.name}'")
+        found[item.name] = item
+
+
+def merge_manifests(manifests: list[Manifest]) -> Manifest:
+    """Combine the routes of several modules into one backend"""
+    routes: dict[str, Route] = {}
+    imports: list[str] = []
+    preloads: dict[str, Preload] = {}
+    hooks: dict[str, dict[str, Hook]] = {kind: {} for kind in HOOKS}
+    for manifest in manifests:
+        _unique("preload", preloads, manifest.preloads)
+        for kind in HOOKS:
+            _unique(f"{kind} function", hooks[kind], manifest.hooks[kind])
+        for route in manifest.routes:
+            if route.name in routes and routes[route.name].func is not route.func:
+                raise ValueError(f"More than one page defines a route named '{route.name}'")
+            routes[route.name] = route
+        imports.extend(line for line in manifest.imports if line not in imports)
+    return Manifest(
+        list(routes.values()),
+        imports,
+        list(preloads.values()),
+        {kind: list(found.values()) for kind, found in hooks.items()},
+    )
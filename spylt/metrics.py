@@ -0,0 +1,194 @@
+"""
+Request instrumentation for apps compiled with `spylt build --metrics`. Every
+request is timed in parse, compute and serialize phases, which are sent in a
+``Server-Timing`` header and aggregated per route for a Prometheus ``/metrics`` endpoint
+"""
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import logging
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ("parse", "compute", "serialize")
+PROMETHEUS_MIME = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger("spylt.slow")
+
+
+class Timings:
+    """Time spent in each phase of one request, measured between calls to :meth:`mark`"""
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self.start = self._last = perf_counter()
+        self.phases: dict[str, float] = {}
+
+    def mark(self, phase: str) -> None:
+        """Attribute the time since the previous mark to ``phase``"""
+        now = perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def total(self) -> float:
+        return perf_counter() - self.start
+
+    def header(self, total: float) -> str:
+        """A ``Server-Timing`` header value, in milliseconds"""
+        return ", ".join(
+            f"{phase};dur={seconds * 1000:.2f}"
+            for phase, seconds in [*self.phases.items(), ("total", total)]
+        )
+
+
+class _NoTimings(Timings):
+    """Stands in for :class:`Timings` in apps which aren't instrumented"""
+
+    enabled = False
+
+    def __init__(self) -> None:  # pylint: disable=super-init-not-called
+        pass
+
+    def mark(self, phase: str) -> None:
+        pass
+
+
+NO_TIMINGS = _NoTimings()
+
+
+def current_timings() -> Timings:
+    """Timings of the request being handled, if the app is instrumented"""
+    from quart import g  # pylint: disable=import-outside-toplevel
+
+    return getattr(g, "spylt_timings", NO_TIMINGS)
+
+
+class _RouteStats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.seconds = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+
+
+class Metrics:
+    """
+    Request counts, error counts, latency histograms and phase totals per route.
+    Requests slower than ``slow_request_ms`` are logged to the ``spylt.slow`` logger
+    """
+
+    def __init__(self, slow_request_ms: Optional[float] = None) -> None:
+        self.slow_request_ms = slow_request_ms
+        self._routes: dict[str, _RouteStats] = {}
+        self._lock = threading.Lock()
+
+    def install(self, app: Any, path: str = "/metrics") -> None:
+        """Time every request of a Quart app, except those for the metrics themselves"""
+        from quart import g, request  # pylint: disable=import-outside-toplevel
+
+        @app.before_request
+        async def start_timing_() -> None:
+            if request.path != path:
+                g.spylt_timings = Timings()
+
+        @app.after_request
+        async def finish_timing_(response: Any) -> Any:
+            timings = getattr(g, "spylt_timings", None)
+            if timings is None:
+                return response
+            total = timings.total()
+            # Rules rather than paths, so unknown URLs can't create unbounded series
+            route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+            self.observe(route, total, response.status_code >= 500, timings.phases)
+            response.headers["Server-Timing"] = timings.header(total)
+            if self.slow_request_ms is not None and total * 1000 >= self.slow_request_ms:
+                logger.warning(
+                    "Slow request %s %s took %.1f ms (%s)",
+                    request.method,
+                    request.full_path.rstrip("?"),
+                    total * 1000,
+                    timings.header(total),
+                )
+            return response
+
+    def observe(
+        self, route: str, seconds: float, error: bool, phases: dict[str, float]
+    ) -> None:
+        with self._lock:
+            stats = self._routes.setdefault(route, _RouteStats())
+            stats.requests += 1
+            stats.errors += error
+            stats.buckets[bisect_left(BUCKETS, seconds)] += 1
+            stats.seconds += seconds
+            for phase, spent in phases.items():
+                stats.phases[phase] = stats.phases.get(phase, 0.0) + spent
+
+    def render(self, coalesced: Optional[dict[str, dict[str, Any]]] = None) -> str:
+        """
+        Every metric in the Prometheus text format. ``coalesced`` adds the counters
+        of routes which coalesce calls, from :func:`spylt.runtime.coalesce_stats`
+        """
+        lines = [
+            "# HELP spylt_requests_total Requests handled, by route",
+            "# TYPE spylt_requests_total counter",
+        ]
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines.extend(f'spylt_requests_total{{route="{r}"}} {s.requests}' for r, s in routes)
+            lines.extend(
+                [
+                    "# HELP spylt_request_errors_total Requests answered with a 5xx status, by route",
+                    "# TYPE spylt_request_errors_total counter",
+                    *(f'spylt_request_errors_total{{route="{r}"}} {s.errors}' for r, s in routes),
+                    "# HELP spylt_request_duration_seconds Time to answer a request, by route",
+                    "# TYPE spylt_request_duration_seconds histogram",
+                ]
+            )
+            for route, stats in routes:
+                count = 0
+                for bound, observed in zip([*map(str, BUCKETS), "+Inf"], stats.buckets):
+                    count += observed
+                    lines.append(
+                        f'spylt_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {count}'
+                    )
+                lines.append(f'spylt_request_duration_seconds_sum{{route="{route}"}} {stats.seconds}')
+                lines.append(f'spylt_request_duration_seconds_count{{route="{route}"}} {stats.requests}')
+            lines.extend(
+                [
+                    "# HELP spylt_request_phase_seconds_total Time spent in each phase of requests, by route",
+                    "# TYPE spylt_request_phase_seconds_total counter",
+                ]
+            )
+            for route, stats in routes:
+                lines.extend(
+                    f'spylt_request_phase_seconds_total{{route="{route}",phase="{phase}"}} {spent}'
+                    for phase, spent in stats.phases.items()
+                )
+        if coalesced:
+            # Keyed by function rather than URL, since batched calls are coalesced too
+            functions = sorted(coalesced.items())
+            lines.extend(
+                [
+                    "# HELP spylt_coalesce_calls_total Calls of functions which coalesce calls",
+                    "# TYPE spylt_coalesce_calls_total counter",
+                    *(f'spylt_coalesce_calls_total{{function="{f}"}} {s["calls"]}' for f, s in functions),
+                    "# HELP spylt_coalesced_calls_total Calls which shared the result of a call already running",
+                    "# TYPE spylt_coalesced_calls_total counter",
+                    *(f'spylt_coalesced_calls_total{{function="{f}"}} {s["coalesced"]}' for f, s in functions),
+                    "# HELP spylt_coalesce_in_flight Calls running which others can share",
+                    "# TYPE spylt_coalesce_in_flight gauge",
+                    *(f'spylt_coalesce_in_flight{{function="{f}"}} {s["in_flight"]}' for f, s in functions),
+                ]
+            )
+        return "\n".join(lines) + "\n"
+
+    def respond(self, coalesced: Optional[dict[str, dict[str, Any]]] = None) -> Any:
+        from quart import Response  # pylint: disable=import-outside-toplevel
+
+        return Response(self.render(coalesced), content_type=PROMETHEUS_MIME)
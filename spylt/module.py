@@ -1,7 +1,7 @@
 """Module system to import Svelte"""
 from __future__ import annotations
 
-from typing import Callable
+from typing import Any, Callable
 from collections.abc import MutableMapping
 
 import inspect
@@ -9,9 +9,52 @@ import json
 from os.path import exists
 
 from .helpers import js_val
+from .frames import TRANSPORTS
+from .manifest import HOOKS, Manifest, build_manifest
+from .runtime import STREAM_MIMES, CachePolicy
 
 _encoder = json.JSONEncoder(ensure_ascii=False)
 
+EXECUTORS = ("thread", "process")
+
+
+def _check_options(options: dict[str, Any]) -> None:
+    """Validate options passed with @<app>(...)"""
+    for key, value in options.items():
+        if key == "executor":
+            if value is not None and value not in EXECUTORS:
+                raise ValueError(
+                    f"Unknown executor '{value}'. Expected one of {', '.join(EXECUTORS)}"
+                )
+        elif key == "max_concurrency":
+            if value is not None and (not isinstance(value, int) or value < 1):
+                raise ValueError("max_concurrency should be a positive integer")
+        elif key in ("cache", "client_cache"):
+            if value is not None and not isinstance(value, CachePolicy):
+                raise TypeError(f"{key} should be a CachePolicy")
+        elif key == "transport":
+            if value not in TRANSPORTS:
+                raise ValueError(
+                    f"Unknown transport '{value}'. Expected one of {', '.join(TRANSPORTS)}"
+                )
+        elif key == "stream":
+            if value is not None and value not in STREAM_MIMES:
+                raise ValueError(
+                    f"Unknown stream format '{value}'. Expected one of {', '.join(STREAM_MIMES)}"
+                )
+        elif key == "chunk_rows":
+            if not isinstance(value, int) or value < 1:
+                raise ValueError("chunk_rows should be a positive integer")
+        elif key == "coalesce":
+            if not isinstance(value, bool):
+                raise TypeError("coalesce should be True or False")
+        else:
+            raise TypeError(f"Unknown route option '{key}'")
+    if options.get("stream") and (options.get("cache") or options.get("client_cache")):
+        raise ValueError("Streaming routes can't be cached")
+    if options.get("stream") and options.get("coalesce"):
+        raise ValueError("Streaming routes can't coalesce calls")
+
 
 class Module:
     """Svelte component representable as Python"""
@@ -20,7 +63,12 @@ class Module:
         self._path = path
         self._props: MutableMapping[str, str] = {}
         self._apis: list[Callable] = []
+        self._preloads: list[Callable] = []
+        self._hooks: dict[str, list[Callable]] = {kind: [] for kind in HOOKS}
+        self._options: dict[str, dict[str, Any]] = {}
+        self._config: dict[str, Any] = {}
         self._file = file
+        self._manifest: Manifest | None = None
         self._linker_code: str
 
     def add_props(self, **props: str) -> Module:
@@ -32,12 +80,61 @@ class Module:
     def set_apis(self, *funcs: Callable) -> Module:
         """Set functions to work as interoping APIs (@<app>.backend is preferred)"""
         self._apis.extend(funcs)
+        self._manifest = None
+        return self
+
+    def preload(self, func: Callable) -> Callable:
+        """
+        Load read-only data once, before the server starts. Routes call the
+        function as usual, and get the same value each time. `spylt serve`
+        loads it before forking workers, so they share its memory
+        """
+        if inspect.iscoroutinefunction(func) or inspect.isasyncgenfunction(func):
+            raise TypeError(f"Preload function {func.__name__}() can't be async")
+        self._preloads.append(func)
+        self._manifest = None
+        return func
+
+    def resource(self, func: Callable) -> Callable:
+        """
+        Build a resource, like a connection pool or a model, in each worker as the
+        server starts. Routes call the function to get it. Functions which
+        ``yield`` the resource run the rest of their body as the server stops
+        """
+        self._hooks["resource"].append(func)
+        self._manifest = None
+        return func
+
+    def on_startup(self, func: Callable) -> Callable:
+        """Run a function in each worker as the server starts, once resources are built"""
+        return self._hook("startup", func)
+
+    def on_shutdown(self, func: Callable) -> Callable:
+        """Run a function in each worker as the server stops, before resources are torn down"""
+        return self._hook("shutdown", func)
+
+    def _hook(self, kind: str, func: Callable) -> Callable:
+        if inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func):
+            raise TypeError(f"The {kind} function {func.__name__}() can't be a generator")
+        self._hooks[kind].append(func)
+        self._manifest = None
+        return func
+
+    def configure(
+        self, threads: int | None = None, processes: int | None = None
+    ) -> Module:
+        """Set the worker count of the thread and process pools used by executors"""
+        self._config["threads"] = threads
+        self._config["processes"] = processes
         return self
 
-    def create_linker(self) -> str:
-        """Programmatically create a linking main.js file with any props"""
+    def create_linker(self, path: str | None = None) -> str:
+        """
+        Programmatically create a linking main.js file with any props.
+        ``path`` overrides the path the Svelte component is imported from
+        """
         _newline = "\n"
-        linker = f"""import App from '{self._path}';
+        linker = f"""import App from '{path or self._path}';
 
         const app = new App({{
             target: document.body,
@@ -60,23 +157,60 @@ class Module:
 
         builder.create_html(self._linker_code)
 
-    def create_api(self) -> str:
-        """Programmatically create an API from the functions defined"""
+    def manifest(self) -> Manifest:
+        """Analyze the routes defined, once until they change"""
+        if self._manifest is None:
+            self._manifest = build_manifest(
+                self._apis, self._file, self._options, self._preloads, self._hooks
+            )
+        return self._manifest
+
+    def create_api(self, assets: str | None = None) -> str:
+        """
+        Programmatically create an API from the functions defined.
+        ``assets`` is the directory of hashed bundle files to serve, if any
+        """
         from . import builder
 
-        api = builder.create_api(self._apis, self._file)
-        return api
+        return builder.create_api(self.manifest(), config=self._config, assets=assets)
 
-    def create_interface(self) -> tuple[str, bool]:
+    def create_interface(self, mode: str = "sync") -> tuple[str, list[str]]:
         """Create a JavaScript interface for a Spylt API"""
         from . import builder
 
-        interface, suggest = builder.create_interface(self._apis, self._file)
+        interface, suggest = builder.create_interface(self.manifest(), mode)
         return "\n\n".join(interface), suggest
 
-    def __call__(self, *args) -> Callable:
-        """Create a function which converts to a Quart API route"""
-        return self.set_apis(*args)
+    def __call__(self, *args: Callable, **options: Any) -> Any:
+        """
+        Create a function which converts to a Quart API route.
+        Use ``@<app>(executor="thread")``, ``@<app>(cache=CachePolicy(ttl=60))``
+        or ``@<app>(coalesce=True)`` to set options on the route.
+        ``@<app>(client_cache=CachePolicy(ttl=30))`` caches results in the JavaScript wrapper
+        """
+        if args and not options:
+            return self.set_apis(*args)
+        _check_options(options)
+
+        def decorator(*funcs: Callable) -> Module:
+            for func in funcs:
+                is_async = inspect.iscoroutinefunction(func) or inspect.isasyncgenfunction(func)
+                streams = inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func)
+                if is_async and options.get("executor"):
+                    raise ValueError(
+                        "Async functions are awaited on the event loop, so they can't use an "
+                        "executor. Use spylt.aio.run_sync for blocking calls inside them"
+                    )
+                if streams and options.get("executor") == "process":
+                    raise ValueError("Generator functions can't run in a process pool")
+                if streams and (options.get("cache") or options.get("client_cache")):
+                    raise ValueError("Generator functions stream, so they can't be cached")
+                if streams and options.get("coalesce"):
+                    raise ValueError("Generator functions stream, so they can't coalesce calls")
+                self._options[func.__name__] = options
+            return self.set_apis(*funcs)
+
+        return decorator(*args) if args else decorator
 
 
 def require_svelte(path: str) -> Module:
@@ -0,0 +1,200 @@
+"""
+Multi-page projects. Every Svelte file with a `<!-- point ... -->` header is a
+page with its own bundle, and the modules of all pages share one backend
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from runpy import run_path
+
+from . import builder
+from .exceptions import PointerNotFoundError
+from .helpers import find_pointer, page_identifier
+from .manifest import Manifest, merge_manifests
+from .module import Module
+
+# Served at / and written to the --html path, other pages are served at /<name>
+ROOT_PAGE = "App"
+
+
+@dataclass
+class Page:
+    """A Svelte file and the Spylt module it points to"""
+
+    svelte: str
+    pointer: str
+    name: str
+
+    @property
+    def root(self) -> bool:
+        return self.name == ROOT_PAGE
+
+    @property
+    def slug(self) -> str:
+        return self.name.lower().replace("/", "-")
+
+    @property
+    def url(self) -> str:
+        return "/" if self.root else f"/{self.name.lower()}"
+
+    @property
+    def source_file(self) -> str:
+        return self.pointer.split(":")[0]
+
+    def html(self, root_html: str) -> str:
+        """Where the page's HTML is written, next to the root page's"""
+        if self.root:
+            return root_html
+        return os.path.join(os.path.dirname(root_html), f"{self.slug}.html")
+
+
+def discover_pages(root: str = "src") -> list[Page]:
+    """Find every page under a directory, with the root page first"""
+    pages = []
+    for parent, dirs, names in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d != "node_modules")
+        for name in sorted(names):
+            if not name.endswith(".svelte"):
+                continue
+            path = os.path.join(parent, name)
+            try:
+                pointer = find_pointer(path)
+            except (PointerNotFoundError, IndexError):
+                # Components without a header are imported by pages, not pages themselves
+                continue
+            page_name = os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, "/")
+            pages.append(Page(f"./{path}", pointer, page_name))
+    pages = sorted(pages, key=lambda page: (not page.root, page.name))
+    _check_unique(pages)
+    return pages
+
+
+def _check_unique(pages: list[Page]) -> None:
+    """Pages are served, written and compiled under names derived from theirs, which can't be shared"""
+    seen: dict[str, Page] = {}
+    for page in pages:
+        for key in {page.url, page.slug, page_identifier(page.url)}:
+            other = seen.setdefault(key, page)
+            if other is not page:
+                raise ValueError(
+                    f"{other.svelte} and {page.svelte} can't both be pages, "
+                    "their names only differ in case or punctuation"
+                )
+
+
+def _bundle(linker: str, output: str, name: str) -> tuple[str, float]:
+    """Bundle one page and time it. Runs in a worker thread"""
+    start = time.time()
+    if output == "inline":
+        result = builder.create_html(linker)
+    else:
+        result = json.dumps(builder.create_assets(linker, name=name))
+    return result, time.time() - start
+
+
+class Project:
+    """The pages of a project, with their modules loaded when first needed"""
+
+    def __init__(self, pages: list[Page], html: str = "index.html") -> None:
+        self.pages = pages
+        self.html = html
+        self._contexts: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._manifest: Manifest | None = None
+
+    @property
+    def source_files(self) -> list[str]:
+        """Python files the backend is built from"""
+        return sorted({page.source_file for page in self.pages})
+
+    def module(self, page: Page) -> Module:
+        path, instance = page.pointer.split(":")
+        # Build stages run in threads, and each module file should only be run once
+        with self._lock:
+            if path not in self._contexts:
+                self._contexts[path] = run_path(path)
+        module = self._contexts[path].get(instance)
+        if not isinstance(module, Module):
+            raise RuntimeError(f"Instance of module '{instance}' does not exist.")
+        return module
+
+    def modules(self) -> list[Module]:
+        """Every distinct module, as pages may share one"""
+        modules: list[Module] = []
+        for page in self.pages:
+            module = self.module(page)
+            if not any(module is seen for seen in modules):
+                modules.append(module)
+        return modules
+
+    def manifest(self) -> Manifest:
+        if self._manifest is None:
+            self._manifest = merge_manifests([module.manifest() for module in self.modules()])
+        return self._manifest
+
+    def config(self) -> dict[str, Any]:
+        """Pool sizes of all modules, taking the largest when several set one"""
+        config: dict[str, Any] = {}
+        for module in self.modules():
+            for key, value in module._config.items():  # pylint: disable=protected-access
+                if value is not None:
+                    config[key] = max(value, config.get(key) or 0)
+        return config
+
+    def create_api(self, assets: str | None = None, **options: Any) -> str:
+        """The backend of every page. ``options`` are passed on to :func:`builder.create_api`"""
+        return builder.create_api(
+            self.manifest(),
+            config=self.config(),
+            assets=assets,
+            pages={page.url: page.html(self.html) for page in self.pages},
+            **options,
+        )
+
+    def create_interface(self, mode: str = "sync") -> tuple[str, list[str]]:
+        interface, suggest = builder.create_interface(self.manifest(), mode)
+        return "\n\n".join(interface), suggest
+
+    def create_linker(self, page: Page, path: str | None = None) -> str:
+        """Linker of a page. It imports the page's Svelte file, not the one its module was made with"""
+        return self.module(page).create_linker(path or page.svelte)
+
+    def bundle(
+        self,
+        output: str,
+        cached: dict[str, str | None],
+        workers: int | None = None,
+    ) -> dict[str, tuple[str, float, bool]]:
+        """
+        Bundle every page without a ``cached`` output, in parallel on a thread pool.
+        Returns each page's output by name, how long it took and whether it was cached
+        """
+        results: dict[str, tuple[str, float, bool]] = {}
+        missing = []
+        for page in self.pages:
+            value = cached.get(page.name)
+            if value is None:
+                missing.append(page)
+            else:
+                results[page.name] = (value, 0.0, True)
+        if len(missing) == 1:
+            page = missing[0]
+            results[page.name] = (*_bundle(self.create_linker(page), output, page.slug), False)
+        elif missing:
+            # Rollup does the work in a subprocess, so threads are enough. A process pool
+            # would be forked from a build thread, along with whatever locks it holds
+            with ThreadPoolExecutor(min(len(missing), workers or os.cpu_count() or 1)) as pool:
+                futures = {
+                    page.name: pool.submit(_bundle, self.create_linker(page), output, page.slug)
+                    for page in missing
+                }
+                for name, future in futures.items():
+                    results[name] = (*future.result(), False)
+        return results
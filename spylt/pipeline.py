@@ -0,0 +1,144 @@
+"""
+The `spylt build` pipeline. User modules are imported once, then the backend
+codegen and the rollup bundling run at the same time
+"""
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from .cache import BuildCache, source_files, write_if_changed
+from .pages import Project
+from .static import precompress
+
+# Files which the rollup bundle depends on
+BUNDLE_INPUTS = ("src", "rollup.config.js", "package.json", "package-lock.json")
+# Names of the files written by `spylt build --output hashed`, and their variants
+HASHED_ASSET = re.compile(r"^[\w-]+\.[0-9a-f]{16}\.(js|css)(\.map|\.gz|\.br)?$")
+
+
+@dataclass
+class Stage:
+    """How long a build stage took, and whether its output came from the cache"""
+
+    name: str
+    seconds: float
+    cached: bool = False
+
+
+def write_assets(directory: str, files: dict[str, str]) -> None:
+    """Write hashed bundle files and remove those of previous builds"""
+    os.makedirs(directory, exist_ok=True)
+    keep = set()
+    for name, text in files.items():
+        path = os.path.join(directory, name)
+        write_if_changed(path, text)
+        keep.add(name)
+        if not name.endswith(".map"):
+            keep.update(os.path.basename(out) for out in precompress(path))
+    for name in os.listdir(directory):
+        if HASHED_ASSET.match(name) and name not in keep:
+            os.remove(os.path.join(directory, name))
+
+
+class BuildPipeline:
+    """Builds a project's backend and pages, recording a timing for every stage"""
+
+    def __init__(
+        self,
+        project: Project,
+        cache: BuildCache,
+        output: str = "inline",
+        assets: str = "assets",
+        jobs: int | None = None,
+        api_options: dict[str, Any] | None = None,
+    ) -> None:
+        self.project = project
+        self.cache = cache
+        self.output = output
+        self.assets = assets if output == "hashed" else None
+        self.jobs = jobs
+        # Passed on to builder.create_api, such as metrics=True
+        self.api_options = api_options or {}
+        self.stages: list[Stage] = []
+
+    def run(self, py: str) -> list[Stage]:
+        """Build everything, writing the backend to ``py`` and pages next to the project's HTML"""
+        start = time.time()
+        api_key = self.cache.key(
+            "api",
+            self.project.source_files,
+            [
+                self.assets or "",
+                json.dumps(self.api_options, sort_keys=True),
+                # The backend serves each page from its HTML path, which moves with --html
+                *[
+                    page.pointer + page.name + page.html(self.project.html)
+                    for page in self.project.pages
+                ],
+            ],
+        )
+        inputs = sorted({*source_files(*BUNDLE_INPUTS), *self.project.source_files})
+        page_keys = {
+            page.name: self.cache.key("bundle", inputs, [self.output, page.pointer, page.name])
+            for page in self.project.pages
+        }
+        api = self.cache.get("api", api_key)
+        # Each page has its own cache stage so a project with many pages keeps them all
+        pages = {
+            page.name: self.cache.get(f"bundle-{page.slug}", page_keys[page.name])
+            for page in self.project.pages
+        }
+
+        if api is None or None in pages.values():
+            # Every stage reuses these modules, so apps which load data at import only do it once
+            self._timed("import", self.project.modules)
+
+        with ThreadPoolExecutor(2, thread_name_prefix="spylt-build") as pool:
+            backend = pool.submit(self._backend, py, api, api_key)
+            frontend = pool.submit(self._frontend, pages, page_keys)
+            backend.result()
+            frontend.result()
+
+        self.stages.append(Stage("total", time.time() - start))
+        return self.stages
+
+    def _timed(self, name: str, func: Callable[[], Any], cached: bool = False) -> Any:
+        start = time.time()
+        result = func()
+        self.stages.append(Stage(name, time.time() - start, cached))
+        return result
+
+    def _backend(self, py: str, api: str | None, key: str) -> None:
+        if api is None:
+            api = self._timed(
+                "api", lambda: self.project.create_api(self.assets, **self.api_options)
+            )
+            self.cache.put("api", key, api)
+        else:
+            self.stages.append(Stage("api", 0, cached=True))
+        write_if_changed(py, api)
+
+    def _frontend(self, pages: dict[str, str | None], keys: dict[str, str]) -> None:
+        results = self.project.bundle(self.output, pages, self.jobs)
+        start = time.time()
+        files = {}
+        for page in self.project.pages:
+            output, seconds, cached = results[page.name]
+            self.stages.append(Stage(f"bundle {page.url}", seconds, cached))
+            if not cached:
+                self.cache.put(f"bundle-{page.slug}", keys[page.name], output)
+            if self.assets is not None:
+                output, page_files = json.loads(output)
+                files.update(page_files)
+            write_if_changed(page.html(self.project.html), output)
+            precompress(page.html(self.project.html))
+        if self.assets is not None:
+            write_assets(self.assets, files)
+        self.stages.append(Stage("write pages", time.time() - start))
@@ -0,0 +1,228 @@
+"""
+On-demand profiling of compiled apps. Nothing is installed unless one of these
+environment variables is set when the server starts:
+
+- ``SPYLT_PROFILE``: comma-separated route names to profile, or ``*`` for all
+- ``SPYLT_PROFILE_KEY``: secret which signs ``X-Spylt-Profile`` request headers,
+  so single requests can be profiled in production (see :func:`create_token`)
+
+``SPYLT_PROFILE_RATE`` profiles only a fraction of the requests selected by
+``SPYLT_PROFILE``, ``SPYLT_PROFILE_MODE`` is ``cprofile`` (the default) or
+``sample``, and profiles are written to ``SPYLT_PROFILE_DIR``
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Optional
+
+import cProfile
+import hmac
+import itertools
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from hashlib import sha256
+
+HEADER = "X-Spylt-Profile"
+MODES = ("cprofile", "sample")
+# Seconds between stack samples in sample mode
+SAMPLE_INTERVAL = 0.001
+
+_active: ContextVar[Optional[RequestProfile]] = ContextVar("spylt_profile", default=None)
+_counter = itertools.count()
+
+
+def _sign(key: str, expires: int) -> str:
+    return hmac.new(key.encode(), str(expires).encode(), sha256).hexdigest()
+
+
+def create_token(key: str, ttl: float = 600) -> str:
+    """A value for the ``X-Spylt-Profile`` header which is valid for ``ttl`` seconds"""
+    expires = int(time.time() + ttl)
+    return f"{expires}.{_sign(key, expires)}"
+
+
+def verify_token(key: str, token: str) -> bool:
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _sign(key, int(expires)))
+
+
+def _sample(thread: int, stop: threading.Event, stacks: Counter) -> None:
+    """Count the stacks of a thread until ``stop`` is set"""
+    while not stop.wait(SAMPLE_INTERVAL):
+        frame = sys._current_frames().get(thread)  # pylint: disable=protected-access
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            )
+            frame = frame.f_back
+        if names:
+            stacks[";".join(reversed(names))] += 1
+
+
+class _Recorder:
+    """Profiles the current thread between entering and leaving it"""
+
+    def __init__(self, mode: str) -> None:
+        self.mode = mode
+        self.data: Any = None
+        self._profiler = cProfile.Profile()
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def __enter__(self) -> _Recorder:
+        if self.mode == "sample":
+            self._sampler = threading.Thread(
+                target=_sample,
+                args=(threading.get_ident(), self._stop, self._stacks),
+                daemon=True,
+            )
+            self._sampler.start()
+        else:
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self.data = dict(self._stacks)
+        else:
+            self._profiler.disable()
+            self._profiler.create_stats()
+            self.data = self._profiler.stats  # type: ignore
+
+
+def profile_call(mode: str, func: Callable, kwargs: dict[str, Any]) -> tuple[Any, Any]:
+    """
+    Call a function while profiling the thread it runs in. Returns its result and
+    the profile, which can be pickled so calls in a process pool can be profiled too
+    """
+    with _Recorder(mode) as recorder:
+        result = func(**kwargs)
+    return result, recorder.data
+
+
+async def profile_async(mode: str, func: Callable, kwargs: dict[str, Any]) -> tuple[Any, Any]:
+    """
+    Await a coroutine function while profiling the event loop's thread.
+    Other requests which run while it waits show up in the profile too
+    """
+    with _Recorder(mode) as recorder:
+        result = await func(**kwargs)
+    return result, recorder.data
+
+
+class RequestProfile:
+    """Which routes a request profiles, and the profiles written for it"""
+
+    def __init__(self, directory: str, mode: str, routes: Optional[set[str]]) -> None:
+        self.directory = directory
+        self.mode = mode
+        self.routes = routes
+        self.files: list[str] = []
+
+    def selects(self, name: str) -> bool:
+        return self.routes is None or name in self.routes
+
+    def save(self, name: str, data: Any) -> str:
+        """Write a profile as a .pstats file, or collapsed stacks for flamegraph tools"""
+        os.makedirs(self.directory, exist_ok=True)
+        stem = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_counter)}"
+        if self.mode == "sample":
+            path = os.path.join(self.directory, f"{stem}.collapsed")
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.writelines(f"{stack} {count}\n" for stack, count in sorted(data.items()))
+        else:
+            path = os.path.join(self.directory, f"{stem}.pstats")
+            with open(path, "wb") as fh:
+                marshal.dump(data, fh)
+        self.files.append(os.path.basename(path))
+        return path
+
+
+def active_profile() -> Optional[RequestProfile]:
+    """Profile of the request being handled, if it's profiled"""
+    return _active.get()
+
+
+class Profiler:
+    """Selects the requests of a Quart app to profile"""
+
+    def __init__(
+        self,
+        routes: Optional[set[str]] = None,
+        rate: float = 1.0,
+        key: Optional[str] = None,
+        mode: str = "cprofile",
+        directory: str = ".spylt-profiles",
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'. Expected one of {', '.join(MODES)}")
+        self.routes = routes
+        self.rate = rate
+        self.key = key
+        self.mode = mode
+        self.directory = directory
+
+    @classmethod
+    def from_env(cls) -> Optional[Profiler]:
+        """A profiler configured by ``SPYLT_PROFILE*`` variables, if profiling is enabled"""
+        names = os.environ.get("SPYLT_PROFILE", "").strip()
+        key = os.environ.get("SPYLT_PROFILE_KEY") or None
+        if not names and key is None:
+            return None
+        routes = (
+            None if names == "*" else {name.strip() for name in names.split(",") if name.strip()}
+        )
+        return cls(
+            routes=routes,
+            rate=float(os.environ.get("SPYLT_PROFILE_RATE", 1)),
+            key=key,
+            mode=os.environ.get("SPYLT_PROFILE_MODE", "cprofile"),
+            directory=os.environ.get("SPYLT_PROFILE_DIR", ".spylt-profiles"),
+        )
+
+    def select(self, headers: Any) -> Optional[RequestProfile]:
+        """How a request with these headers should be profiled, if at all"""
+        token = headers.get(HEADER)
+        if token is not None and self.key is not None and verify_token(self.key, token):
+            # Signed requests profile every route they call
+            return RequestProfile(self.directory, self.mode, None)
+        if self.routes == set() or random.random() >= self.rate:
+            return None
+        return RequestProfile(self.directory, self.mode, self.routes)
+
+    def install(self, app: Any) -> None:
+        from quart import request  # pylint: disable=import-outside-toplevel
+
+        @app.before_request
+        async def start_profile_() -> None:
+            _active.set(self.select(request.headers))
+
+        @app.after_request
+        async def finish_profile_(response: Any) -> Any:
+            profile = _active.get()
+            if profile is not None and profile.files:
+                response.headers[HEADER] = ", ".join(profile.files)
+            return response
+
+        @app.teardown_request
+        async def reset_profile_(_: Any) -> None:
+            _active.set(None)
+
+
+def install_profiler(app: Any) -> None:
+    """Profile the app as the environment asks, doing nothing if it doesn't"""
+    profiler = Profiler.from_env()
+    if profiler is not None:
+        profiler.install(app)
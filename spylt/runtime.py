@@ -0,0 +1,627 @@
+"""Runtime helpers imported by apps compiled with `spylt build`"""
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+import asyncio
+import inspect
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from hashlib import sha1
+from importlib import import_module
+from time import monotonic, sleep
+
+from .exceptions import FrameQueryError
+from .frames import (
+    ARROW_MIME,
+    apply_frame_query,
+    encode_chunk,
+    encode_arrow,
+    encode_columns,
+    encode_records,
+    has_arrow,
+    parse_frame_query,
+)
+from .metrics import current_timings
+from .profiling import active_profile, profile_async, profile_call
+
+_pool_sizes: Dict[str, Optional[int]] = {"thread": None, "process": None}
+_pools: Dict[str, Executor] = {}
+
+
+def configure_pools(
+    threads: Optional[int] = None, processes: Optional[int] = None
+) -> None:
+    """Set the number of workers in the thread and process pools"""
+    _pool_sizes["thread"] = threads
+    _pool_sizes["process"] = processes
+
+
+def get_pool(kind: str) -> Executor:
+    """Get (or lazily start) the shared pool for an executor kind"""
+    if kind not in _pools:
+        if kind == "thread":
+            _pools[kind] = ThreadPoolExecutor(
+                _pool_sizes["thread"], thread_name_prefix="spylt"
+            )
+        elif kind == "process":
+            _pools[kind] = ProcessPoolExecutor(_pool_sizes["process"])
+        else:
+            raise ValueError(f"Unknown executor '{kind}'")
+    return _pools[kind]
+
+
+def shutdown_pools() -> None:
+    """Shut down the thread and process pools, if they were started"""
+    for pool in _pools.values():
+        pool.shutdown(wait=False)
+    _pools.clear()
+
+
+_preloads: list = []
+
+
+class preloaded:  # pylint: disable=invalid-name
+    """
+    Wrap a function declared with @<app>.preload so it only runs once.
+    Every call after the first returns the same value
+    """
+
+    _unset = object()
+
+    def __init__(self, func: Callable[[], Any]) -> None:
+        self.func = func
+        self.value: Any = self._unset
+        self._lock = threading.Lock()
+        _preloads.append(self)
+
+    def __call__(self) -> Any:
+        if self.value is self._unset:
+            with self._lock:
+                if self.value is self._unset:
+                    self.value = self.func()
+        return self.value
+
+
+def warm_preloads() -> None:
+    """Run every preload function which hasn't run yet"""
+    for preload in _preloads:
+        preload()
+
+
+_resources: list = []
+
+
+class resource:  # pylint: disable=invalid-name
+    """
+    Wrap a function declared with @<app>.resource. :func:`start_resources` builds
+    it in each worker, and every call returns what it built. Functions which
+    ``yield`` are resumed by :func:`stop_resources` to tear the resource down
+    """
+
+    _unset = object()
+
+    def __init__(self, func: Callable[[], Any]) -> None:
+        self.func = func
+        self.value: Any = self._unset
+        self._generator: Any = None
+        _resources.append(self)
+
+    def __call__(self) -> Any:
+        if self.value is self._unset:
+            raise RuntimeError(
+                f"Resource {self.func.__name__}() is built as the server starts, "
+                "so it isn't available before then or in process pools"
+            )
+        return self.value
+
+    async def start(self) -> None:
+        if inspect.isasyncgenfunction(self.func):
+            self._generator = self.func()
+            self.value = await self._generator.__anext__()
+        elif inspect.isgeneratorfunction(self.func):
+            self._generator = self.func()
+            self.value = next(self._generator)
+        else:
+            value = self.func()
+            self.value = await value if inspect.isawaitable(value) else value
+
+    async def stop(self) -> None:
+        generator, self._generator = self._generator, None
+        self.value = self._unset
+        if generator is None:
+            return
+        try:
+            if inspect.isasyncgen(generator):
+                await generator.__anext__()
+            else:
+                next(generator)
+        except (StopIteration, StopAsyncIteration):
+            return
+        raise RuntimeError(f"Resource {self.func.__name__}() should only yield once")
+
+
+async def start_resources() -> None:
+    """Build every resource, in the order they were declared"""
+    for declared in _resources:
+        await declared.start()
+
+
+async def stop_resources() -> None:
+    """
+    Tear resources down in the reverse order they were built. One failing
+    doesn't stop the others from being torn down
+    """
+    error: Optional[BaseException] = None
+    for declared in reversed(_resources):
+        try:
+            await declared.stop()
+        except Exception as exc:  # pylint: disable=broad-except
+            error = error or exc
+    if error is not None:
+        raise error
+
+
+async def run_hooks(hooks: list[Callable[[], Any]]) -> None:
+    """Call functions declared with @<app>.on_startup or on_shutdown in order"""
+    for hook in hooks:
+        result = hook()
+        if inspect.isawaitable(result):
+            await result
+
+
+# Seconds warm_imports waits, so the server can start listening first
+WARM_IMPORTS_DELAY = 1.0
+
+
+def warm_imports(modules: list[str], delay: float = WARM_IMPORTS_DELAY) -> threading.Thread:
+    """
+    Import the modules an app defers on a background thread, so the first
+    requests which need them don't wait. Requests which need a module while it's
+    being imported wait for that import instead of starting another
+    """
+
+    def run() -> None:
+        sleep(delay)
+        for module in modules:
+            try:
+                import_module(module)
+            except Exception:  # pylint: disable=broad-except
+                # The route which imports it reports the error when it's called
+                pass
+
+    thread = threading.Thread(target=run, name="spylt-warm-imports", daemon=True)
+    thread.start()
+    return thread
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    Cache a route's responses in memory, keyed on its arguments.
+    Entries expire after ``ttl`` seconds (never if None) and the least
+    recently used entry is evicted past ``max_entries``
+    """
+
+    ttl: Optional[float] = None
+    max_entries: int = 1024
+
+    @property
+    def cache_control(self) -> str:
+        """Cache-Control header sent with cached responses"""
+        if self.ttl is None:
+            return "no-cache"
+        return f"max-age={int(self.ttl)}"
+
+
+@dataclass
+class CacheEntry:
+    """A cached response, serialized once when it is stored"""
+
+    payload: Any
+    body: bytes
+    etag: str
+    expires: Optional[float]
+    content_type: str = "application/json"
+
+
+class ResponseCache:
+    """Bounded TTL/LRU cache of route responses with hit and miss counters"""
+
+    def __init__(self, policy: CachePolicy) -> None:
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Get a live entry and mark it as recently used"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires is not None and entry.expires < monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(
+        self, key: str, payload: Any, body: Optional[bytes] = None, content_type: str = "application/json"
+    ) -> CacheEntry:
+        """Serialize and store a payload, evicting the least recently used entries"""
+        if body is None:
+            body = json.dumps(payload, default=str).encode("utf-8")
+        entry = CacheEntry(
+            payload,
+            body,
+            f'"{sha1(body).hexdigest()}"',
+            None if self.policy.ttl is None else monotonic() + self.policy.ttl,
+            content_type,
+        )
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.policy.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> dict[str, Any]:
+        """Hit and miss counters for checking whether the cache pays off"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _cache_key(kwargs: dict[str, Any]) -> str:
+    return json.dumps(kwargs, sort_keys=True, default=repr)
+
+
+STREAM_MIMES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+def _format_message(message: dict[str, Any], stream: Optional[str]) -> str:
+    data = json.dumps(message, default=str, allow_nan=False)
+    return f"data: {data}\n\n" if stream == "sse" else f"{data}\n"
+
+
+def _retrieve(flight: asyncio.Future) -> None:
+    """Mark a flight's error as seen, in case every caller waiting on it went away"""
+    if not flight.cancelled():
+        flight.exception()
+
+
+class RoutePolicy:
+    """
+    How a backend function is run: inline, in a thread pool or in a process pool,
+    whether concurrent calls are coalesced, whether its responses are cached and
+    how returned DataFrames are sent
+    """
+
+    def __init__(
+        self,
+        executor: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        cache: Optional[CachePolicy] = None,
+        transport: str = "records",
+        frame: bool = False,
+        stream: Optional[str] = None,
+        chunk_rows: int = 10_000,
+        coalesce: bool = False,
+    ) -> None:
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.cache = None if cache is None else ResponseCache(cache)
+        self.transport = transport
+        self.frame = frame
+        self.stream = stream
+        self.chunk_rows = chunk_rows
+        self.coalesce = coalesce
+        self.calls = 0
+        self.coalesced = 0
+        self._flights: dict[str, asyncio.Future] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __call__(
+        self,
+        func: Callable,
+        kwargs: dict[str, Any],
+        offload: bool = False,
+        query: Optional[dict[str, Any]] = None,
+    ) -> Any:
+        """
+        Run a backend function according to the policy and get a JSON payload.
+        ``offload`` runs inline functions on the default executor instead
+        """
+        query = query or {}
+        if self.cache is None:
+            return self._encode(await self._compute(func, offload, kwargs), query)
+        return (await self._cached(func, offload, kwargs, query, False)).payload
+
+    async def respond(self, func: Callable, /, **kwargs: Any) -> Any:
+        """
+        Run a backend function for a Quart route. Cached routes send an ETag
+        and answer conditional requests with 304 Not Modified
+        """
+        from quart import Response, current_app, request  # pylint: disable=import-outside-toplevel
+
+        timings = current_timings()
+        try:
+            query = parse_frame_query(request.args) if self.frame else {}
+        except FrameQueryError as exc:
+            return {"error": str(exc)}, 400
+        timings.mark("parse")
+        if self.stream is not None:
+            return Response(
+                self._stream(func, kwargs, query),
+                content_type=STREAM_MIMES[self.stream],
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+        arrow = (
+            self.transport == "arrow"
+            and ARROW_MIME in request.headers.get("Accept", "")
+            and has_arrow()
+        )
+
+        try:
+            if self.cache is None:
+                payload = await self._compute(func, False, kwargs)
+                timings.mark("compute")
+                if arrow:
+                    frame, meta = apply_frame_query(payload["response"], query)
+                    headers = {"X-Total-Count": str(meta["total"])}
+                    body = encode_arrow(frame)
+                    timings.mark("serialize")
+                    return Response(body, content_type=ARROW_MIME, headers=headers)
+                if not timings.enabled:
+                    return self._encode(payload, query)
+                # Build the JSON response here instead of in Quart, so it's timed
+                response = current_app.json.response(self._encode(payload, query))
+                timings.mark("serialize")
+                return response
+            entry = await self._cached(func, False, kwargs, query, arrow)
+            # Misses are encoded as they're cached, so the time is counted as compute
+            timings.mark("compute")
+        except FrameQueryError as exc:
+            return {"error": str(exc)}, 400
+
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": self.cache.policy.cache_control,
+            "Vary": "Accept",
+        }
+        if arrow:
+            headers["X-Total-Count"] = str(entry.payload["total"])
+        matches = [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]
+        if entry.etag in matches or "*" in matches:
+            return Response("", status=304, headers=headers)
+        return Response(entry.body, content_type=entry.content_type, headers=headers)
+
+    async def _stream(
+        self, func: Callable, kwargs: dict[str, Any], query: dict[str, Any]
+    ) -> AsyncIterator[str]:
+        """Send each message as an NDJSON line or a server-sent event"""
+        if self._semaphore is None and self.max_concurrency is not None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        # Acquired outside the try, so a client leaving while queued doesn't release a slot
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+        try:
+            async for message in self._messages(func, kwargs, query):
+                yield _format_message(message, self.stream)
+        except Exception as exc:  # pylint: disable=broad-except
+            yield _format_message({"error": f"{type(exc).__name__}: {exc}"}, self.stream)
+        finally:
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    async def _messages(
+        self, func: Callable, kwargs: dict[str, Any], query: dict[str, Any]
+    ) -> AsyncIterator[dict[str, Any]]:
+        if inspect.isasyncgenfunction(func):
+            async for item in func(**kwargs):
+                yield {"response": item}
+            return
+        if inspect.isgeneratorfunction(func):
+            iterator = func(**kwargs)
+            done = object()
+            # Stepped off the event loop, on the default executor without one set,
+            # so a slow generator doesn't hold up other requests
+            pool = None if self.executor is None else get_pool(self.executor)
+            loop = asyncio.get_running_loop()
+            while True:
+                item = await loop.run_in_executor(pool, next, iterator, done)
+                if item is done:
+                    return
+                yield {"response": item}
+
+        payload = await self._run(func, False, kwargs)
+        if not self.frame:
+            yield payload
+            return
+        frame, meta = apply_frame_query(payload["response"], query)
+        # Always send one chunk so empty frames still report their total
+        for start in range(0, max(len(frame), 1), self.chunk_rows):
+            chunk = frame.iloc[start : start + self.chunk_rows]
+            yield {
+                "response": encode_chunk(chunk, self.transport),
+                "offset": meta["offset"] + start,
+                "total": meta["total"],
+            }
+
+    def _encode(self, payload: Any, query: dict[str, Any]) -> Any:
+        if not self.frame:
+            return payload
+        frame, meta = apply_frame_query(payload["response"], query)
+        if self.transport == "records":
+            return {**payload, **encode_records(frame, query.get("table", False)), **meta}
+        return {**payload, "response": encode_columns(frame), **meta}
+
+    async def _cached(
+        self,
+        func: Callable,
+        offload: bool,
+        kwargs: dict[str, Any],
+        query: dict[str, Any],
+        arrow: bool,
+    ) -> CacheEntry:
+        assert self.cache is not None
+        key = ("arrow:" if arrow else "") + _cache_key({"args": kwargs, "query": query})
+        entry = self.cache.get(key)
+        if entry is None:
+            payload = await self._compute(func, offload, kwargs)
+            if arrow:
+                frame, meta = apply_frame_query(payload["response"], query)
+                entry = self.cache.put(key, meta, encode_arrow(frame), ARROW_MIME)
+            else:
+                entry = self.cache.put(key, self._encode(payload, query))
+        return entry
+
+    async def _compute(self, func: Callable, offload: bool, kwargs: dict[str, Any]) -> Any:
+        """
+        Get a function's result. When coalescing, calls made with the same
+        arguments while one is running wait for that call instead of running again
+        """
+        if not self.coalesce:
+            return await self._limit(func, offload, kwargs)
+        key = _cache_key(kwargs)
+        self.calls += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            # A task of its own, so a caller disconnecting doesn't cancel it for the others
+            flight = asyncio.ensure_future(self._limit(func, offload, kwargs))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+            flight.add_done_callback(_retrieve)
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(flight)
+
+    def coalesce_stats(self) -> dict[str, Any]:
+        """How many calls were made, and how many of them shared another's result"""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+            "coalesced_rate": self.coalesced / self.calls if self.calls else 0.0,
+        }
+
+    async def _limit(self, func: Callable, offload: bool, kwargs: dict[str, Any]) -> Any:
+        if self.max_concurrency is None:
+            return await self._run(func, offload, kwargs)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            return await self._run(func, offload, kwargs)
+
+    async def _run(self, func: Callable, offload: bool, kwargs: dict[str, Any]) -> Any:
+        profile = active_profile()
+        if inspect.iscoroutinefunction(func):
+            # Awaited on the event loop, so waiting on I/O doesn't hold up other requests
+            if profile is not None and profile.selects(func.__name__):
+                result, data = await profile_async(profile.mode, func, kwargs)
+                profile.save(func.__name__, data)
+                return result
+            return await func(**kwargs)
+        if profile is not None and profile.selects(func.__name__):
+            # Profiled where the function runs, so calls in pools are profiled too
+            result, data = await self._call(
+                partial(profile_call, profile.mode, func, kwargs), offload
+            )
+            profile.save(func.__name__, data)
+            return result
+        return await self._call(partial(func, **kwargs), offload)
+
+    async def _call(self, call: Callable[[], Any], offload: bool) -> Any:
+        if self.executor is None and not offload:
+            return call()
+        pool = None if self.executor is None else get_pool(self.executor)
+        return await asyncio.get_running_loop().run_in_executor(pool, call)
+
+
+Routes = Dict[str, Tuple[Callable, Dict[str, type], RoutePolicy]]
+
+
+def cast_args(types: dict[str, type], args: dict[str, Any]) -> dict[str, Any]:
+    """Cast JSON/query arguments to the types annotated on a backend function"""
+    casted = {}
+    for name, value in args.items():
+        if name not in types:
+            raise TypeError(f"Unexpected argument '{name}'")
+        typ = types[name]
+        casted[name] = value if value is None or isinstance(value, typ) else typ(value)
+    return casted
+
+
+def _call_error(call: Any) -> Optional[str]:
+    """Why a call in a batch is malformed, if it is"""
+    if not isinstance(call, dict):
+        return "Calls should be objects with a name and args"
+    if not isinstance(call.get("name"), str):
+        return "Calls need a string name"
+    if call.get("args") is not None and not isinstance(call["args"], dict):
+        return "The args of a call should be an object"
+    return None
+
+
+async def _run_call(call: Any, routes: Routes) -> dict[str, Any]:
+    call_id = call.get("id") if isinstance(call, dict) else None
+    error = _call_error(call)
+    if error is not None:
+        return {"id": call_id, "ok": False, "error": f"ValueError: {error}"}
+    try:
+        name = call["name"]
+        if name not in routes:
+            raise LookupError(f"No route named '{name}'")
+        func, types, policy = routes[name]
+        if policy.stream is not None:
+            raise TypeError(f"Streaming route '{name}' can't be batched")
+        args = call.get("args") or {}
+        query = {}
+        if policy.frame:
+            query = parse_frame_query(args)
+            args = {k: v for k, v in args.items() if not k.startswith("_")}
+        # Run every call off the event loop so independent calls overlap
+        result = await policy(func, cast_args(types, args), offload=True, query=query)
+        return {"id": call_id, "ok": True, **result}
+    except Exception as exc:  # pylint: disable=broad-except
+        return {"id": call_id, "ok": False, "error": f"{type(exc).__name__}: {exc}"}
+
+
+async def run_batch(payload: Any, routes: Routes) -> Any:
+    """
+    Run several backend calls from one request concurrently.
+    Errors are reported per call so one failure doesn't fail the batch, but
+    a body without a list of calls is answered with 400 Bad Request
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get("calls", []), list):
+        return {"error": 'Batches should look like {"calls": [{"name": ..., "args": {...}}]}'}, 400
+    calls = payload.get("calls", [])
+    results = await asyncio.gather(*(_run_call(call, routes) for call in calls))
+    return {"results": list(results)}
+
+
+def cache_stats(routes: Routes) -> dict[str, Any]:
+    """Cache counters of every cached route"""
+    return {
+        name: policy.cache.stats()
+        for name, (_, _, policy) in routes.items()
+        if policy.cache is not None
+    }
+
+
+def coalesce_stats(routes: Routes) -> dict[str, Any]:
+    """Coalescing counters of every route which coalesces calls"""
+    return {
+        name: policy.coalesce_stats()
+        for name, (_, _, policy) in routes.items()
+        if policy.coalesce
+    }
@@ -0,0 +1,206 @@
+"""
+Production server behind `spylt serve`. The compiled app is loaded once, then
+Hypercorn workers are forked from it and share its listening sockets
+"""
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import asyncio
+import copy
+import importlib.util
+import os
+import signal
+import sys
+import time
+from multiprocessing import get_context
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
+
+from hypercorn.asyncio import serve as hypercorn_serve
+from hypercorn.config import Config
+
+from . import runtime
+
+# A worker which exits this soon after starting is assumed to be broken, not crashed
+_MIN_UPTIME = 2.0
+
+
+def load_module(path: str, name: str = "main") -> Any:
+    """
+    Import a compiled app without starting its development server. It's registered
+    as ``name`` so functions sent to a process pool pickle by reference
+    """
+    # Pool processes which aren't forked import the module by name
+    directory = os.path.dirname(os.path.abspath(path))
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    spec = importlib.util.spec_from_file_location(name, path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Can't load a compiled app from {path}")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_app(path: str) -> Any:
+    return load_module(path).app
+
+
+def _worker(path: str, app: Any, config: Config) -> None:
+    """Serve on the sockets inherited from the supervisor until told to stop"""
+    # Ctrl+C reaches the whole process group, but the supervisor decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if app is None:
+        app = load_app(path)
+        runtime.warm_preloads()
+
+    async def main() -> None:
+        stop = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        await hypercorn_serve(app, config, shutdown_trigger=stop.wait)
+
+    asyncio.run(main())
+
+
+class Supervisor:
+    """
+    Keeps ``workers`` processes serving a compiled app. SIGHUP replaces them one
+    at a time, and SIGINT or SIGTERM stops them after in-flight requests finish
+
+    With ``preload``, the app and its preload functions are loaded before forking
+    so workers share that memory copy-on-write. Workers then keep running the code
+    that was loaded, so restart the supervisor itself to deploy new code.
+    Without it, every worker loads the app itself and SIGHUP picks up new code
+    """
+
+    def __init__(
+        self,
+        path: str,
+        config: Config,
+        workers: int,
+        preload: bool = True,
+        log: Callable[[str], None] = print,
+    ) -> None:
+        if preload and not hasattr(os, "fork"):
+            log("Preloading needs fork(), so every worker will load the app itself")
+            preload = False
+        self.path = path
+        self.config = config
+        self.workers = workers
+        self.preload = preload
+        self.log = log
+        self._context = get_context("fork" if hasattr(os, "fork") else "spawn")
+        self._processes: dict[BaseProcess, float] = {}
+        self._stopping = False
+        self._restarting = False
+
+    def run(self) -> int:
+        """Start the workers and supervise them until stopped. Returns an exit code"""
+        app = None
+        if self.preload:
+            start = time.time()
+            app = load_app(self.path)
+            runtime.warm_preloads()
+            self.log(f"✓ Loaded {self.path} in {time.time() - start:.2f}s")
+
+        sockets = self.config.create_sockets()
+        for sock in sockets.insecure_sockets:
+            sock.listen(self.config.backlog)
+        # Workers open the supervisor's sockets by file descriptor instead of binding their own
+        worker_config = copy.copy(self.config)
+        worker_config.bind = [f"fd://{sock.fileno()}" for sock in sockets.insecure_sockets]
+
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._restart)
+
+        for _ in range(self.workers):
+            self._spawn(app, worker_config)
+        self.log(
+            f"✓ Serving {self.path} on {', '.join(self.config.bind)} "
+            f"with {self.workers} worker(s)"
+        )
+
+        exitcode = 0
+        try:
+            while not self._stopping:
+                if self._restarting:
+                    self._restarting = False
+                    self._rolling_restart(app, worker_config)
+                wait([process.sentinel for process in self._processes], timeout=0.5)
+                for process, started in list(self._processes.items()):
+                    if process.is_alive() or self._stopping:
+                        continue
+                    del self._processes[process]
+                    if time.time() - started < _MIN_UPTIME:
+                        self.log(f"𐄂 A worker exited with code {process.exitcode} right after starting")
+                        exitcode = process.exitcode or 1
+                        self._stopping = True
+                        break
+                    self.log(f"𐄂 Worker {process.pid} exited with code {process.exitcode}, replacing it")
+                    self._spawn(app, worker_config)
+        finally:
+            for process in self._processes:
+                self._terminate(process)
+            for process in self._processes:
+                self._join(process)
+            for sock in sockets.insecure_sockets:
+                sock.close()
+        return exitcode
+
+    def _spawn(self, app: Any, config: Config) -> BaseProcess:
+        process = self._context.Process(  # type: ignore
+            target=_worker, args=(self.path, app, config), daemon=False
+        )
+        process.start()
+        self._processes[process] = time.time()
+        return process
+
+    def _rolling_restart(self, app: Any, config: Config) -> None:
+        """Replace workers one by one, so some are always accepting connections"""
+        self.log("Restarting workers...")
+        for process in list(self._processes):
+            self._spawn(app, config)
+            self._terminate(process)
+            self._join(process)
+            del self._processes[process]
+        self.log(f"✓ Restarted {self.workers} worker(s)")
+
+    def _terminate(self, process: BaseProcess) -> None:
+        if process.is_alive():
+            process.terminate()
+
+    def _join(self, process: BaseProcess) -> None:
+        process.join(self.config.graceful_timeout + 5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def _stop(self, *_: Any) -> None:
+        self._stopping = True
+
+    def _restart(self, *_: Any) -> None:
+        self._restarting = True
+
+
+def serve(
+    path: str = "main.py",
+    workers: int = 1,
+    bind: list[str] | None = None,
+    keep_alive: float = 5,
+    backlog: int = 2048,
+    graceful_timeout: float = 30,
+    preload: bool = True,
+    log: Callable[[str], None] = print,
+) -> int:
+    """Serve a compiled app with Hypercorn workers"""
+    config = Config()
+    config.bind = bind or ["127.0.0.1:8000"]
+    config.keep_alive_timeout = keep_alive
+    config.backlog = backlog
+    config.graceful_timeout = graceful_timeout
+    config.accesslog = "-"
+    return Supervisor(path, config, workers, preload, log).run()
@@ -0,0 +1,195 @@
+"""
+Serving of the compiled page and assets. `spylt build` writes gzip and brotli
+variants next to them, and compiled apps keep all of them in memory
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+import gzip
+import os
+from hashlib import sha256
+
+# Compressed variants, by Content-Encoding. Earlier ones win ties in negotiate()
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as fh:
+        return fh.read()
+
+
+def has_brotli() -> bool:
+    """Whether the brotli package can be used to compress pages"""
+    try:
+        import brotli  # pylint: disable=unused-import,import-outside-toplevel
+    except ImportError:
+        return False
+    return True
+
+
+def compress(data: bytes) -> Dict[str, bytes]:
+    """Compress a page with every encoding available, at the highest level"""
+    # mtime=0 keeps the output (and so the build cache) deterministic
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if has_brotli():
+        import brotli  # pylint: disable=import-outside-toplevel
+
+        variants["br"] = brotli.compress(data, quality=11)
+    return variants
+
+
+def precompress(path: str) -> list[str]:
+    """Write the compressed variants of a file next to it and return their paths"""
+    data = _read(path)
+    written = []
+    for encoding, body in compress(data).items():
+        out = path + ENCODINGS[encoding]
+        if not os.path.exists(out) or _read(out) != body:
+            with open(out, "wb") as fh:
+                fh.write(body)
+        written.append(out)
+    return written
+
+
+class StaticPage:
+    """
+    A page (or another file) held in memory with its compressed variants, sent with a strong ETag.
+    Variants written by :func:`precompress` are used when they are up to date,
+    otherwise the page is compressed once when it is loaded.
+
+    With ``reload`` (the default under `spylt dev`) the file is checked for
+    changes on each request instead of being read only once
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_age: int = 86400,
+        reload: Optional[bool] = None,
+        content_type: str = "text/html; charset=utf-8",
+        immutable: bool = False,
+    ) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.reload = bool(os.environ.get("SPYLT_DEV")) if reload is None else reload
+        self.content_type = content_type
+        self.immutable = immutable
+        self.etag = ""
+        self.variants: Dict[str, bytes] = {}
+        self._mtime: Optional[int] = None
+
+    def load(self) -> bool:
+        """Read the page and its variants into memory. Returns whether the file exists"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self.variants = {}
+            self._mtime = None
+            return False
+        if mtime == self._mtime:
+            return True
+
+        data = _read(self.path)
+        variants = {"identity": data}
+        for encoding, suffix in ENCODINGS.items():
+            try:
+                if os.stat(self.path + suffix).st_mtime_ns >= mtime:
+                    variants[encoding] = _read(self.path + suffix)
+            except FileNotFoundError:
+                pass
+        if len(variants) == 1 and not self.reload:
+            variants.update(compress(data))
+        self.variants = variants
+        self.etag = sha256(data).hexdigest()[:32]
+        self._mtime = mtime
+        return True
+
+    @property
+    def cache_control(self) -> str:
+        if self.reload or not self.max_age:
+            return "no-cache"
+        return f"public, max-age={self.max_age}" + (", immutable" if self.immutable else "")
+
+    def negotiate(self, accept_encoding: str) -> str:
+        """
+        Pick the compressed variant the client prefers by q-value, and the smallest
+        of those it prefers equally. Falls back to the uncompressed page
+        """
+        quality = {}
+        for part in accept_encoding.split(","):
+            name, _, params = part.strip().partition(";")
+            q = 1.0
+            if params.strip().startswith("q="):
+                try:
+                    q = float(params.strip()[2:])
+                except ValueError:
+                    q = 0.0
+            quality[name.strip().lower()] = q
+        accepted = {
+            encoding: quality.get(encoding, quality.get("*", 0))
+            for encoding in ENCODINGS
+            if encoding in self.variants
+        }
+        return max(
+            (encoding for encoding, q in accepted.items() if q > 0),
+            key=lambda encoding: (accepted[encoding], -len(self.variants[encoding])),
+            default="identity",
+        )
+
+    def respond(self) -> Any:
+        """Send the page for a Quart route, answering conditional requests with 304"""
+        from quart import Response, request  # pylint: disable=import-outside-toplevel
+
+        if (self.reload or not self.variants) and not self.load():
+            return f"{self.path} hasn't been built yet. Run `spylt build`", 404
+
+        encoding = self.negotiate(request.headers.get("Accept-Encoding", ""))
+        # Variants have different bytes, so each gets its own strong ETag
+        etag = f'"{self.etag}"' if encoding == "identity" else f'"{self.etag}-{encoding}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        matches = [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]
+        if etag in matches or "*" in matches:
+            return Response("", status=304, headers=headers)
+        return Response(
+            self.variants[encoding], content_type=self.content_type, headers=headers
+        )
+
+
+CONTENT_TYPES = {
+    ".js": "text/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".map": "application/json",
+}
+
+
+class StaticAssets:
+    """
+    Content-hashed files written by `spylt build --output hashed`. Their names
+    change whenever their contents do, so they're cached for a year
+    """
+
+    def __init__(self, directory: str, max_age: int = 31536000) -> None:
+        self.directory = directory
+        self.max_age = max_age
+        self._files: Dict[str, StaticPage] = {}
+
+    def respond(self, name: str) -> Any:
+        """Send an asset for a Quart route"""
+        suffix = os.path.splitext(name)[1]
+        if name not in self._files:
+            path = os.path.join(self.directory, name)
+            # Assets are written flat, so anything else is outside the directory
+            if os.path.basename(name) != name or suffix not in CONTENT_TYPES or not os.path.isfile(path):
+                return "Not found", 404
+            self._files[name] = StaticPage(
+                path, self.max_age, reload=False, content_type=CONTENT_TYPES[suffix], immutable=True
+            )
+        return self._files[name].respond()
@@ -0,0 +1,76 @@
+"""
+Shared fixtures. Tests compile a backend module (the contents of an App.py)
+in a temporary project and import the generated main.py as a module
+"""
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import asyncio
+import importlib.util
+import sys
+import textwrap
+from pathlib import Path
+from runpy import run_path
+
+import pytest
+
+from spylt import builder, runtime
+from spylt.module import Module
+
+HEADER = """from spylt import require_svelte
+app = require_svelte("./src/App.svelte")
+"""
+
+
+@pytest.fixture
+def project(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """An empty project with a root page, used as the working directory"""
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "App.svelte").write_text("<!-- point ./src/App.py:app -->\n")
+    (tmp_path / "index.html").write_text("<!DOCTYPE html>")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def load_module(source: str) -> Module:
+    """Run an App.py and get its Spylt module"""
+    Path("src/App.py").write_text(HEADER + textwrap.dedent(source))
+    return next(value for value in run_path("src/App.py").values() if isinstance(value, Module))
+
+
+@pytest.fixture
+def module(project: Path) -> Callable[[str], Module]:
+    return load_module
+
+
+@pytest.fixture
+def compile_app(project: Path) -> Any:
+    """Compile an App.py with options for builder.create_api, and import the result"""
+
+    def compile_(source: str, **options: Any) -> Any:
+        manifest = load_module(source).manifest()
+        Path("main.py").write_text(builder.create_api(manifest, **options))
+        spec = importlib.util.spec_from_file_location("main", "main.py")
+        compiled = importlib.util.module_from_spec(spec)
+        # Registered so functions sent to a process pool pickle by reference
+        sys.modules["main"] = compiled
+        spec.loader.exec_module(compiled)
+        return compiled
+
+    yield compile_
+    sys.modules.pop("main", None)
+    runtime.shutdown_pools()
+    # Compiled apps register their preloads and resources with the runtime
+    del runtime._preloads[:]  # pylint: disable=protected-access
+    del runtime._resources[:]  # pylint: disable=protected-access
+
+
+def run(coro: Any) -> Any:
+    return asyncio.run(coro)
+
+
+async def get(app: Any, path: str, **kwargs: Any) -> Any:
+    """Request a path from an app which has run its before_serving hooks"""
+    async with app.test_app() as test_app:
+        return await test_app.test_client().get(path, **kwargs)
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from spylt.aio import gather, run_sync
+from conftest import get, run
+
+SOURCE = """
+import asyncio
+import threading
+from typing import AsyncIterator
+
+from spylt.aio import gather, run_sync
+
+@app
+async def doubled(items: str) -> list:
+    async def double(n):
+        await asyncio.sleep(0)
+        return n * 2
+
+    return await gather(*(double(int(item)) for item in items.split(",")), limit=2)
+
+@app
+async def blocking() -> str:
+    return await run_sync(lambda: threading.current_thread().name)
+
+@app
+async def ticks(n: int) -> AsyncIterator[int]:
+    for i in range(n):
+        await asyncio.sleep(0)
+        yield i
+"""
+
+
+def test_gather_runs_at_most_limit_awaitables_at_once():
+    running = peak = 0
+
+    async def task(n):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return n
+
+    assert run(gather(*(task(n) for n in range(6)), limit=2)) == list(range(6))
+    assert peak == 2
+
+
+def test_gather_can_return_exceptions():
+    async def fail():
+        raise ValueError("no")
+
+    [error] = run(gather(fail(), limit=1, return_exceptions=True))
+    assert isinstance(error, ValueError)
+
+
+def test_run_sync_leaves_the_event_loop():
+    assert run(run_sync(lambda: threading.current_thread())) is not threading.main_thread()
+
+
+def test_async_routes_are_awaited(compile_app):
+    compiled = compile_app(SOURCE)
+
+    assert "async def doubled(" in open("main.py", encoding="utf-8").read()
+    assert run(run(get(compiled.app, "/api/doubled?items=1,2,3")).get_json()) == {
+        "response": [2, 4, 6]
+    }
+    name = run(run(get(compiled.app, "/api/blocking")).get_json())["response"]
+    assert name != threading.current_thread().name
+
+
+def test_async_generators_stream(compile_app):
+    compiled = compile_app(SOURCE)
+    body = run(run(get(compiled.app, "/api/ticks?n=3")).get_data()).decode()
+
+    assert [json.loads(line) for line in body.splitlines()] == [{"response": i} for i in range(3)]
+
+
+def test_async_routes_cant_use_an_executor(module):
+    with pytest.raises(ValueError, match="run_sync"):
+        module(
+            """
+            @app(executor="thread")
+            async def f() -> int:
+                return 1
+            """
+        )
@@ -0,0 +1,71 @@
+import os
+
+from spylt import builder
+from spylt.pipeline import write_assets
+from conftest import get, run
+
+SOURCE = """
+@app
+def f() -> int:
+    return 1
+
+@app
+def assets_() -> int:
+    return 2
+"""
+
+
+def fake_rollup(monkeypatch, js="console.log(1)"):
+    outputs = {
+        "bundle.js": f"{js}\n//# sourceMappingURL=bundle.js.map",
+        "bundle.css": "p{}",
+        "bundle.js.map": "{}",
+    }
+    monkeypatch.setattr(builder, "_run_rollup", lambda linker: outputs)
+
+
+def test_assets_are_named_by_their_contents(monkeypatch):
+    fake_rollup(monkeypatch)
+    page, files = builder.create_assets("main.js")
+    [css, js] = sorted(name for name in files if not name.endswith(".map"))
+
+    assert css.startswith("bundle.") and js.endswith(".js")
+    assert f'href="/assets/{css}"' in page
+    assert f'src="/assets/{js}"' in page
+    assert files[js].endswith(f"//# sourceMappingURL={js}.map")
+
+    fake_rollup(monkeypatch, js="console.log(2)")
+    assert js not in builder.create_assets("main.js")[1]
+
+
+def test_write_assets_removes_previous_builds(tmp_path, monkeypatch):
+    directory = str(tmp_path / "assets")
+    fake_rollup(monkeypatch)
+    _, first = builder.create_assets("main.js")
+    write_assets(directory, first)
+    fake_rollup(monkeypatch, js="console.log(2)")
+    _, second = builder.create_assets("main.js")
+    write_assets(directory, second)
+    (tmp_path / "assets" / "notes.txt").write_text("")
+
+    written = set(os.listdir(directory))
+    assert first.keys() - second.keys() and not (first.keys() - second.keys()) & written
+    assert {f"{name}.gz" for name in second if not name.endswith(".map")} <= written
+    assert "notes.txt" in written
+
+
+def test_compiled_apps_serve_assets_for_a_year(compile_app, monkeypatch):
+    fake_rollup(monkeypatch)
+    _, files = builder.create_assets("main.js")
+    write_assets("assets", files)
+    [js] = [name for name in files if name.endswith(".js")]
+    compiled = compile_app(SOURCE, assets="assets")
+
+    response = run(get(compiled.app, f"/assets/{js}"))
+    assert response.status_code == 200
+    assert response.content_type == "text/javascript; charset=utf-8"
+    assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert run(get(compiled.app, "/assets/missing.js")).status_code == 404
+    assert run(get(compiled.app, "/assets/..%2Fmain.py")).status_code == 404
+    assert run(get(compiled.app, "/")).headers["Cache-Control"] == "no-cache"
+    assert run(run(get(compiled.app, "/api/assets_")).get_json()) == {"response": 2}
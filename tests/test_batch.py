@@ -0,0 +1,124 @@
+import pytest
+
+from spylt import builder
+from conftest import get, run
+
+SOURCE = '''
+@app
+def double(n: int) -> int:
+    return n * 2
+
+@app
+def fail(n: int) -> int:
+    return 1 // n
+'''
+
+
+async def batch(app, json):
+    async with app.test_app() as test_app:
+        return await test_app.test_client().post("/api/_batch", json=json)
+
+
+def test_calls_are_answered_in_order_with_errors_per_call(compile_app):
+    compiled = compile_app(SOURCE)
+    response = run(
+        batch(
+            compiled.app,
+            {
+                "calls": [
+                    {"id": 1, "name": "double", "args": {"n": 21}},
+                    {"id": 2, "name": "fail", "args": {"n": 0}},
+                    {"id": 3, "name": "missing", "args": {}},
+                ]
+            },
+        )
+    )
+    results = run(response.get_json())["results"]
+
+    assert response.status_code == 200
+    assert results[0] == {"id": 1, "ok": True, "response": 42}
+    assert results[1]["ok"] is False and "ZeroDivisionError" in results[1]["error"]
+    assert results[2]["ok"] is False and "No route named 'missing'" in results[2]["error"]
+
+
+@pytest.mark.parametrize(
+    "call",
+    [1, "double", {"args": {"n": 1}}, {"name": 5}, {"name": "double", "args": [1]}],
+)
+def test_malformed_calls_fail_on_their_own(compile_app, call):
+    compiled = compile_app(SOURCE)
+    response = run(
+        batch(compiled.app, {"calls": [call, {"id": "ok", "name": "double", "args": {"n": 1}}]})
+    )
+    results = run(response.get_json())["results"]
+
+    assert response.status_code == 200
+    assert results[0]["ok"] is False and results[0]["error"].startswith("ValueError")
+    assert results[1] == {"id": "ok", "ok": True, "response": 2}
+
+
+@pytest.mark.parametrize("body", [[1, 2], {"calls": 1}, {"calls": {"name": "double"}}, "calls"])
+def test_bodies_without_a_list_of_calls_are_bad_requests(compile_app, body):
+    compiled = compile_app(SOURCE)
+    response = run(batch(compiled.app, body))
+
+    assert response.status_code == 400
+    assert "error" in run(response.get_json())
+
+
+def test_batch_wrappers_queue_calls_for_one_request(module):
+    interface, _ = builder.create_interface(module(SOURCE).manifest(), "batch")
+
+    assert builder._BATCH_JS in interface
+    assert 'fetchBatched("double", {n}, options)' in interface[-2]
+
+
+def test_routes_can_share_names_with_generated_handlers(compile_app):
+    compiled = compile_app(
+        """
+        @app
+        def root() -> str:
+            return "root"
+
+        @app
+        def batch(n: int) -> int:
+            return n
+
+        @app
+        def cache() -> str:
+            return "cache"
+
+        @app
+        def coalesce() -> str:
+            return "coalesce"
+        """
+    )
+    response = run(
+        batch(compiled.app, {"calls": [{"id": 1, "name": "batch", "args": {"n": 2}}]})
+    )
+
+    assert run(response.get_json()) == {"results": [{"id": 1, "ok": True, "response": 2}]}
+    for name in ("root", "cache", "coalesce"):
+        assert run(run(get(compiled.app, f"/api/{name}")).get_json()) == {"response": name}
+
+
+@pytest.mark.parametrize(
+    "name, message",
+    [
+        ("_batch", "/api/_batch is served by Spylt"),
+        ("_spylt_route_f", "its name is used by the compiled app"),
+        ("app", "its name is used by the compiled app"),
+        ("request", "its name is used by the compiled app"),
+    ],
+)
+def test_names_the_compiled_app_uses_are_rejected(module, name, message):
+    manifest = module(
+        f"""
+        @app
+        def {name}() -> int:
+            return 1
+        """
+    ).manifest()
+
+    with pytest.raises(ValueError, match=message):
+        builder.create_api(manifest)
@@ -0,0 +1,70 @@
+import json
+import sys
+
+import pytest
+
+from spylt import builder, runtime
+from spylt.bench import Benchmark, RouteResult, compare, percentile, sample_args
+from conftest import load_module
+
+
+def result(name, throughput, p50):
+    return RouteResult(name, 10, 0, throughput, p50, p50, p50, 1.0)
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([], 95) == 0.0
+
+
+def test_sample_args_need_fixtures_for_unknown_types():
+    assert sample_args({"n": int, "s": str}) == {"n": 1, "s": "spylt"}
+    with pytest.raises(TypeError, match="frame"):
+        sample_args({"frame": list})
+
+
+def test_compare_reports_regressions_past_the_threshold(tmp_path):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"routes": {"f": {"throughput": 100, "p50": 10, "p95": 10, "p99": 10}}}))
+    regressions = compare([result("f", 85, 10.5), result("new", 1, 1)], str(path), threshold=0.1)
+
+    assert [(regression.metric, regression.change) for regression in regressions] == [
+        ("throughput", pytest.approx(-0.15))
+    ]
+
+
+def test_routes_run_with_resources_and_process_pools(project, monkeypatch):
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    manifest = load_module(
+        """
+        import os
+
+        @app.resource
+        def prefix():
+            yield "n="
+
+        @app
+        def label(n: int) -> str:
+            return prefix() + str(n)
+
+        @app(executor="process")
+        def pid() -> int:
+            return os.getpid()
+        """
+    ).manifest()
+    (project / "main.py").write_text(builder.create_api(manifest))
+    try:
+        results, skipped = Benchmark(requests=10, concurrency=2, warmup=2).run()
+    finally:
+        sys.modules.pop("main", None)
+        runtime.shutdown_pools()
+        del runtime._resources[:]
+
+    assert skipped == {}
+    assert {result.name: result.errors for result in results} == {"label": 0, "pid": 0}
+    assert all(result.requests == 10 for result in results)
+    assert all(result.serialize is not None for result in results)
@@ -0,0 +1,70 @@
+import os
+
+from spylt import cache
+from spylt.cache import BuildCache, source_files, write_if_changed
+
+
+def test_keys_change_with_file_contents_and_extra_inputs(tmp_path):
+    source = tmp_path / "App.py"
+    source.write_text("a = 1")
+    build_cache = BuildCache(str(tmp_path / "cache"))
+    key = build_cache.key("api", [str(source)], ["x"])
+
+    assert build_cache.key("api", [str(source)], ["x"]) == key
+    assert build_cache.key("html", [str(source)], ["x"]) != key
+    assert build_cache.key("api", [str(source)], ["y"]) != key
+    source.write_text("a = 2")
+    assert build_cache.key("api", [str(source)], ["x"]) != key
+
+
+def test_stage_builds_once_then_hits(tmp_path):
+    build_cache = BuildCache(str(tmp_path / "cache"))
+    builds = []
+
+    def build():
+        builds.append(1)
+        return "output"
+
+    assert build_cache.stage("api", "k", build)[:2] == ("output", False)
+    assert build_cache.stage("api", "k", build)[:2] == ("output", True)
+    assert len(builds) == 1
+    assert not list((tmp_path / "cache" / "api").glob(".*.tmp"))
+
+
+def test_disabled_cache_never_hits(tmp_path):
+    build_cache = BuildCache(str(tmp_path / "cache"), enabled=False)
+    build_cache.put("api", "k", "output")
+
+    assert build_cache.get("api", "k") is None
+    assert not (tmp_path / "cache").exists()
+
+
+def test_oldest_entries_are_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "MAX_ENTRIES", 2)
+    build_cache = BuildCache(str(tmp_path / "cache"))
+    for age, key in enumerate(["a", "b"]):
+        build_cache.put("api", key, key)
+        os.utime(tmp_path / "cache" / "api" / key, (1000 + age, 1000 + age))
+    build_cache.put("api", "c", "c")
+
+    assert build_cache.get("api", "a") is None
+    assert build_cache.get("api", "b") == "b"
+    assert build_cache.get("api", "c") == "c"
+
+
+def test_source_files_skip_dependencies(tmp_path):
+    (tmp_path / "src" / "node_modules").mkdir(parents=True)
+    (tmp_path / "src" / "node_modules" / "dep.js").write_text("")
+    (tmp_path / "src" / "App.py").write_text("")
+
+    assert source_files(str(tmp_path / "src"), str(tmp_path / "missing")) == [
+        str(tmp_path / "src" / "App.py")
+    ]
+
+
+def test_write_if_changed_leaves_up_to_date_files(tmp_path):
+    path = str(tmp_path / "main.py")
+
+    assert write_if_changed(path, "x")
+    assert not write_if_changed(path, "x")
+    assert write_if_changed(path, "y")
@@ -0,0 +1,90 @@
+import pytest
+
+from spylt.runtime import CachePolicy, ResponseCache
+from conftest import get, run
+
+SOURCE = '''
+import time
+from spylt import CachePolicy
+
+@app(cache=CachePolicy(ttl=60))
+def stamp(key: str) -> float:
+    return time.perf_counter()
+'''
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("spylt.runtime.monotonic", lambda: now[0])
+    cache = ResponseCache(CachePolicy(ttl=10))
+    cache.put("a", {"response": 1})
+
+    assert cache.get("a").payload == {"response": 1}
+    now[0] = 111.0
+    assert cache.get("a") is None
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(CachePolicy(max_entries=2))
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["entries"] == 2
+
+
+def test_identical_payloads_share_an_etag():
+    cache = ResponseCache(CachePolicy())
+
+    assert cache.put("a", {"x": 1}).etag == cache.put("b", {"x": 1}).etag
+    assert cache.put("a", {"x": 1}).etag != cache.put("c", {"x": 2}).etag
+
+
+@pytest.mark.parametrize("ttl, header", [(None, "no-cache"), (30, "max-age=30")])
+def test_cache_control_follows_the_ttl(ttl, header):
+    assert CachePolicy(ttl=ttl).cache_control == header
+
+
+async def requests(app):
+    async with app.test_app() as test_app:
+        client = test_app.test_client()
+        first = await client.get("/api/stamp?key=a")
+        second = await client.get("/api/stamp?key=a")
+        other = await client.get("/api/stamp?key=b")
+        revalidated = await client.get(
+            "/api/stamp?key=a", headers={"If-None-Match": first.headers["ETag"]}
+        )
+        stats = await (await client.get("/api/_cache")).get_json()
+        return first, second, other, revalidated, stats
+
+
+def test_cached_routes_send_etags_and_answer_304(compile_app):
+    compiled = compile_app(SOURCE)
+    first, second, other, revalidated, stats = run(requests(compiled.app))
+
+    assert run(first.get_json()) == run(second.get_json())
+    assert run(first.get_json()) != run(other.get_json())
+    assert first.headers["Cache-Control"] == "max-age=60"
+    assert revalidated.status_code == 304
+    assert stats["stamp"]["hits"] == 2 and stats["stamp"]["misses"] == 2
+
+
+def test_cache_counters_are_only_served_when_a_route_is_cached(compile_app):
+    compiled = compile_app(
+        """
+        @app
+        def cache() -> int:
+            return 1
+        """
+    )
+
+    assert run(get(compiled.app, "/api/_cache")).status_code == 404
+    assert run(run(get(compiled.app, "/api/cache")).get_json()) == {"response": 1}
+
+
+def test_cache_option_needs_a_policy(module):
+    with pytest.raises(TypeError, match="CachePolicy"):
+        module("")(cache=60)
@@ -0,0 +1,70 @@
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+from rich.console import Console
+
+from spylt import cli
+
+
+@pytest.fixture
+def output(monkeypatch):
+    buffer = io.StringIO()
+    monkeypatch.setattr(cli.console, "_console", Console(file=buffer, width=200))
+    # Scaffolding shells out to npm and pip
+    monkeypatch.setattr(cli.os, "system", lambda command: 0)
+    return buffer
+
+
+def run_cli(*args):
+    namespace = cli.create_cli().parse_args(args)
+    namespace.func(namespace)
+
+
+@pytest.mark.parametrize(
+    "mode, template",
+    [("sync", cli.SVELTE_SYNC), ("async", cli.SVELTE_ASYNC), ("batch", cli.SVELTE_ASYNC)],
+)
+def test_new_scaffolds_svelte_code_for_the_interface_mode(
+    tmp_path, monkeypatch, output, mode, template
+):
+    monkeypatch.chdir(tmp_path)
+    run_cli("new", "demo", "--mode", mode)
+
+    assert (tmp_path / "demo" / "src" / "App.svelte").read_text() == template
+    if mode == "sync":
+        assert "--mode" not in output.getvalue()
+    else:
+        assert f"spylt interface --mode {mode}" in output.getvalue()
+
+
+def test_help_doesnt_load_the_toolchain():
+    # A fresh interpreter, since other tests have imported everything already
+    script = (
+        "import contextlib, io, sys\n"
+        "with contextlib.redirect_stdout(io.StringIO()), contextlib.suppress(SystemExit):\n"
+        "    sys.argv = ['spylt', '--help']\n"
+        "    import spylt.__main__\n"
+        "print(sorted(name for name in ('quart', 'rich', 'pandas', 'spylt.builder', 'spylt.runtime')"
+        " if name in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(cli.__file__)),
+    )
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_package_exports_are_loaded_on_first_use():
+    import spylt
+    from spylt.runtime import CachePolicy
+
+    assert spylt.CachePolicy is CachePolicy
+    with pytest.raises(AttributeError):
+        spylt.missing  # pylint: disable=pointless-statement
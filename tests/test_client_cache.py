@@ -0,0 +1,94 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+
+SOURCE = """
+from spylt import CachePolicy
+
+@app(client_cache=CachePolicy(ttl=30, max_entries=2))
+def add(a: int, b: int) -> int:
+    return a + b
+
+@app
+def plain(a: int) -> int:
+    return a
+"""
+
+# Calls the generated interface with a fetch which counts requests
+SCRIPT = """
+const requests = [];
+globalThis.fetch = async (url) => {
+    requests.push(url);
+    return { ok: true, json: async () => ({ response: url }) };
+};
+const api = await import("./interface.mjs");
+const results = {};
+
+const [first, second] = await Promise.all([api.add(1, 2), api.add(1, 2)]);
+results.shared = first === second && requests.length === 1;
+await api.plain(1);
+await api.plain(1);
+results.uncached = requests.length === 3;
+
+await api.add(2, 2);
+await api.add(3, 2);
+await api.add(1, 2);
+results.evicted = requests.length === 6;
+
+api.invalidateCache("add", { a: 1 });
+await api.add(1, 2);
+await api.add(3, 2);
+results.invalidated = requests.length === 7;
+
+const controller = new AbortController();
+const aborted = api.add(9, 9, { signal: controller.signal });
+controller.abort();
+results.aborted = await aborted.then(() => false, (error) => error.name === "AbortError");
+results.stillShared = (await api.add(9, 9)).endsWith("a=9&b=9") && requests.length === 8;
+console.log(JSON.stringify(results));
+"""
+
+
+def interface(module, mode):
+    return module(SOURCE).create_interface(mode)[0]
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_only_cached_routes_are_memoized(module, mode):
+    code = interface(module, mode)
+
+    assert 'memoized("add", {a, b}, 30, 2,' in code
+    assert 'memoized("plain"' not in code
+    assert "export function invalidateCache(route, args)" in code
+
+
+def test_interfaces_without_cached_routes_leave_out_the_cache(module):
+    code, _ = module(
+        """
+        @app
+        def plain(a: int) -> int:
+            return a
+        """
+    ).create_interface("async")
+
+    assert "memoized" not in code and "invalidateCache" not in code
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+def test_memoized_calls_in_node(module, project):
+    (project / "interface.mjs").write_text(interface(module, "async"))
+    (project / "check.mjs").write_text(SCRIPT)
+    result = subprocess.run(
+        ["node", "check.mjs"], capture_output=True, text=True, check=True, cwd=project
+    )
+
+    assert json.loads(result.stdout) == {
+        "shared": True,
+        "uncached": True,
+        "evicted": True,
+        "invalidated": True,
+        "aborted": True,
+        "stillShared": True,
+    }
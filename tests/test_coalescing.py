@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from spylt.runtime import RoutePolicy
+from conftest import get, run
+
+SOURCE = """
+import time
+import uuid
+
+@app(executor="thread", coalesce=True)
+def token(n: int) -> str:
+    time.sleep(0.05)
+    return uuid.uuid4().hex
+"""
+
+
+async def responses(app, *paths):
+    async with app.test_app() as test_app:
+        client = test_app.test_client()
+        results = await asyncio.gather(*(client.get(path) for path in paths))
+        stats = await (await client.get("/api/_coalesce")).get_json()
+        return [await result.get_json() for result in results], stats
+
+
+def test_concurrent_calls_with_the_same_arguments_share_a_result(compile_app):
+    compiled = compile_app(SOURCE)
+    results, stats = run(
+        responses(compiled.app, "/api/token?n=1", "/api/token?n=1", "/api/token?n=1", "/api/token?n=2")
+    )
+    tokens = [result["response"] for result in results]
+
+    assert tokens[0] == tokens[1] == tokens[2] != tokens[3]
+    assert stats["token"] == {"calls": 4, "coalesced": 2, "in_flight": 0, "coalesced_rate": 0.5}
+
+
+def test_coalescing_counters_are_exported_as_metrics(compile_app):
+    compiled = compile_app(SOURCE, metrics=True)
+
+    async def scrape():
+        async with compiled.app.test_app() as test_app:
+            client = test_app.test_client()
+            await asyncio.gather(client.get("/api/token?n=1"), client.get("/api/token?n=1"))
+            return (await (await client.get("/metrics")).get_data()).decode()
+
+    body = run(scrape())
+    assert 'spylt_coalesce_calls_total{function="token"} 2' in body
+    assert 'spylt_coalesced_calls_total{function="token"} 1' in body
+    assert 'spylt_coalesce_in_flight{function="token"} 0' in body
+
+
+def test_counters_are_only_served_when_a_route_coalesces(compile_app):
+    compiled = compile_app(
+        """
+        @app
+        def coalesce_() -> int:
+            return 1
+        """
+    )
+
+    assert run(get(compiled.app, "/api/_coalesce")).status_code == 404
+    assert run(run(get(compiled.app, "/api/coalesce_")).get_json()) == {"response": 1}
+
+
+def test_later_calls_run_again(compile_app):
+    compiled = compile_app(SOURCE)
+    first, _ = run(responses(compiled.app, "/api/token?n=1"))
+    second, _ = run(responses(compiled.app, "/api/token?n=1"))
+
+    assert first != second
+
+
+def test_a_callers_cancellation_doesnt_cancel_the_others():
+    policy = RoutePolicy(coalesce=True)
+
+    async def slow(n):
+        await asyncio.sleep(0.02)
+        return n
+
+    async def main():
+        leaving = asyncio.ensure_future(policy._compute(slow, False, {"n": 1}))
+        staying = asyncio.ensure_future(policy._compute(slow, False, {"n": 1}))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        return await staying
+
+    assert run(main()) == 1
+    assert policy.coalesce_stats()["coalesced"] == 1
+
+
+def test_errors_are_shared_too():
+    policy = RoutePolicy(coalesce=True)
+
+    async def fail(n):
+        await asyncio.sleep(0.01)
+        raise ValueError(n)
+
+    async def main():
+        return await asyncio.gather(
+            *(policy._compute(fail, False, {"n": 1}) for _ in range(3)), return_exceptions=True
+        )
+
+    assert [type(error) for error in run(main())] == [ValueError] * 3
+    assert policy._flights == {}
+
+
+def test_generators_cant_coalesce(module):
+    with pytest.raises(ValueError, match="can't coalesce"):
+        module(
+            """
+            @app(coalesce=True)
+            def f(n: int):
+                yield n
+            """
+        )
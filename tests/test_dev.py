@@ -0,0 +1,43 @@
+import os
+
+from spylt.dev import DevServer, changed, snapshot
+from conftest import load_module
+
+
+def test_changed_sees_added_removed_and_modified_files(tmp_path):
+    first, second = tmp_path / "a.py", tmp_path / "b.py"
+    first.write_text("")
+    before = snapshot([str(first), str(second)])
+
+    assert before.keys() == {str(first)}
+
+    second.write_text("")
+    os.utime(first, ns=(0, 0))
+    assert changed(before, snapshot([str(first), str(second)])) == {str(first), str(second)}
+    assert changed(before, before) == set()
+
+
+def test_rebuild_backend_reports_whether_the_api_changed(project):
+    load_module(
+        """
+        @app
+        def add(a: int, b: int) -> int:
+            return a + b
+        """
+    )
+    logs = []
+    server = DevServer("main.py", "index.html", "src/interface.js", "sync", logs.append)
+
+    assert server.rebuild_backend()
+    assert not server.rebuild_backend()
+    assert "export function add" in (project / "src" / "interface.js").read_text()
+    assert (project / ".spylt-cache" / "dev" / "app" / "main.js").exists()
+    assert len(logs) == 2
+
+
+def test_sources_leave_out_the_generated_interface(project):
+    (project / "src" / "interface.js").write_text("")
+    server = DevServer("main.py", "index.html", "src/interface.js", "sync", print)
+
+    assert os.path.join("src", "interface.js") not in server._sources()
+    assert os.path.join("src", "App.svelte") in server._sources()
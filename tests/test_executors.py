@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from conftest import run
+
+SOURCE = '''
+import os
+import threading
+import time
+
+@app(executor="thread")
+def in_thread() -> str:
+    return threading.current_thread().name
+
+@app(executor="process")
+def in_process() -> int:
+    return os.getpid()
+
+@app(executor="thread", max_concurrency=1)
+def limited(ms: int) -> int:
+    time.sleep(ms / 1000)
+    return ms
+
+@app(executor="thread")
+def unlimited(ms: int) -> int:
+    time.sleep(ms / 1000)
+    return ms
+'''
+
+
+async def responses(app, *paths):
+    async with app.test_app() as test_app:
+        client = test_app.test_client()
+        results = await asyncio.gather(*(client.get(path) for path in paths))
+        return [(await result.get_json())["response"] for result in results]
+
+
+def test_thread_executor_runs_on_the_shared_pool(compile_app):
+    compiled = compile_app(SOURCE)
+    [name] = run(responses(compiled.app, "/api/in_thread"))
+
+    assert name.startswith("spylt")
+
+
+def test_process_executor_runs_in_another_process(compile_app):
+    compiled = compile_app(SOURCE)
+    [pid] = run(responses(compiled.app, "/api/in_process"))
+
+    assert pid != os.getpid()
+
+
+def test_max_concurrency_queues_calls(compile_app):
+    compiled = compile_app(SOURCE)
+
+    start = time.perf_counter()
+    run(responses(compiled.app, *["/api/unlimited?ms=100"] * 3))
+    unlimited = time.perf_counter() - start
+    start = time.perf_counter()
+    run(responses(compiled.app, *["/api/limited?ms=100"] * 3))
+    limited = time.perf_counter() - start
+
+    assert limited >= 0.3
+    assert unlimited < limited
+
+
+@pytest.mark.parametrize(
+    "options, error",
+    [
+        ({"executor": "gpu"}, ValueError),
+        ({"max_concurrency": 0}, ValueError),
+        ({"unknown": 1}, TypeError),
+    ],
+)
+def test_invalid_route_options_are_rejected(module, options, error):
+    app = module("")
+
+    with pytest.raises(error):
+        app(**options)
+
+
+def test_generators_cant_run_in_process_pools(module):
+    app = module("")
+
+    def numbers():
+        yield 1
+
+    with pytest.raises(ValueError, match="process pool"):
+        app(executor="process")(numbers)
+
+
+def test_pools_are_shut_down_even_with_a_function_named_like_the_hook(compile_app, monkeypatch):
+    compiled = compile_app(
+        """
+        @app
+        def shutdown_() -> int:
+            return 1
+        """
+    )
+    calls = []
+    monkeypatch.setattr(compiled, "shutdown_pools", lambda: calls.append(1))
+
+    assert run(responses(compiled.app, "/api/shutdown_")) == [1]
+    assert calls == [1]
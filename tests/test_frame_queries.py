@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+
+from spylt import builder
+from spylt.exceptions import FrameQueryError
+from spylt.frames import apply_frame_query, parse_frame_query
+from conftest import run
+
+FRAME = pd.DataFrame({"name": ["ann", "bob", "cat", "dan"], "age": [31, 25, 47, 25]})
+
+SOURCE = '''
+import pandas as pd
+
+@app
+def people() -> pd.DataFrame:
+    return pd.DataFrame({"name": ["ann", "bob", "cat", "dan"], "age": [31, 25, 47, 25]})
+'''
+
+
+def test_queries_are_parsed_from_request_arguments():
+    query = parse_frame_query(
+        {
+            "_columns": "name",
+            "_sort": "-age,name",
+            "_filters": '[["age", "lt", 40]]',
+            "_offset": "1",
+            "_limit": "2",
+        }
+    )
+
+    assert query == {
+        "columns": ["name"],
+        "sort": ["-age", "name"],
+        "filters": [["age", "lt", 40]],
+        "offset": 1,
+        "limit": 2,
+    }
+
+
+def test_queries_filter_sort_paginate_and_project():
+    frame, meta = apply_frame_query(
+        FRAME, {"filters": [["age", "lt", 40]], "sort": ["-age", "name"], "limit": 2, "columns": ["name"]}
+    )
+
+    assert frame["name"].tolist() == ["ann", "bob"]
+    assert list(frame.columns) == ["name"]
+    assert meta == {"total": 3, "offset": 0, "limit": 2}
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        {"_filters": "5"},
+        {"_filters": '{"a": 1}'},
+        {"_filters": '["age", "lt", 40]'},
+        {"_filters": '[["age", "lt"]]'},
+        {"_filters": '[["age", "like", 40]]'},
+        {"_filters": "not json"},
+        {"_offset": "-1"},
+        {"_limit": "many"},
+    ],
+)
+def test_invalid_queries_raise_frame_query_errors(args):
+    with pytest.raises(FrameQueryError):
+        parse_frame_query(args)
+
+
+def test_unknown_columns_are_reported():
+    with pytest.raises(FrameQueryError, match="Unknown columns: height"):
+        apply_frame_query(FRAME, {"sort": ["height"]})
+
+
+async def get_all(app, *paths):
+    async with app.test_app() as test_app:
+        client = test_app.test_client()
+        return [await client.get(path) for path in paths]
+
+
+def test_routes_answer_bad_queries_with_400(compile_app):
+    compiled = compile_app(SOURCE)
+    ok, *bad = run(
+        get_all(
+            compiled.app,
+            "/api/people?_sort=-age&_limit=1",
+            "/api/people?_filters=5",
+            '/api/people?_filters={"a":1}',
+            "/api/people?_columns=height",
+        )
+    )
+
+    body = run(ok.get_json())
+    assert body["response"] == [{"name": "cat", "age": 47}] and body["total"] == 4
+    assert [response.status_code for response in bad] == [400, 400, 400]
+
+
+def test_wrappers_send_queries_as_parameters(module):
+    interface = builder.create_interface(module(SOURCE).manifest(), "async")[0]
+
+    assert builder._FRAME_JS in interface
+    assert "{...frameParams(options)}" in interface[-1]
@@ -0,0 +1,35 @@
+import pytest
+
+from spylt import builder
+
+
+SOURCE = '''
+@app
+def greet(name: str, times: int) -> str:
+    """Say hello"""
+    return name * times
+'''
+
+
+def test_sync_wrappers_block_on_fetch_sync(module):
+    interface, _ = builder.create_interface(module(SOURCE).manifest(), "sync")
+    wrapper = interface[-1]
+
+    assert "export function greet(name, times)" in wrapper
+    assert "fetchSync(`/api/greet?name=${name}&times=${times}`)" in wrapper
+
+
+def test_async_wrappers_return_promises_and_take_a_signal(module):
+    interface, _ = builder.create_interface(module(SOURCE).manifest(), "async")
+
+    assert builder._ASYNC_JS in interface
+    wrapper = interface[-1]
+    assert "export async function greet(name, times, options = {})" in wrapper
+    assert 'fetchAsync("greet", {name, times}, options)' in wrapper
+    assert "@returns {Promise<string>}" in wrapper
+    assert "signal?: AbortSignal" in wrapper
+
+
+def test_unknown_modes_are_rejected(module):
+    with pytest.raises(ValueError, match="Unknown interface mode"):
+        builder.create_interface(module(SOURCE).manifest(), "callbacks")
@@ -0,0 +1,43 @@
+from spylt import builder
+from conftest import get, load_module, run
+
+SOURCE = """
+import json
+from decimal import Decimal
+from math import *
+
+@app
+def total(price: Decimal, count: int) -> str:
+    return str(price * count)
+
+@app
+def dumped(n: int) -> str:
+    return json.dumps(floor(n / 2))
+"""
+
+
+def test_imports_move_into_the_functions_using_them(module):
+    main = builder.create_api(module(SOURCE).manifest(), lazy_imports=True)
+    header, _, functions = main.partition("def total(")
+
+    assert "import json" not in header
+    assert "    import json\n" in functions.partition("def dumped(")[2]
+
+
+def test_argument_types_and_star_imports_stay_at_the_top(compile_app):
+    compiled = compile_app(SOURCE, lazy_imports=True)
+
+    assert run(run(get(compiled.app, "/api/total?price=1.10&count=3")).get_json()) == {
+        "response": "3.30"
+    }
+    assert run(run(get(compiled.app, "/api/dumped?n=5")).get_json()) == {"response": "2"}
+    header = open("main.py", encoding="utf-8").read().partition("def total(")[0]
+    assert "from decimal import Decimal" in header
+    assert "from math import *" in header
+
+
+def test_warm_imports_only_list_deferred_modules(module):
+    main = builder.create_api(module(SOURCE).manifest(), lazy_imports=True, warm_imports=True)
+
+    assert "'json'" in main
+    assert "'decimal'" not in main and "'math'" not in main
@@ -0,0 +1,112 @@
+import pytest
+
+from spylt.exceptions import NoRoutesDefinedError, TypesNotDefinedError
+from spylt.manifest import import_bindings, merge_manifests, used_names
+
+
+def test_returns_are_wrapped_but_nested_ones_are_not(module):
+    [route] = module(
+        """
+        import math
+
+        @app
+        def area(r: float) -> float:
+            def helper():
+                return 2
+            if r < 0:
+                return
+            return math.pi * r ** helper()
+        """
+    ).manifest().routes
+
+    assert route.params == [("r", float)]
+    assert "        return 2" in route.body
+    assert 'return {"response": None}' in route.body
+    assert 'return {"response": math.pi * r ** helper()}' in route.body
+
+
+def test_generators_arent_wrapped(module):
+    [route] = module(
+        """
+        @app
+        def count(n: int):
+            yield n
+            return
+        """
+    ).manifest().routes
+
+    assert route.is_generator
+    assert '"response"' not in route.body
+
+
+def test_imports_leave_out_build_packages(module):
+    manifest = module(
+        """
+        import json
+        from spylt import aio
+
+        @app
+        def f() -> str:
+            return json.dumps(aio is not None)
+        """
+    ).manifest()
+
+    assert "import json" in manifest.imports
+    assert "from spylt import require_svelte" not in manifest.imports
+
+
+def test_untyped_arguments_are_rejected(module):
+    with pytest.raises(TypesNotDefinedError, match="add()"):
+        module(
+            """
+            @app
+            def add(a, b: int) -> int:
+                return a + b
+            """
+        ).manifest()
+
+
+def test_modules_need_a_route(module):
+    with pytest.raises(NoRoutesDefinedError):
+        module("").manifest()
+
+
+def test_preloads_cant_take_arguments(module):
+    source = """
+        @app.preload
+        def data(path):
+            return path
+
+        @app
+        def f() -> int:
+            return 1
+        """
+    with pytest.raises(TypeError, match="can't take arguments"):
+        module(source).manifest()
+
+
+def test_pages_cant_share_route_names(module):
+    first = module(
+        """
+        @app
+        def f() -> int:
+            return 1
+        """
+    ).manifest()
+    second = module(
+        """
+        @app
+        def f() -> int:
+            return 2
+        """
+    ).manifest()
+
+    assert merge_manifests([first, first]).routes == first.routes
+    with pytest.raises(ValueError, match="route named 'f'"):
+        merge_manifests([first, second])
+
+
+def test_import_bindings_and_used_names():
+    assert import_bindings("import os.path, numpy as np") == (["os.path", "numpy"], ["os", "np"])
+    assert import_bindings("from decimal import Decimal as D") == (["decimal"], ["D"])
+    assert used_names("    return np.sum(x)\n") == {"np", "x"}
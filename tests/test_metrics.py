@@ -0,0 +1,86 @@
+import logging
+
+from spylt.metrics import Metrics, Timings
+from conftest import run
+
+SOURCE = """
+@app
+def add(a: int, b: int) -> int:
+    return a + b
+
+@app
+def fail() -> int:
+    raise RuntimeError("no")
+
+@app
+def metrics_() -> int:
+    return 1
+"""
+
+
+async def scrape(app, *paths):
+    async with app.test_app() as test_app:
+        client = test_app.test_client()
+        responses = [await client.get(path) for path in paths]
+        metrics = await client.get("/metrics")
+        return responses, metrics.content_type, (await metrics.get_data()).decode()
+
+
+def test_requests_are_timed_and_counted_per_route(compile_app):
+    compiled = compile_app(SOURCE, metrics=True)
+    [ok, _, failed], content_type, body = run(
+        scrape(compiled.app, "/api/add?a=1&b=2", "/api/add?a=3&b=4", "/api/fail")
+    )
+
+    phases = [part.split(";")[0] for part in ok.headers["Server-Timing"].split(", ")]
+    assert phases == ["parse", "compute", "serialize", "total"]
+    assert failed.status_code == 500
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert 'spylt_requests_total{route="/api/add"} 2' in body
+    assert 'spylt_request_errors_total{route="/api/fail"} 1' in body
+    assert 'spylt_request_duration_seconds_bucket{route="/api/add",le="+Inf"} 2' in body
+    assert 'route="/metrics"' not in body
+
+
+def test_routes_can_share_names_with_the_metrics_handler(compile_app):
+    compiled = compile_app(SOURCE, metrics=True)
+    [response], _, body = run(scrape(compiled.app, "/api/metrics_"))
+
+    assert run(response.get_json()) == {"response": 1}
+    assert 'spylt_requests_total{route="/api/metrics_"} 1' in body
+
+
+def test_uninstrumented_apps_have_no_metrics(compile_app):
+    compiled = compile_app(SOURCE)
+    [ok], _, _ = run(scrape(compiled.app, "/api/add?a=1&b=2"))
+
+    assert "Server-Timing" not in ok.headers
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics()
+    metrics.observe("/a", 0.001, False, {})
+    metrics.observe("/a", 0.2, False, {"compute": 0.2})
+    metrics.observe("/a", 60, True, {})
+    body = metrics.render()
+
+    assert 'spylt_request_duration_seconds_bucket{route="/a",le="0.005"} 1' in body
+    assert 'spylt_request_duration_seconds_bucket{route="/a",le="0.25"} 2' in body
+    assert 'spylt_request_duration_seconds_bucket{route="/a",le="10.0"} 2' in body
+    assert 'spylt_request_duration_seconds_bucket{route="/a",le="+Inf"} 3' in body
+    assert 'spylt_request_phase_seconds_total{route="/a",phase="compute"} 0.2' in body
+
+
+def test_slow_requests_are_logged(compile_app, caplog):
+    compiled = compile_app(SOURCE, metrics=True, slow_request_ms=0)
+    with caplog.at_level(logging.WARNING, logger="spylt.slow"):
+        run(scrape(compiled.app, "/api/add?a=1&b=2"))
+
+    assert "Slow request GET /api/add?a=1&b=2" in caplog.text
+
+
+def test_timings_header_is_in_milliseconds():
+    timings = Timings()
+    timings.phases = {"parse": 0.0015}
+
+    assert timings.header(0.25) == "parse;dur=1.50, total;dur=250.00"
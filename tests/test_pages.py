@@ -0,0 +1,96 @@
+import os
+import sys
+import threading
+
+import pytest
+
+from spylt import builder, runtime, serve
+from spylt.pages import Page, Project, discover_pages
+from conftest import get, load_module, run
+
+ROUTE = """
+@{module}
+def {name}() -> str:
+    return "{name}"
+"""
+
+
+@pytest.fixture
+def pages(project):
+    load_module(ROUTE.format(module="app", name="home"))
+    (project / "src" / "admin").mkdir()
+    (project / "src" / "admin" / "Users.svelte").write_text(
+        "<!-- point ./src/admin/users.py:admin -->\n"
+    )
+    (project / "src" / "admin" / "users.py").write_text(
+        "from spylt import require_svelte\n"
+        'admin = require_svelte("./src/admin/Users.svelte")\n' + ROUTE.format(module="admin", name="users")
+    )
+    (project / "src" / "Button.svelte").write_text("<button />\n")
+    return discover_pages("src")
+
+
+def test_pages_are_found_with_the_root_first(pages):
+    assert [page.name for page in pages] == ["App", "admin/Users"]
+    assert [page.url for page in pages] == ["/", "/admin/users"]
+    assert pages[1].source_file == "./src/admin/users.py"
+
+
+def test_pages_are_written_next_to_the_root_page():
+    assert Page("./src/App.svelte", "", "App").html("public/index.html") == "public/index.html"
+    assert Page("./src/a/B.svelte", "", "a/B").html("public/index.html") == os.path.join(
+        "public", "a-b.html"
+    )
+
+
+def test_projects_merge_every_pages_routes(pages):
+    project = Project(pages, "public/index.html")
+    api = project.create_api()
+
+    assert [route.name for route in project.manifest().routes] == ["home", "users"]
+    assert "def home(" in api and "def users(" in api
+    assert "public/admin-users.html" in api
+
+
+def test_missing_pages_are_bundled_in_threads(pages, monkeypatch):
+    threads = []
+
+    def create_html(linker):
+        threads.append(threading.current_thread())
+        return f"<html>{len(linker)}"
+
+    monkeypatch.setattr(builder, "create_html", create_html)
+    project = Project(pages)
+
+    results = project.bundle("inline", {"App": None, "admin/Users": None}, workers=2)
+    assert all(not cached for _, _, cached in results.values())
+    assert all(thread is not threading.main_thread() for thread in threads)
+
+    results = project.bundle("inline", {"App": "<cached>", "admin/Users": None})
+    assert results["App"] == ("<cached>", 0.0, True)
+    assert results["admin/Users"][0].startswith("<html>")
+
+
+def test_routes_can_share_names_with_pages(project, monkeypatch):
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    load_module(
+        ROUTE.format(module="app", name="about_page") + ROUTE.format(module="app", name="root")
+    )
+    (project / "src" / "About.svelte").write_text("<!-- point ./src/App.py:app -->\n")
+    (project / "main.py").write_text(Project(discover_pages("src")).create_api())
+    try:
+        app = serve.load_app("main.py")
+        assert run(run(get(app, "/api/about_page")).get_json()) == {"response": "about_page"}
+        # Neither page has been built
+        assert run(get(app, "/about")).status_code == 404
+    finally:
+        sys.modules.pop("main", None)
+        runtime.shutdown_pools()
+
+
+def test_pages_need_distinct_names(project):
+    for name in ("a-b", "a_b"):
+        (project / "src" / f"{name}.svelte").write_text("<!-- point ./src/App.py:app -->\n")
+
+    with pytest.raises(ValueError, match="can't both be pages"):
+        discover_pages("src")
@@ -0,0 +1,54 @@
+import pytest
+
+from spylt import builder
+from spylt.cache import BuildCache
+from spylt.pages import Project, discover_pages
+from spylt.pipeline import BuildPipeline
+from conftest import load_module
+
+
+@pytest.fixture
+def build(project, monkeypatch):
+    load_module(
+        """
+        @app
+        def f() -> int:
+            return 1
+        """
+    )
+    monkeypatch.setattr(builder, "create_html", lambda linker: "<html>")
+
+    def build_(html="index.html", **options):
+        pipeline = BuildPipeline(
+            Project(discover_pages("src"), html), BuildCache(), api_options=options
+        )
+        return {stage.name: stage.cached for stage in pipeline.run("main.py")}
+
+    return build_
+
+
+def test_unchanged_builds_come_from_the_cache(build, project):
+    first = build()
+    second = build()
+
+    assert not first["api"] and not first["bundle /"]
+    assert second["api"] and second["bundle /"]
+    assert (project / "index.html").read_text() == "<html>"
+    assert (project / "index.html.gz").exists()
+
+
+def test_api_options_are_part_of_the_key(build):
+    build()
+
+    assert not build(metrics=True)["api"]
+
+
+def test_moving_the_html_rebuilds_the_api(build, project):
+    build()
+    (project / "public").mkdir()
+    stages = build("public/index.html")
+
+    assert not stages["api"]
+    assert "public/index.html" in (project / "main.py").read_text()
+    assert stages["bundle /"]
+    assert (project / "public" / "index.html").read_text() == "<html>"
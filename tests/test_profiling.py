@@ -0,0 +1,68 @@
+import pstats
+
+import pytest
+
+from spylt.profiling import HEADER, Profiler, create_token, verify_token
+from conftest import get, run
+
+SOURCE = """
+import time
+
+@app
+def add(a: int, b: int) -> int:
+    return a + b
+
+@app(executor="thread")
+def nap(ms: int) -> int:
+    time.sleep(ms / 1000)
+    return ms
+"""
+
+
+def test_tokens_expire_and_are_signed():
+    token = create_token("secret")
+
+    assert verify_token("secret", token)
+    assert not verify_token("other", token)
+    assert not verify_token("secret", create_token("secret", ttl=-1))
+    assert not verify_token("secret", "nope")
+
+
+def test_profiler_from_env(monkeypatch):
+    assert Profiler.from_env() is None
+
+    monkeypatch.setenv("SPYLT_PROFILE", "add, nap")
+    monkeypatch.setenv("SPYLT_PROFILE_RATE", "0.5")
+    profiler = Profiler.from_env()
+    assert profiler.routes == {"add", "nap"} and profiler.rate == 0.5
+
+    monkeypatch.setenv("SPYLT_PROFILE_MODE", "trace")
+    with pytest.raises(ValueError, match="Unknown profile mode"):
+        Profiler.from_env()
+
+
+def test_selected_routes_are_profiled(compile_app, monkeypatch, project):
+    monkeypatch.setenv("SPYLT_PROFILE", "add")
+    compiled = compile_app(SOURCE)
+
+    profiled = run(get(compiled.app, "/api/add?a=1&b=2"))
+    [name] = profiled.headers[HEADER].split(", ")
+    assert name.startswith("add-") and name.endswith(".pstats")
+    assert pstats.Stats(str(project / ".spylt-profiles" / name)).total_calls > 0
+    assert HEADER not in run(get(compiled.app, "/api/nap?ms=1")).headers
+
+
+def test_signed_requests_profile_every_route(compile_app, monkeypatch, project):
+    monkeypatch.setenv("SPYLT_PROFILE_KEY", "secret")
+    monkeypatch.setenv("SPYLT_PROFILE_MODE", "sample")
+    monkeypatch.setenv("SPYLT_PROFILE_DIR", str(project / "profiles"))
+    compiled = compile_app(SOURCE)
+
+    assert HEADER not in run(get(compiled.app, "/api/nap?ms=20")).headers
+    assert HEADER not in run(
+        get(compiled.app, "/api/nap?ms=20", headers={HEADER: create_token("wrong")})
+    ).headers
+    response = run(get(compiled.app, "/api/nap?ms=20", headers={HEADER: create_token("secret")}))
+    [name] = response.headers[HEADER].split(", ")
+    assert name.endswith(".collapsed")
+    assert "nap" in (project / "profiles" / name).read_text()
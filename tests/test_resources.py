@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from spylt.datasets import read_frame, write_frame
+from conftest import run
+
+SOURCE = """
+@app.resource
+def connection():
+    with open("log.txt", "a") as fh:
+        fh.write("open\\n")
+    yield {"url": "db://"}
+    with open("log.txt", "a") as fh:
+        fh.write("close\\n")
+
+@app.resource
+async def settings():
+    return {"region": "eu"}
+
+@app.on_startup
+async def started():
+    with open("log.txt", "a") as fh:
+        fh.write("startup " + connection()["url"] + "\\n")
+
+@app.on_shutdown
+def stopped():
+    with open("log.txt", "a") as fh:
+        fh.write("shutdown\\n")
+
+@app
+def where() -> str:
+    return connection()["url"] + " " + settings()["region"]
+"""
+
+
+async def serve(app, path):
+    async with app.test_app() as test_app:
+        response = await test_app.test_client().get(path)
+        return await response.get_json()
+
+
+def test_resources_and_hooks_run_as_the_app_serves(compile_app, project):
+    compiled = compile_app(SOURCE)
+
+    assert run(serve(compiled.app, "/api/where")) == {"response": "db:// eu"}
+    assert (project / "log.txt").read_text().split("\n") == [
+        "open",
+        "startup db://",
+        "shutdown",
+        "close",
+        "",
+    ]
+
+
+def test_resources_arent_available_before_serving(compile_app):
+    compiled = compile_app(SOURCE)
+
+    with pytest.raises(RuntimeError, match="built as the server starts"):
+        compiled.connection()
+
+
+def test_hooks_cant_take_arguments(module):
+    with pytest.raises(TypeError, match="Startup function started\\(\\) can't take arguments"):
+        module(
+            """
+            @app.on_startup
+            def started(config):
+                pass
+
+            @app
+            def f() -> int:
+                return 1
+            """
+        ).manifest()
+
+
+def test_arrow_files_share_numeric_columns(tmp_path):
+    pytest.importorskip("pyarrow")
+    frame = pd.DataFrame({"n": np.arange(100), "s": ["a", "b"] * 50})
+    write_frame(frame, str(tmp_path / "frame.arrow"))
+    read = read_frame(str(tmp_path / "frame.arrow"))
+
+    pd.testing.assert_frame_equal(read, frame, check_dtype=False)
+    assert not read["n"].to_numpy().flags.writeable
+    assert list(read_frame(str(tmp_path / "frame.arrow"), columns=["s"]).columns) == ["s"]
+
+
+def test_read_frame_rejects_other_files(tmp_path):
+    pytest.importorskip("pyarrow")
+    with pytest.raises(ValueError, match="Expected a .parquet file"):
+        read_frame(str(tmp_path / "frame.csv"))
@@ -0,0 +1,29 @@
+import os
+import sys
+
+from spylt import builder, runtime, serve
+from conftest import get, load_module, run
+
+
+def test_loaded_apps_can_run_process_routes(project, monkeypatch):
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    manifest = load_module(
+        """
+        import os
+
+        @app(executor="process")
+        def pid() -> int:
+            return os.getpid()
+        """
+    ).manifest()
+    (project / "main.py").write_text(builder.create_api(manifest))
+    try:
+        app = serve.load_app("main.py")
+        response = run(get(app, "/api/pid"))
+
+        assert sys.modules["main"].app is app
+        assert response.status_code == 200
+        assert run(response.get_json())["response"] != os.getpid()
+    finally:
+        sys.modules.pop("main", None)
+        runtime.shutdown_pools()
@@ -0,0 +1,85 @@
+import gzip
+import os
+
+from quart import Quart
+
+from spylt.static import StaticPage, precompress
+from conftest import run
+
+
+def serve(page):
+    app = Quart(__name__)
+
+    @app.route("/")
+    async def index():
+        return page.respond()
+
+    return app
+
+
+async def fetch(app, **headers):
+    response = await app.test_client().get("/", headers=headers)
+    return response, await response.get_data()
+
+
+def test_negotiate_prefers_brotli_and_respects_q_values(tmp_path):
+    page = StaticPage(str(tmp_path / "index.html"))
+    page.variants = {"identity": b"", "gzip": b"", "br": b""}
+
+    assert page.negotiate("gzip, br") == "br"
+    assert page.negotiate("br;q=0, gzip") == "gzip"
+    assert page.negotiate("*") == "br"
+    assert page.negotiate("gzip;q=nope") == "identity"
+    assert page.negotiate("") == "identity"
+
+
+def test_negotiate_prefers_higher_q_values_then_smaller_variants(tmp_path):
+    page = StaticPage(str(tmp_path / "index.html"))
+    page.variants = {"identity": b"xxxxxx", "gzip": b"xx", "br": b"xxx"}
+
+    assert page.negotiate("br, gzip") == "gzip"
+    assert page.negotiate("br;q=1, gzip;q=0.5") == "br"
+    assert page.negotiate("gzip;q=0.2, *;q=0.8") == "br"
+
+
+def test_precompressed_variants_are_served_with_their_own_etags(tmp_path):
+    path = tmp_path / "index.html"
+    path.write_text("<p>" * 100)
+    written = precompress(str(path))
+    app = serve(StaticPage(str(path), reload=False))
+
+    assert sorted(os.path.basename(out) for out in written) == ["index.html.br", "index.html.gz"]
+    response, body = run(fetch(app, **{"Accept-Encoding": "gzip"}))
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(body) == path.read_bytes()
+
+    identity, _ = run(fetch(app))
+    assert identity.headers["ETag"] != response.headers["ETag"]
+    assert response.headers["ETag"].endswith('-gzip"')
+
+
+def test_matching_etags_get_304(tmp_path):
+    path = tmp_path / "index.html"
+    path.write_text("<p>")
+    app = serve(StaticPage(str(path), reload=False))
+    first, _ = run(fetch(app))
+    second, body = run(fetch(app, **{"If-None-Match": first.headers["ETag"]}))
+
+    assert first.headers["Cache-Control"] == "public, max-age=86400"
+    assert second.status_code == 304
+    assert body == b""
+
+
+def test_reloading_pages_pick_up_changes(tmp_path):
+    path = tmp_path / "index.html"
+    app = serve(StaticPage(str(path), reload=True))
+
+    assert run(fetch(app))[0].status_code == 404
+    path.write_text("one")
+    assert run(fetch(app))[1] == b"one"
+    path.write_text("two")
+    os.utime(path, ns=(1, 1))
+    response, body = run(fetch(app))
+    assert body == b"two"
+    assert response.headers["Cache-Control"] == "no-cache"
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from spylt.runtime import RoutePolicy
+from conftest import run
+
+SOURCE = '''
+import pandas as pd
+from typing import Iterator
+
+@app
+def count(n: int) -> Iterator[int]:
+    for i in range(n):
+        yield i
+
+@app(stream="sse")
+def events(n: int) -> Iterator[int]:
+    for i in range(n):
+        yield i
+
+@app
+def broken(n: int) -> Iterator[int]:
+    yield 1
+    raise ValueError("no more")
+
+@app(stream="ndjson", chunk_rows=2)
+def rows(n: int) -> pd.DataFrame:
+    return pd.DataFrame({"a": range(n)})
+'''
+
+
+async def bodies(app, *paths):
+    async with app.test_app() as test_app:
+        client = test_app.test_client()
+        responses = [await client.get(path) for path in paths]
+        return [(response.content_type, (await response.get_data()).decode()) for response in responses]
+
+
+def test_generators_stream_ndjson_and_sse(compile_app):
+    compiled = compile_app(SOURCE)
+    (ndjson_type, ndjson), (sse_type, sse) = run(
+        bodies(compiled.app, "/api/count?n=3", "/api/events?n=2")
+    )
+
+    assert ndjson_type == "application/x-ndjson"
+    assert [json.loads(line) for line in ndjson.splitlines()] == [{"response": i} for i in range(3)]
+    assert sse_type == "text/event-stream"
+    assert sse == 'data: {"response": 0}\n\ndata: {"response": 1}\n\n'
+
+
+def test_errors_end_the_stream_with_a_message(compile_app):
+    compiled = compile_app(SOURCE)
+    [(_, body)] = run(bodies(compiled.app, "/api/broken?n=1"))
+
+    assert [json.loads(line) for line in body.splitlines()] == [
+        {"response": 1},
+        {"error": "ValueError: no more"},
+    ]
+
+
+def test_frames_stream_in_chunks_of_rows(compile_app):
+    compiled = compile_app(SOURCE)
+    [(_, body)] = run(bodies(compiled.app, "/api/rows?n=5"))
+    chunks = [json.loads(line) for line in body.splitlines()]
+
+    assert [chunk["offset"] for chunk in chunks] == [0, 2, 4]
+    assert chunks[-1] == {"response": [{"a": 4}], "offset": 4, "total": 5}
+
+
+def test_sync_generators_are_stepped_off_the_event_loop():
+    def names():
+        yield threading.current_thread().name
+
+    async def consume():
+        return [message async for message in RoutePolicy()._messages(names, {}, {})]
+
+    [message] = run(consume())
+
+    assert message["response"] != threading.current_thread().name
+
+
+def test_leaving_while_queued_doesnt_free_a_slot():
+    policy = RoutePolicy(max_concurrency=1, stream="ndjson")
+
+    def one():
+        yield 1
+
+    async def main():
+        first = policy._stream(one, {}, {})
+        await first.__anext__()
+        queued = asyncio.ensure_future(policy._stream(one, {}, {}).__anext__())
+        await asyncio.sleep(0.01)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        await first.aclose()
+        return policy._semaphore._value
+
+    assert run(main()) == 1
+
+
+def test_streams_cant_be_cached(module):
+    from spylt import CachePolicy
+
+    with pytest.raises(ValueError, match="can't be cached"):
+        module("")(stream="sse", cache=CachePolicy())
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from spylt import frames
+from spylt.frames import encode_records, frame_digest, render_table
+from conftest import get, run
+
+SOURCE = """
+import pandas as pd
+
+@app
+def rows(n: int) -> pd.DataFrame:
+    return pd.DataFrame({"a": range(n), "b": ["<x>"] * n})
+"""
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(frames, "_tables", frames.OrderedDict())
+
+
+def test_tables_are_only_sent_when_asked_for(compile_app):
+    compiled = compile_app(SOURCE)
+    plain = run(run(get(compiled.app, "/api/rows?n=2")).get_json())
+    with_table = run(run(get(compiled.app, "/api/rows?n=2&_table=1")).get_json())
+
+    assert "table" not in plain
+    assert with_table["response"] == plain["response"]
+    assert with_table["table"].startswith("<table")
+    assert "&lt;x&gt;" in with_table["table"]
+
+
+def test_tables_are_reused_for_frames_with_the_same_contents():
+    first = render_table(pd.DataFrame({"a": [1, 2]}))
+
+    assert render_table(pd.DataFrame({"a": [1, 2]})) is first
+    assert frame_digest(pd.DataFrame({"b": [1, 2]})) != frame_digest(pd.DataFrame({"a": [1, 2]}))
+    assert len(frames._tables) == 1
+
+
+def test_frames_with_unhashable_cells_arent_cached():
+    frame = pd.DataFrame({"a": [[1], [2]]})
+
+    assert frame_digest(frame) is None
+    assert encode_records(frame, table=True)["table"].startswith("<table")
+    assert not frames._tables
+
+
+def test_the_cache_is_bounded_across_threads(monkeypatch):
+    monkeypatch.setattr(frames, "TABLE_CACHE_ENTRIES", 4)
+    frames_ = [pd.DataFrame({"a": [i]}) for i in range(40)]
+    with ThreadPoolExecutor(8) as pool:
+        tables = list(pool.map(render_table, frames_ * 3))
+
+    assert len(frames._tables) == 4
+    assert all(f"<td>{i}</td>" in table for i, table in enumerate(tables[:40]))
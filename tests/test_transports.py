@@ -0,0 +1,81 @@
+import base64
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from spylt import builder
+from spylt.frames import ARROW_MIME, encode_arrow, encode_columns
+from conftest import run
+
+SOURCE = '''
+import pandas as pd
+
+@app(transport="columnar")
+def columnar() -> pd.DataFrame:
+    return pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", None]})
+
+@app(transport="arrow")
+def arrow() -> pd.DataFrame:
+    return pd.DataFrame({"a": [1, 2, 3], "b": [0.5, 1.5, 2.5]})
+'''
+
+
+def test_numeric_columns_are_sent_as_typed_arrays():
+    frame = pd.DataFrame(
+        {"i": [1, 2], "f": [0.5, np.nan], "b": [True, False], "s": ["x", None], "big": [0, 2**40]}
+    )
+    encoded = encode_columns(frame)
+    data = encoded["data"]
+
+    assert encoded["columns"] == ["i", "f", "b", "s", "big"] and encoded["length"] == 2
+    assert data["i"]["dtype"] == "int32"
+    assert np.frombuffer(base64.b64decode(data["i"]["base64"]), "<i4").tolist() == [1, 2]
+    assert data["big"]["dtype"] == "float64"
+    assert data["b"]["dtype"] == "uint8"
+    assert np.isnan(np.frombuffer(base64.b64decode(data["f"]["base64"]), "<f8")[1])
+    assert data["s"] == {"dtype": "object", "values": ["x", None]}
+
+
+def test_arrow_streams_round_trip():
+    pa = pytest.importorskip("pyarrow")
+    frame = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+    table = pa.ipc.open_stream(encode_arrow(frame)).read_all()
+
+    assert table.to_pandas().equals(frame)
+
+
+async def get_all(app):
+    async with app.test_app() as test_app:
+        client = test_app.test_client()
+        columnar = await client.get("/api/columnar")
+        arrow = await client.get("/api/arrow", headers={"Accept": ARROW_MIME})
+        fallback = await client.get("/api/arrow")
+        return columnar, arrow, fallback
+
+
+def test_routes_send_their_transport(compile_app):
+    pa = pytest.importorskip("pyarrow")
+    compiled = compile_app(SOURCE)
+    columnar, arrow, fallback = run(get_all(compiled.app))
+
+    body = run(columnar.get_json())
+    assert body["response"]["columns"] == ["a", "b"] and body["total"] == 3
+    assert arrow.content_type == ARROW_MIME and arrow.headers["X-Total-Count"] == "3"
+    table = pa.ipc.open_stream(run(arrow.get_data())).read_all()
+    assert table.column("b").to_pylist() == [0.5, 1.5, 2.5]
+    # Clients which don't accept Arrow get columnar JSON
+    assert run(fallback.get_json())["response"]["length"] == 3
+
+
+def test_interfaces_decode_columns_and_arrow(module):
+    interface = "\n".join(builder.create_interface(module(SOURCE).manifest(), "async")[0])
+
+    assert "function decodeColumns" in interface
+    assert 'return fetchFrame("arrow"' in interface
+    assert 'import { tableFromIPC } from "apache-arrow"' in interface
+
+
+def test_unknown_transports_are_rejected(module):
+    with pytest.raises(ValueError, match="Unknown transport"):
+        module("")(transport="csv")